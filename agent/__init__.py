@@ -1 +1,11 @@
-from .root_agent import root_agent
\ No newline at end of file
+def __getattr__(name):
+    # root_agent pulls in google-adk and every sub-agent. Loading it on first
+    # access keeps the database modules (db_pool, delete_planner, ...) usable
+    # on their own, e.g. from the tests.
+    if name == "root_agent":
+        from .root_agent import root_agent
+
+        # Importing the submodule bound its name on the package; rebind it to the agent.
+        globals()["root_agent"] = root_agent
+        return root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
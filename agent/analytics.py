@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import os
+import json
+import atexit
+import argparse
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from .count_summaries import summary_aggregate
+from .db_pool import get_pool
+from .lab_sql import (
+    FACT_COLUMNS,
+    FILTER_FIELDS,
+    AggregateQuery,
+    QueryPage,
+    _normalise_value,
+    facts_query,
+    sqlite_aggregate,
+)
+from .migrations import Migration, apply_migrations
+from .pydantic_models import StrictLabFilters
+from .result_cache import db_version, normalize_db_path
+
+try:  # The analytics mirror is optional.
+    import duckdb
+except ImportError:  # pragma: no cover - depends on the environment
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Columnar analytics mirror
+# ---------------------------------------------------------------------------
+# Count and trend tools group over the full experiment join. With
+# ANALYTICS_ENGINE=duckdb they instead run the same aggregate SQL against an
+# embedded DuckDB copy of the facts relation (one row per experiment, see
+# lab_sql.FACT_COLUMNS), stored next to the database as <db>.duckdb.
+#
+# The mirror refreshes incrementally: triggers installed by the migrations
+# below log every changed experiment id, including experiments whose
+# dimension rows were renamed or deleted, and the mirror re-reads only those.
+# The triggers are installed explicitly (`python -m agent.analytics DB
+# --install`); until then the mirror is not used and aggregates run on SQLite.
+# The log keeps only the last CHANGE_LOG_WINDOW entries; a mirror that falls
+# further behind sees the gap and rebuilds.
+
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "sqlite")
+# Above this many changed experiments a full rebuild is cheaper than patching.
+FULL_REBUILD_CHANGES = int(os.getenv("ANALYTICS_FULL_REBUILD_CHANGES", "50000"))
+LOAD_BATCH_ROWS = 50_000
+# Change-log rows kept; fixed when the triggers are installed.
+CHANGE_LOG_WINDOW = int(os.getenv("ANALYTICS_CHANGE_LOG_WINDOW", str(2 * FULL_REBUILD_CHANGES)))
+
+CHANGE_LOG_TABLE = "_experiment_changes"
+
+_DIMENSION_FKS = {
+    "Organism": "organism_id",
+    "Protein": "protein_id",
+    "StrainOrCellLine": "strain_id",
+    "Condition": "condition_id",
+    "CaptureSetting": "capture_setting_id",
+    "User": "user_id",
+}
+
+
+def _change_log_statements() -> tuple[str, ...]:
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {CHANGE_LOG_TABLE} ("
+        "seq INTEGER PRIMARY KEY AUTOINCREMENT, experiment_id INTEGER NOT NULL)",
+        f"CREATE TRIGGER IF NOT EXISTS trg_experiment_changes_insert AFTER INSERT ON Experiment "
+        f"BEGIN INSERT INTO {CHANGE_LOG_TABLE}(experiment_id) VALUES (NEW.id); END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_experiment_changes_update AFTER UPDATE ON Experiment "
+        f"BEGIN INSERT INTO {CHANGE_LOG_TABLE}(experiment_id) VALUES (OLD.id); "
+        f"INSERT INTO {CHANGE_LOG_TABLE}(experiment_id) SELECT NEW.id WHERE NEW.id != OLD.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_experiment_changes_delete AFTER DELETE ON Experiment "
+        f"BEGIN INSERT INTO {CHANGE_LOG_TABLE}(experiment_id) VALUES (OLD.id); END",
+    ]
+    for table, fk in _DIMENSION_FKS.items():
+        for event, row in (("UPDATE", "NEW"), ("DELETE", "OLD")):
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS trg_experiment_changes_{table.lower()}_{event.lower()} "
+                f"AFTER {event} ON {table} BEGIN INSERT INTO {CHANGE_LOG_TABLE}(experiment_id) "
+                f"SELECT id FROM Experiment WHERE {fk} = {row}.id; END"
+            )
+    return tuple(statements)
+
+
+CHANGE_LOG_MIGRATION = Migration(2, "experiment_change_log", _change_log_statements())
+
+CHANGE_LOG_WINDOW_MIGRATION = Migration(
+    6,
+    "experiment_change_log_window",
+    (
+        f"CREATE TRIGGER IF NOT EXISTS trg_experiment_changes_window AFTER INSERT ON {CHANGE_LOG_TABLE} "
+        f"BEGIN DELETE FROM {CHANGE_LOG_TABLE} WHERE seq <= NEW.seq - {CHANGE_LOG_WINDOW}; END",
+        f"DELETE FROM {CHANGE_LOG_TABLE} WHERE seq <= "
+        f"(SELECT COALESCE(MAX(seq), 0) FROM {CHANGE_LOG_TABLE}) - {CHANGE_LOG_WINDOW}",
+    ),
+)
+
+
+def install_change_log(db_path: str) -> list[int]:
+    """Create the change log and its triggers so the mirror can be used.
+
+    Returns:
+        The versions applied (empty if already installed).
+    """
+    return apply_migrations(db_path, [CHANGE_LOG_MIGRATION, CHANGE_LOG_WINDOW_MIGRATION])
+
+
+def change_log_installed(db_path: str) -> bool:
+    """Whether install_change_log has run on this database; never writes."""
+    with get_pool(db_path).read() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_experiment_changes_window'"
+        ).fetchone()
+    return row is not None
+
+
+# Recorded in the mirror so a change to FACT_COLUMNS forces a rebuild.
+_FACTS_LAYOUT = ",".join(f"{name}:{col.kind}" for name, col in FACT_COLUMNS.items())
+
+
+def _duckdb_type(kind: str) -> str:
+    return "BIGINT" if kind == "int" else "VARCHAR"
+
+
+def _mirror_predicate(name: str, kind: str) -> str:
+    """DuckDB predicate with the same semantics as the SQLite filter."""
+    if kind == "nocase":
+        return f"lower({name}) = lower(?)"
+    if kind == "real":
+        return f"TRY_CAST({name} AS DOUBLE) = ?"
+    return f"{name} = ?"
+
+
+class AnalyticsMirror:
+    """DuckDB copy of the experiment facts for one SQLite database."""
+
+    def __init__(self, db_path: str, mirror_path: Optional[str] = None):
+        self.db_path = db_path
+        self.mirror_path = mirror_path or f"{db_path}.duckdb"
+        self._lock = threading.Lock()
+        self._conn = duckdb.connect(self.mirror_path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS _mirror_meta (key VARCHAR PRIMARY KEY, value VARCHAR)")
+        self._version: Optional[tuple] = None
+        self._installed = False
+        self._warned = False
+
+    # -- metadata ---------------------------------------------------------
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM _mirror_meta WHERE key = ?", [key]).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO _mirror_meta VALUES (?, ?)", [key, str(value)])
+
+    # -- loading ----------------------------------------------------------
+
+    def _load(self, conn, experiment_ids: Optional[List[int]] = None) -> int:
+        """Copy facts rows from SQLite, all of them or only the given ids."""
+        query = facts_query({})
+        if experiment_ids is not None:
+            query.add("e.id IN (SELECT value FROM json_each(?))", json.dumps(experiment_ids))
+        sql, params = query.relation_sql()
+        cursor = conn.execute(sql, params)
+        loaded = 0
+        while True:
+            rows = cursor.fetchmany(LOAD_BATCH_ROWS)
+            if not rows:
+                break
+            batch = pd.DataFrame.from_records(rows, columns=list(FACT_COLUMNS))
+            self._conn.register("facts_batch", batch)
+            self._conn.execute("INSERT INTO experiment_facts SELECT * FROM facts_batch")
+            self._conn.unregister("facts_batch")
+            loaded += len(rows)
+        return loaded
+
+    def _rebuild(self, conn, last_seq: int) -> None:
+        columns = ", ".join(f"{name} {_duckdb_type(col.kind)}" for name, col in FACT_COLUMNS.items())
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute("DROP TABLE IF EXISTS experiment_facts")
+            self._conn.execute(f"CREATE TABLE experiment_facts ({columns})")
+            loaded = self._load(conn)
+            self._set_meta("last_seq", last_seq)
+            self._set_meta("source", self.db_path)
+            self._set_meta("columns", _FACTS_LAYOUT)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        logger.info("Analytics mirror rebuilt | db_path=%s rows=%s", self.db_path, loaded)
+
+    def _patch(self, conn, changed: List[int], last_seq: int) -> None:
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute(
+                "DELETE FROM experiment_facts WHERE experiment_id IN (SELECT UNNEST(?::BIGINT[]))", [changed]
+            )
+            loaded = self._load(conn, changed)
+            self._set_meta("last_seq", last_seq)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        logger.info("Analytics mirror patched | db_path=%s changed=%s reloaded=%s", self.db_path, len(changed), loaded)
+
+    def _change_log_installed(self) -> bool:
+        if not self._installed:
+            self._installed = change_log_installed(self.db_path)
+            if not self._installed and not self._warned:
+                logger.warning(
+                    "Analytics change log not installed; using SQLite. Run python -m agent.analytics %s --install",
+                    self.db_path,
+                )
+                self._warned = True
+        return self._installed
+
+    def refresh(self) -> bool:
+        """Bring the mirror up to date if the SQLite file changed.
+
+        Returns:
+            False, without touching either database, when the change log has
+            not been installed (see install_change_log).
+        """
+        if not self._change_log_installed():
+            return False
+        version = db_version(self.db_path)
+        if version is not None and version == self._version:
+            return True
+
+        with get_pool(self.db_path).read() as conn:
+            # One read transaction so the change-log position matches the rows.
+            conn.execute("BEGIN")
+            try:
+                # The sequence survives pruning; MAX(seq) would not.
+                row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (CHANGE_LOG_TABLE,)).fetchone()
+                last_seq = row[0] if row else 0
+                first_seq = conn.execute(f"SELECT MIN(seq) FROM {CHANGE_LOG_TABLE}").fetchone()[0]
+                if first_seq is None:
+                    first_seq = last_seq + 1
+                mirrored = self._meta("last_seq")
+                stale_layout = self._meta("source") != self.db_path or self._meta("columns") != _FACTS_LAYOUT
+                if (
+                    mirrored is None
+                    or stale_layout
+                    or int(mirrored) > last_seq
+                    or int(mirrored) < first_seq - 1  # changes pruned before they were read
+                ):
+                    self._rebuild(conn, last_seq)
+                elif int(mirrored) < last_seq:
+                    changed = [row[0] for row in conn.execute(
+                        f"SELECT DISTINCT experiment_id FROM {CHANGE_LOG_TABLE} WHERE seq > ?", (int(mirrored),)
+                    )]
+                    if len(changed) > FULL_REBUILD_CHANGES:
+                        self._rebuild(conn, last_seq)
+                    else:
+                        self._patch(conn, changed, last_seq)
+            finally:
+                conn.execute("COMMIT")
+        self._version = version
+        return True
+
+    # -- queries ----------------------------------------------------------
+
+    def aggregate(self, aggregate: AggregateQuery, filters: Optional[dict]) -> Optional[QueryPage]:
+        """Run an aggregate on the mirror.
+
+        Returns:
+            None if the filters need the live join or the change log is not
+            installed.
+        """
+        clean = StrictLabFilters(**(filters or {})).model_dump(exclude_none=True)
+        where, params = [], []
+        for key, value in clean.items():
+            if FILTER_FIELDS[key].child or key not in FACT_COLUMNS:
+                return None
+            where.append(_mirror_predicate(key, FACT_COLUMNS[key].kind))
+            params.append(_normalise_value(key, value))
+        relation = "SELECT * FROM experiment_facts" + (f" WHERE {' AND '.join(where)}" if where else "")
+        with self._lock:
+            if not self.refresh():
+                return None
+            cursor = self._conn.execute(aggregate.sql(relation), params)
+            columns = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+        return QueryPage(columns, rows, len(rows))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Routing
+# ---------------------------------------------------------------------------
+
+_mirrors: Dict[str, AnalyticsMirror] = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_mirror(db_path: str) -> Optional[AnalyticsMirror]:
+    """Return the mirror for a database, or None when the engine is SQLite."""
+    if ANALYTICS_ENGINE != "duckdb":
+        return None
+    if duckdb is None:
+        logger.warning("ANALYTICS_ENGINE=duckdb but duckdb is not installed; using SQLite")
+        return None
+    key = normalize_db_path(db_path)
+    with _mirrors_lock:
+        mirror = _mirrors.get(key)
+        if mirror is None:
+            mirror = AnalyticsMirror(key)
+            _mirrors[key] = mirror
+        return mirror
+
+
+def close_all_mirrors() -> None:
+    with _mirrors_lock:
+        mirrors = list(_mirrors.values())
+        _mirrors.clear()
+    for mirror in mirrors:
+        mirror.close()
+
+
+atexit.register(close_all_mirrors)
+
+
+def run_aggregate(db_path: str, aggregate: AggregateQuery, filters: Optional[dict]) -> QueryPage:
+    """Answer an aggregate from the count summary, the mirror or SQLite, in that order."""
+    page = summary_aggregate(db_path, aggregate, filters)
+    if page is not None:
+        return page
+    mirror = get_mirror(db_path)
+    if mirror is not None:
+        try:
+            page = mirror.aggregate(aggregate, filters)
+        except (duckdb.Error, sqlite3.Error):
+            logger.exception("Analytics mirror query failed; falling back to SQLite | db_path=%s", db_path)
+            page = None
+        if page is not None:
+            return page
+    return sqlite_aggregate(db_path, aggregate, filters)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Install the change log used by the DuckDB analytics mirror.")
+    parser.add_argument("db_path", help="Path to the SQLite database file.")
+    parser.add_argument("--install", action="store_true", help="Create the change-log table and triggers.")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {}
+    if args.install:
+        report["applied_versions"] = install_change_log(args.db_path)
+    report["change_log_installed"] = change_log_installed(args.db_path)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+from __future__ import annotations
+
+import os
+import csv
+import json
+import time
+import string
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from .db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Bulk CSV ingestion
+# ---------------------------------------------------------------------------
+# A metadata CSV has one row per file (raw image, tracking output or mask)
+# carrying the experiment and all of its dimension attributes. The file is
+# read in chunks of INGEST_CHUNK_ROWS; dimension rows and experiments are
+# resolved through in-memory get-or-create caches preloaded from the
+# database, and file rows are written with executemany and
+# INSERT ... ON CONFLICT DO NOTHING, one write transaction per chunk, so rows
+# already present are skipped by their UNIQUE constraints.
+#
+# Dimension values are matched like SQLite's COLLATE NOCASE columns (ASCII
+# case folding), numbers by value, and empty or 'N/A' values as NULL. Empty
+# text cells of file rows are stored as '' like the lab_data_manager insert
+# path stores them.
+
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "20000"))
+# Invalid rows listed in the result; the count always covers all of them.
+MAX_REPORTED_ERRORS = 50
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_NULL_TEXT = {"", "n/a", "na", "none", "null"}
+
+
+@dataclass(frozen=True)
+class DimensionSpec:
+    table: str
+    columns: tuple[tuple[str, str], ...]  # (table column, CSV column)
+    key: tuple[str, ...]                  # table columns of the identity index
+    numeric: frozenset = frozenset()
+
+
+# Identity keys follow the uq_<Table>_identity indexes.
+DIMENSIONS: Dict[str, DimensionSpec] = {
+    "organism_id": DimensionSpec("Organism", (("organism_name", "organism"),), ("organism_name",)),
+    "protein_id": DimensionSpec("Protein", (("protein_name", "protein"),), ("protein_name",)),
+    "strain_id": DimensionSpec("StrainOrCellLine", (("strain_name", "strain"),), ("strain_name",)),
+    "condition_id": DimensionSpec(
+        "Condition",
+        (("condition_name", "condition"), ("concentration_value", "concentration_value"),
+         ("concentration_unit", "concentration_unit")),
+        ("condition_name", "concentration_value", "concentration_unit"),
+        frozenset({"concentration_value"}),
+    ),
+    "capture_setting_id": DimensionSpec(
+        "CaptureSetting",
+        (("capture_type", "capture_type"), ("exposure_time", "exposure_time"),
+         ("time_interval", "time_interval"), ("fluorescent_dye", "fluorescent_dye"),
+         ("dye_concentration_value", "dye_concentration_value"),
+         ("dye_concentration_unit", "dye_concentration_unit"), ("laser_wavelength", "laser_wavelength"),
+         ("laser_intensity", "laser_intensity"), ("camera_binning", "camera_binning"),
+         ("objective_magnification", "objective_magnification"), ("pixel_size", "pixel_size")),
+        ("capture_type", "exposure_time", "time_interval", "dye_concentration_value"),
+        frozenset({"exposure_time", "time_interval", "dye_concentration_value", "laser_wavelength",
+                   "laser_intensity", "camera_binning", "objective_magnification", "pixel_size"}),
+    ),
+    "user_id": DimensionSpec(
+        "User", (("user_name", "user_name"), ("last_name", "user_last_name"), ("email", "user_email")), ("email",),
+    ),
+}
+
+EXPERIMENT_KEY = ("organism_id", "protein_id", "strain_id", "condition_id",
+                  "capture_setting_id", "user_id", "date", "replicate")
+# Experiment identity as CSV column -> stored value, for rows that leave some
+# of it empty: mask and tracking rows usually omit the user, strain and
+# capture settings of the experiment their raw images belong to.
+EXPERIMENT_ATTRIBUTES = {
+    "organism": "o.organism_name",
+    "protein": "p.protein_name",
+    "condition": "c.condition_name",
+    "date": "e.date",
+    "replicate": "e.replicate",
+    "strain": "s.strain_name",
+    "concentration_value": "c.concentration_value",
+    "concentration_unit": "c.concentration_unit",
+    "capture_type": "cs.capture_type",
+    "exposure_time": "cs.exposure_time",
+    "time_interval": "cs.time_interval",
+    "dye_concentration_value": "cs.dye_concentration_value",
+    "user_name": "u.user_name",
+    "user_last_name": "u.last_name",
+    "user_email": "u.email",
+}
+# Leading EXPERIMENT_ATTRIBUTES every row must fill to be matched partially.
+_CORE_ATTRIBUTES = 5
+_EXPERIMENT_ATTRIBUTES_SQL = (
+    f"SELECT e.id, {', '.join(EXPERIMENT_ATTRIBUTES.values())} FROM Experiment e "
+    "LEFT JOIN Organism o ON o.id = e.organism_id LEFT JOIN Protein p ON p.id = e.protein_id "
+    "LEFT JOIN StrainOrCellLine s ON s.id = e.strain_id LEFT JOIN Condition c ON c.id = e.condition_id "
+    "LEFT JOIN CaptureSetting cs ON cs.id = e.capture_setting_id LEFT JOIN User u ON u.id = e.user_id"
+)
+_MISSING = object()
+
+# Columns of each file table's UNIQUE constraint. NULLs never conflict in
+# SQLite, and older rows may hold NULL where new ones hold '', so duplicates
+# are also excluded with a NOT EXISTS that treats NULL and '' as equal.
+FILE_KEYS = {
+    "RawFiles": ("experiment_id", "file_name", "field_of_view", "file_type"),
+    "TrackingFiles": ("experiment_id", "file_name", "field_of_view", "file_type", "threshold",
+                      "linking_distance", "gap_closing_distance", "max_frame_gap"),
+    "Masks": ("experiment_id", "mask_name", "field_of_view", "mask_type", "file_type",
+              "segmentation_method", "segmentation_parameters"),
+}
+
+# CSV columns that determine a row's experiment.
+EXPERIMENT_SOURCES = tuple(dict.fromkeys(
+    [source for spec in DIMENSIONS.values() for _, source in spec.columns]
+    + ["date", "replicate", "is_valid", "comment"]
+))
+
+# file_category -> (table, [(table column, CSV column)], numeric columns)
+FILE_TABLES: Dict[str, tuple[str, tuple[tuple[str, str], ...], frozenset]] = {
+    "raw": (
+        "RawFiles",
+        (("file_name", "file_name"), ("field_of_view", "field_of_view"), ("file_type", "file_type"),
+         ("file_path", "file_path")),
+        frozenset(),
+    ),
+    "tracking": (
+        "TrackingFiles",
+        (("file_name", "file_name"), ("field_of_view", "field_of_view"), ("file_type", "file_type"),
+         ("file_path", "file_path"), ("threshold", "threshold"), ("linking_distance", "linking_distance"),
+         ("gap_closing_distance", "gap_closing_distance"), ("max_frame_gap", "max_frame_gap")),
+        frozenset({"threshold", "linking_distance", "gap_closing_distance", "max_frame_gap"}),
+    ),
+    "mask": (
+        "Masks",
+        (("mask_name", "file_name"), ("field_of_view", "field_of_view"), ("mask_type", "mask_type"),
+         ("file_type", "file_type"), ("mask_path", "file_path"), ("segmentation_method", "segmentation_method"),
+         ("segmentation_parameters", "segmentation_parameters")),
+        frozenset(),
+    ),
+}
+
+
+class InvalidRow(ValueError):
+    """A CSV row that fails validation and is not inserted."""
+
+
+def _value(raw: Optional[str], numeric: bool = False) -> Any:
+    """Stored value of a CSV cell: None for empty/N/A, a number where numeric."""
+    text = (raw or "").strip()
+    if text.lower() in _NULL_TEXT:
+        return None
+    if numeric:
+        try:
+            number = float(text)
+        except ValueError:
+            return text  # e.g. '5%' or '100x', stored as written
+        return int(number) if number.is_integer() and "." not in text else number
+    return text
+
+
+def _file_value(raw: Optional[str], numeric: bool = False) -> Any:
+    """Stored value of a file row cell: like _value, but '' for empty text."""
+    value = _value(raw, numeric)
+    return "" if value is None and not numeric else value
+
+
+def _match(value: Any) -> Any:
+    """Cache key of a stored value, equal where SQLite would find a duplicate."""
+    if isinstance(value, str):
+        if value.strip().lower() in _NULL_TEXT:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return value.translate(_ASCII_LOWER)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+class _Resolver:
+    """Get-or-create caches for dimension rows and experiments."""
+
+    def __init__(self, conn):
+        self.created: Dict[str, int] = {}
+        self._ids: Dict[str, Dict[tuple, int]] = {}
+        for fk, spec in DIMENSIONS.items():
+            cache = self._ids[fk] = {}
+            for row in conn.execute(f'SELECT id, {", ".join(spec.key)} FROM "{spec.table}"'):
+                cache.setdefault(tuple(_match(v) for v in row[1:]), row[0])
+        self._experiments: Dict[tuple, int] = {}
+        # Most file rows repeat their experiment's cells verbatim.
+        self._by_source: Dict[tuple, int] = {}
+        for row in conn.execute(f"SELECT id, {', '.join(EXPERIMENT_KEY)} FROM Experiment"):
+            self._experiments.setdefault(tuple(_match(v) for v in row[1:]), row[0])
+        # Experiment attributes grouped by their core attributes.
+        self._by_core: Dict[tuple, List[tuple[int, tuple]]] = {}
+        for row in conn.execute(_EXPERIMENT_ATTRIBUTES_SQL):
+            self._remember(row[0], tuple(_match(v) for v in row[1:]))
+
+    def _remember(self, experiment_id: int, attributes: tuple) -> None:
+        self._by_core.setdefault(attributes[:_CORE_ATTRIBUTES], []).append((experiment_id, attributes))
+
+    def dimension(self, conn, fk: str, row: Dict[str, str], create: bool = True) -> Any:
+        """Id of the row's dimension row, None for no value, or _MISSING if
+        it does not exist and `create` is false."""
+        spec = DIMENSIONS[fk]
+        values = {column: _value(row.get(source), column in spec.numeric) for column, source in spec.columns}
+        key = spec.key
+        if all(values[column] is None for column in key):
+            if fk != "user_id" or values["user_name"] is None:
+                return None
+            # Users without an email are identified by name.
+            key = ("user_name", "last_name")
+        cache_key = tuple(_match(values[column]) for column in key)
+        if key != spec.key:
+            cache_key = ("by", *key, *cache_key)
+        cached = self._ids[fk].get(cache_key)
+        if cached is not None:
+            return cached
+        if not create:
+            return _MISSING
+        row_id = self._insert(conn, spec.table, values, key)
+        self._ids[fk][cache_key] = row_id
+        return row_id
+
+    def _insert(self, conn, table: str, values: dict, key: Sequence[str]) -> int:
+        """Insert a row unless its key exists (the cache may miss a stored spelling)."""
+        columns = list(values)
+        cursor = conn.execute(
+            f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) '
+            f"ON CONFLICT DO NOTHING",
+            [values[column] for column in columns],
+        )
+        if cursor.rowcount:
+            self.created[table] = self.created.get(table, 0) + 1
+            return cursor.lastrowid
+        found = conn.execute(
+            f'SELECT id FROM "{table}" WHERE {" AND ".join(f"{column} IS ?" for column in key)}',
+            [values[column] for column in key],
+        ).fetchone()
+        if found is None:
+            raise InvalidRow(f"{table} row conflicts with an existing one: {values}")
+        return found[0]
+
+    def experiment(self, conn, row: Dict[str, str]) -> int:
+        source = tuple(row.get(column) for column in EXPERIMENT_SOURCES)
+        cached = self._by_source.get(source)
+        if cached is None:
+            cached = self._by_source[source] = self._experiment(conn, row)
+        return cached
+
+    def _experiment(self, conn, row: Dict[str, str]) -> int:
+        date = _value(row.get("date"))
+        if date is None or len(date) != 8 or not date.isdigit():
+            raise InvalidRow(f"date must be YYYYMMDD, got {row.get('date')!r}")
+        replicate = _value(row.get("replicate"), numeric=True)
+        if replicate is not None and not isinstance(replicate, int):
+            raise InvalidRow(f"replicate must be an integer, got {row.get('replicate')!r}")
+
+        known = {fk: self.dimension(conn, fk, row, create=False) for fk in DIMENSIONS}
+        if _MISSING not in known.values():
+            cached = self._experiments.get(
+                tuple(_match(value) for value in (*known.values(), date, replicate))
+            )
+            if cached is not None:
+                return cached
+        partial = self._partial_match(row)
+        if partial is not None:
+            return partial
+
+        values: Dict[str, Any] = {fk: self.dimension(conn, fk, row) for fk in DIMENSIONS}
+        values.update(date=date, replicate=replicate)
+        cache_key = tuple(_match(values[column]) for column in EXPERIMENT_KEY)
+        cached = self._experiments.get(cache_key)
+        if cached is not None:
+            return cached
+        values.update(is_valid=_value(row.get("is_valid")), comment=_value(row.get("comment")))
+        row_id = self._insert(conn, "Experiment", values, EXPERIMENT_KEY)
+        self._experiments[cache_key] = row_id
+        self._remember(row_id, tuple(_match(row.get(column)) for column in EXPERIMENT_ATTRIBUTES))
+        return row_id
+
+    def _partial_match(self, row: Dict[str, str]) -> Optional[int]:
+        """The one known experiment agreeing with every experiment cell the row fills.
+
+        Only rows that leave some cells empty (not 'N/A') are matched this
+        way; None means the row describes a new experiment.
+
+        Raises:
+            InvalidRow: if several experiments agree with the row.
+        """
+        cells = [(row.get(column) or "").strip() for column in EXPERIMENT_ATTRIBUTES]
+        if all(cells) or not all(cells[:_CORE_ATTRIBUTES]):
+            return None
+        given = [(i, _match(cell)) for i, cell in enumerate(cells) if cell]
+        candidates = self._by_core.get(tuple(_match(cell) for cell in cells[:_CORE_ATTRIBUTES]), [])
+        matches = {experiment_id for experiment_id, stored in candidates
+                   if all(stored[i] == value for i, value in given)}
+        if len(matches) > 1:
+            raise InvalidRow(f"row matches {len(matches)} experiments; fill in the experiment columns")
+        return matches.pop() if matches else None
+
+
+def _chunks(reader: Iterator[Dict[str, str]], size: int) -> Iterator[List[tuple[int, Dict[str, str]]]]:
+    chunk = []
+    # Line 1 is the header.
+    for line, row in enumerate(reader, start=2):
+        chunk.append((line, row))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def bulk_insert_csv(csv_path: str, db_path: str, chunk_rows: int = INGEST_CHUNK_ROWS) -> Dict[str, Any]:
+    """Insert the file rows of a metadata CSV, creating missing dimensions and experiments.
+
+    Each chunk of `chunk_rows` CSV rows is written in one transaction; a
+    failing chunk is rolled back and stops the load, while earlier chunks stay
+    committed. Rows already in the database are counted as duplicates. Rows
+    with a missing or unknown file_category, no file_name or invalid
+    experiment values are not inserted and are reported as errors.
+
+    Returns:
+        Rows read, inserted (total and per table), duplicates and invalid
+        rows, the first MAX_REPORTED_ERRORS invalid rows with their line and
+        error, the dimension rows and experiments created, elapsed seconds and
+        rows per second.
+
+    Raises:
+        FileNotFoundError: if the CSV or the database does not exist.
+    """
+    started = time.perf_counter()
+    pool = get_pool(db_path)
+    inserted: Dict[str, int] = {}
+    errors: List[Dict[str, Any]] = []
+    duplicates = invalid_count = rows_read = 0
+    with open(csv_path, newline="", encoding="utf-8-sig") as handle:
+        reader = csv.DictReader(handle)
+        resolver: Optional[_Resolver] = None
+        for chunk in _chunks(reader, chunk_rows):
+            batches: Dict[str, List[list]] = {}
+            with pool.write() as conn:
+                if resolver is None:
+                    resolver = _Resolver(conn)
+                for line, row in chunk:
+                    if not any((value or "").strip() for value in row.values()):
+                        continue
+                    rows_read += 1
+                    try:
+                        category = (row.get("file_category") or "").strip().lower()
+                        if category not in FILE_TABLES:
+                            raise InvalidRow(
+                                f"file_category must be one of {', '.join(FILE_TABLES)}, "
+                                f"got {row.get('file_category')!r}"
+                            )
+                        _, columns, numeric = FILE_TABLES[category]
+                        if not _value(row.get("file_name")):
+                            raise InvalidRow("file_name is empty")
+                        experiment_id = resolver.experiment(conn, row)
+                    except InvalidRow as e:
+                        invalid_count += 1
+                        if len(errors) < MAX_REPORTED_ERRORS:
+                            errors.append({"line": line, "file_name": row.get("file_name"), "error": str(e)})
+                        continue
+                    batches.setdefault(category, []).append(
+                        [experiment_id, *(_file_value(row.get(source), column in numeric) for column, source in columns)]
+                    )
+                for category, rows in batches.items():
+                    table, columns, _ = FILE_TABLES[category]
+                    columns = ["experiment_id", *(column for column, _ in columns)]
+                    key = [columns.index(column) for column in FILE_KEYS[table]]
+                    # experiment_id and the file name are never empty and
+                    # keep the UNIQUE index usable for the lookup.
+                    same = [
+                        f"{columns[i]} = ?" if n < 2 else f"COALESCE({columns[i]}, '') = COALESCE(?, '')"
+                        for n, i in enumerate(key)
+                    ]
+                    cursor = conn.executemany(
+                        f'INSERT INTO "{table}" ({", ".join(columns)}) SELECT {", ".join("?" * len(columns))} '
+                        f'WHERE NOT EXISTS (SELECT 1 FROM "{table}" WHERE {" AND ".join(same)}) '
+                        f"ON CONFLICT DO NOTHING",
+                        [[*row, *(row[i] for i in key)] for row in rows],
+                    )
+                    inserted[table] = inserted.get(table, 0) + cursor.rowcount
+                    duplicates += len(rows) - cursor.rowcount
+            logger.info(
+                "Ingest chunk committed | csv=%s rows=%s inserted=%s invalid=%s",
+                csv_path, rows_read, inserted, invalid_count,
+            )
+    seconds = time.perf_counter() - started
+    rows_inserted = sum(inserted.values())
+    result = {
+        "rows_read": rows_read,
+        "rows_inserted": rows_inserted,
+        "rows_invalid": invalid_count,
+        "duplicates": duplicates,
+        "inserted": inserted,
+        "created": resolver.created if resolver is not None else {},
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows_read / seconds, 1) if seconds > 0 else None,
+    }
+    logger.info(
+        "Ingest complete | csv=%s read=%s inserted=%s duplicates=%s invalid=%s rows_per_second=%s",
+        csv_path, rows_read, rows_inserted, duplicates, invalid_count, result["rows_per_second"],
+    )
+    if invalid_count:
+        logger.warning("Ingest found invalid rows | csv=%s invalid=%s first=%s", csv_path, invalid_count, errors[:3])
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-load a metadata CSV into the lab database.")
+    parser.add_argument("csv_path", help="Path to the metadata CSV file.")
+    parser.add_argument("db_path", help="Path to the SQLite database file.")
+    parser.add_argument("--chunk-rows", type=int, default=INGEST_CHUNK_ROWS, help="CSV rows per transaction.")
+    args = parser.parse_args()
+    print(json.dumps(bulk_insert_csv(args.csv_path, args.db_path, args.chunk_rows), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 import logging
 from google.genai import types
 
@@ -13,6 +14,40 @@ retry_config = types.HttpRetryOptions(
     http_status_codes=[429, 500, 503, 504],
 )
 
+# ---------------------------------------------------------------------------
+# Per-model quotas enforced by the shared rate limiter: (RPM, TPM).
+# Override the default for unlisted models with GEMINI_RPM / GEMINI_TPM.
+# ---------------------------------------------------------------------------
+MODEL_QUOTAS = {
+    "gemini-2.5-flash": (10, 250_000),
+    "gemini-2.5-flash-lite": (15, 250_000),
+}
+DEFAULT_MODEL_QUOTA = (
+    int(os.getenv("GEMINI_RPM", "10")),
+    int(os.getenv("GEMINI_TPM", "250000")),
+)
+
+# ---------------------------------------------------------------------------
+# Query result encoding sent back to the model.
+# "compact" is the token-lean TSV format (see result_encoding.py); "table"
+# keeps the padded DataFrame.to_string output for reading results by eye.
+# ---------------------------------------------------------------------------
+QUERY_RESULT_FORMAT = os.getenv("QUERY_RESULT_FORMAT", "compact")
+QUERY_RESULT_TOKEN_BUDGET = int(os.getenv("QUERY_RESULT_TOKEN_BUDGET", "1500"))
+
+# ---------------------------------------------------------------------------
+# CSV insertion engine. "lab_data_manager" calls its insert_from_csv; "bulk"
+# uses the chunked get-or-create loader in bulk_ingest.py.
+# ---------------------------------------------------------------------------
+INSERT_ENGINE = os.getenv("INSERT_ENGINE", "lab_data_manager")
+
+# ---------------------------------------------------------------------------
+# Metadata CSV validation engine. "lab_data_manager" calls its validate_csv;
+# "parallel" uses the chunked process-pool validator in csv_validation.py.
+# Analysis metadata is always validated by lab_data_manager.
+# ---------------------------------------------------------------------------
+VALIDATION_ENGINE = os.getenv("VALIDATION_ENGINE", "lab_data_manager")
+
 # ---------------------------------------------------------------------------
 # Logging — configured once when this module is first imported.
 # All agent modules should only call logging.getLogger(__name__).
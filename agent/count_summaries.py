@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import json
+import logging
+import argparse
+from typing import Any, Dict, List, Optional
+
+from .db_pool import get_pool
+from .lab_sql import FILTER_FIELDS, ROW_ENTITIES, AggregateQuery, QueryPage, PagedQuery, _normalise_value
+from .migrations import Migration, apply_migrations
+from .pydantic_models import StrictLabFilters
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Trigger-maintained experiment counts
+# ---------------------------------------------------------------------------
+# Period and group counts are the most common statistics questions. Instead
+# of grouping the full experiment join each time, SUMMARY_TABLE keeps
+# experiment counts per (dimension, value id, month), updated by triggers on
+# Experiment. The '*' dimension counts all experiments per month; the others
+# count per organism, protein, condition, user or capture setting and month.
+# Counts by year, by month and by one of those dimensions are SUMs over a few
+# hundred rows.
+#
+# SQLite treats NULLs as distinct in unique keys, so NULL foreign keys are
+# stored as 0 and the month as 'd' || YYYYMM, or '' for a NULL date.
+
+SUMMARY_TABLE = "_experiment_counts"
+SUMMARY_MIGRATION_VERSION = 3
+
+_KEY_COLUMNS = ("dimension", "value_id", "month")
+_ALL = "*"
+
+# Fact columns the summary can group and filter by: Experiment foreign key
+# and the dimension join that resolves it.
+SUMMARY_DIMENSIONS = {
+    "organism": ("organism_id", "LEFT JOIN Organism o ON o.id = k.value_id"),
+    "protein": ("protein_id", "LEFT JOIN Protein p ON p.id = k.value_id"),
+    "condition": ("condition_id", "LEFT JOIN Condition c ON c.id = k.value_id"),
+    "user_name": ("user_id", "LEFT JOIN User u ON u.id = k.value_id"),
+    "capture_type": ("capture_setting_id", "LEFT JOIN CaptureSetting cs ON cs.id = k.value_id"),
+}
+
+
+def _key_exprs(dimension: str, row: str = "") -> List[str]:
+    """Summary key of an experiment row (NEW/OLD in a trigger) for one dimension."""
+    prefix = f"{row}." if row else ""
+    value = f"COALESCE({prefix}{SUMMARY_DIMENSIONS[dimension][0]}, 0)" if dimension != _ALL else "0"
+    return [f"'{dimension}'", value, f"COALESCE('d' || substr({prefix}date, 1, 6), '')"]
+
+
+def _dimensions() -> List[str]:
+    return [_ALL, *SUMMARY_DIMENSIONS]
+
+
+def _increment(row: str) -> str:
+    keys = ", ".join(_KEY_COLUMNS)
+    return " ".join(
+        f"INSERT INTO {SUMMARY_TABLE} ({keys}, n) VALUES ({', '.join(_key_exprs(d, row))}, 1) "
+        f"ON CONFLICT ({keys}) DO UPDATE SET n = n + 1;"
+        for d in _dimensions()
+    )
+
+
+def _decrement(row: str) -> str:
+    statements = []
+    for d in _dimensions():
+        match = " AND ".join(f"{column} = {expr}" for column, expr in zip(_KEY_COLUMNS, _key_exprs(d, row)))
+        statements.append(f"UPDATE {SUMMARY_TABLE} SET n = n - 1 WHERE {match};")
+        statements.append(f"DELETE FROM {SUMMARY_TABLE} WHERE {match} AND n <= 0;")
+    return " ".join(statements)
+
+
+def _populate_sql(table: str) -> str:
+    selects = [
+        f"SELECT {', '.join(_key_exprs(d))}, COUNT(*) FROM Experiment GROUP BY 2, 3"
+        for d in _dimensions()
+    ]
+    return f"INSERT INTO {table} ({', '.join(_KEY_COLUMNS)}, n) {' UNION ALL '.join(selects)}"
+
+
+def _create_table_sql(table: str, temporary: bool = False) -> str:
+    return (
+        f"CREATE {'TEMP ' if temporary else ''}TABLE IF NOT EXISTS {table} ("
+        f"dimension TEXT NOT NULL, value_id INTEGER NOT NULL, month TEXT NOT NULL, n INTEGER NOT NULL, "
+        f"PRIMARY KEY ({', '.join(_KEY_COLUMNS)}))"
+    )
+
+
+_TRACKED = ", ".join(column for column, _ in SUMMARY_DIMENSIONS.values())
+
+SUMMARY_MIGRATION = Migration(
+    SUMMARY_MIGRATION_VERSION,
+    "experiment_count_summary",
+    (
+        _create_table_sql(SUMMARY_TABLE),
+        f"CREATE TRIGGER IF NOT EXISTS trg_experiment_counts_insert AFTER INSERT ON Experiment "
+        f"BEGIN {_increment('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_experiment_counts_update AFTER UPDATE OF {_TRACKED}, date ON Experiment "
+        f"BEGIN {_decrement('OLD')} {_increment('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_experiment_counts_delete AFTER DELETE ON Experiment "
+        f"BEGIN {_decrement('OLD')} END",
+        f"DELETE FROM {SUMMARY_TABLE}",
+        _populate_sql(SUMMARY_TABLE),
+    ),
+)
+
+
+def install_summaries(db_path: str) -> List[int]:
+    """Create and populate the summary table and its triggers (idempotent)."""
+    return apply_migrations(db_path, [SUMMARY_MIGRATION])
+
+
+# ---------------------------------------------------------------------------
+# Answering aggregates from the summary
+# ---------------------------------------------------------------------------
+
+def _summary_relation(aggregate: AggregateQuery, filters: Optional[dict]) -> Optional[tuple[str, list]]:
+    """Facts-shaped relation over the summary, or None if it cannot answer."""
+    if aggregate.entity not in ROW_ENTITIES:
+        return None
+    clean = StrictLabFilters(**(filters or {})).model_dump(exclude_none=True)
+    used = set(aggregate.group_by) | set(clean)
+    # Each dimension is summarised on its own, so at most one can be involved.
+    if len(used) > 1 or used - set(SUMMARY_DIMENSIONS):
+        return None
+    dimension = next(iter(used), _ALL)
+    columns = ["CASE WHEN k.month = '' THEN NULL ELSE substr(k.month, 2) END AS date", "k.n"]
+    source = f"{SUMMARY_TABLE} k"
+    if dimension != _ALL:
+        columns.insert(0, f"{FILTER_FIELDS[dimension].column} AS {dimension}")
+        source += f" {SUMMARY_DIMENSIONS[dimension][1]}"
+    query = PagedQuery(source=source, columns=columns, key=[])
+    query.add("k.dimension = ?", dimension)
+    for key, value in clean.items():
+        query.add(f"{FILTER_FIELDS[key].column} = ?", _normalise_value(key, value))
+    return query.relation_sql()
+
+
+def summary_aggregate(db_path: str, aggregate: AggregateQuery, filters: Optional[dict]) -> Optional[QueryPage]:
+    """Answer an aggregate from the summary table.
+
+    Returns:
+        The counts, or None when the summary is not installed or the groups,
+        counted entity or filters are not covered by it.
+    """
+    relation = _summary_relation(aggregate, filters)
+    if relation is None:
+        return None
+    sql, params = relation
+    with get_pool(db_path).read() as conn:
+        installed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SUMMARY_TABLE,)
+        ).fetchone()
+        if not installed:
+            return None
+        cursor = conn.execute(aggregate.sql(sql, weight="n"), params)
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+    return QueryPage(columns, rows, len(rows))
+
+
+# ---------------------------------------------------------------------------
+# Consistency check
+# ---------------------------------------------------------------------------
+
+def check_summaries(db_path: str, repair: bool = False, limit: int = 20) -> Dict[str, Any]:
+    """Rebuild the summary from Experiment and diff it against the stored one.
+
+    Args:
+        db_path: Path to the SQLite database file.
+        repair:  Replace the stored summary with the rebuilt one if they differ.
+        limit:   Maximum number of differing keys to report.
+
+    Returns:
+        Report with the number of stored and rebuilt rows, the differing keys
+        (stored vs live count) and whether the summary was repaired.
+
+    Raises:
+        ValueError: if the summary has not been installed.
+    """
+    keys = ", ".join(_KEY_COLUMNS)
+    match = " AND ".join(f"a.{column} = b.{column}" for column in _KEY_COLUMNS)
+    diff_sql = (
+        f"SELECT a.{', a.'.join(_KEY_COLUMNS)}, a.n, COALESCE(b.n, 0) FROM {SUMMARY_TABLE} a "
+        f"LEFT JOIN _experiment_counts_live b ON {match} WHERE b.n IS NOT a.n "
+        f"UNION ALL "
+        f"SELECT b.{', b.'.join(_KEY_COLUMNS)}, 0, b.n FROM _experiment_counts_live b "
+        f"LEFT JOIN {SUMMARY_TABLE} a ON {match} WHERE a.n IS NULL"
+    )
+    with get_pool(db_path).write() as conn:
+        installed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SUMMARY_TABLE,)
+        ).fetchone()
+        if not installed:
+            raise ValueError(f"{SUMMARY_TABLE} is not installed; run with --install first")
+        # The writer transaction keeps Experiment still between rebuild and diff.
+        conn.execute("DROP TABLE IF EXISTS temp._experiment_counts_live")
+        conn.execute(_create_table_sql("_experiment_counts_live", temporary=True))
+        conn.execute(_populate_sql("_experiment_counts_live"))
+        differences = [
+            {**dict(zip(_KEY_COLUMNS, row[:-2])), "stored": row[-2], "live": row[-1]}
+            for row in conn.execute(diff_sql)
+        ]
+        stored = conn.execute(f"SELECT COUNT(*) FROM {SUMMARY_TABLE}").fetchone()[0]
+        rebuilt = conn.execute("SELECT COUNT(*) FROM _experiment_counts_live").fetchone()[0]
+        repaired = bool(repair and differences)
+        if repaired:
+            conn.execute(f"DELETE FROM {SUMMARY_TABLE}")
+            conn.execute(f"INSERT INTO {SUMMARY_TABLE} ({keys}, n) SELECT {keys}, n FROM _experiment_counts_live")
+        conn.execute("DROP TABLE temp._experiment_counts_live")
+    if differences:
+        logger.warning("Count summary drift | db_path=%s keys=%s repaired=%s", db_path, len(differences), repaired)
+    return {
+        "stored_rows": stored,
+        "rebuilt_rows": rebuilt,
+        "differences": len(differences),
+        "examples": differences[:limit],
+        "repaired": repaired,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Install or check the trigger-maintained experiment counts.")
+    parser.add_argument("db_path", help="Path to the SQLite database file.")
+    parser.add_argument("--install", action="store_true", help="Create the summary table and triggers.")
+    parser.add_argument("--repair", action="store_true", help="Replace the summary if it differs from live counts.")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {}
+    if args.install:
+        report["applied_versions"] = install_summaries(args.db_path)
+    report.update(check_summaries(args.db_path, repair=args.repair))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+try:
+    from lab_data_manager import data_validation
+except ImportError:  # validate_metadata reports it; the range helpers still work
+    data_validation = None
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Parallel metadata CSV validation
+# ---------------------------------------------------------------------------
+# The CSV body is split into byte ranges that start and end on line
+# boundaries outside quoted fields. Each range is written, behind the
+# original header line, to a chunk file that a pool worker validates with
+# lab_data_manager's own data_validation.validate_csv, the function the
+# serial path calls on the whole file. The parent merges the chunks' invalid
+# rows and reports in file order, so the verdict is the serial one for any
+# number of workers as long as validate_csv judges every row on its own.
+#
+# Validation streams: ranges are consumed in order with at most two per
+# worker in flight, and each chunk's report is appended to the output file
+# as it is merged. Peak memory depends on VALIDATION_CHUNK_BYTES and the
+# worker count, not the file size. Setting max_errors stops the walk once
+# that many invalid rows have been found.
+#
+# Workers are started with forkserver (spawn where unavailable): forking the
+# agent process from a tool thread is unsafe.
+
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", str(os.cpu_count() or 1)))
+# Upper bound on the bytes one worker validates at a time.
+VALIDATION_CHUNK_BYTES = int(os.getenv("VALIDATION_CHUNK_BYTES", str(16 * 1024 * 1024)))
+# Invalid rows after which validation stops; 0 reads the whole file.
+VALIDATION_MAX_ERRORS = int(os.getenv("VALIDATION_MAX_ERRORS", "0"))
+# Invalid rows listed in the result; the output file always holds all of them.
+MAX_REPORTED_INVALID = 50
+
+
+def _rows(invalid: Any) -> List[Any]:
+    """validate_csv's invalid rows as a list, whether a DataFrame or a sequence."""
+    if invalid is None:
+        return []
+    if isinstance(invalid, pd.DataFrame):
+        return invalid.to_dict(orient="records")
+    return list(invalid)
+
+
+def _validate_range(csv_path: str, header: bytes, start: int, end: int, workdir: str) -> Dict[str, Any]:
+    """Validate the lines in bytes [start, end) of the CSV body with validate_csv.
+
+    Runs in a pool worker. The chunk file holds the original header line and
+    the range; its report is written next to it.
+    """
+    chunk_path = os.path.join(workdir, f"chunk_{start}.csv")
+    output_path = os.path.join(workdir, f"chunk_{start}_invalid.csv")
+    with open(csv_path, "rb") as source, open(chunk_path, "wb") as chunk:
+        chunk.write(header)
+        source.seek(start)
+        remaining = end - start
+        while remaining:
+            block = source.read(min(remaining, 1024 * 1024))
+            if not block:
+                break
+            chunk.write(block)
+            remaining -= len(block)
+    try:
+        invalid = _rows(data_validation.validate_csv(chunk_path, output_path))
+    finally:
+        os.remove(chunk_path)
+    return {"invalid": invalid, "output_path": output_path if os.path.exists(output_path) else None}
+
+
+def _read_header(csv_path: str) -> Tuple[bytes, int, int]:
+    """The header line as bytes, the byte offset where the body starts, and the file size."""
+    with open(csv_path, "rb") as handle:
+        header = handle.readline()
+        body = handle.tell()
+        size = handle.seek(0, os.SEEK_END)
+    if header and not header.endswith(b"\n"):
+        header += b"\n"
+    return header, body, size
+
+
+def _byte_ranges(csv_path: str, start: int, size: int, parts: int) -> List[Tuple[int, int]]:
+    """Split bytes [start, size) into about `parts` ranges ending on line breaks.
+
+    A line break inside a quoted field is not a row boundary: a range that
+    holds an odd number of quote characters is joined with the next one.
+    """
+    bounds = [start]
+    with open(csv_path, "rb") as handle:
+        for i in range(1, parts):
+            handle.seek(max(start + (size - start) * i // parts - 1, bounds[-1]))
+            handle.readline()
+            position = handle.tell()
+            if position >= size:
+                break
+            if position > bounds[-1]:
+                bounds.append(position)
+        bounds.append(size)
+        ranges: List[Tuple[int, int]] = []
+        low, quotes = start, 0
+        for lo, hi in zip(bounds, bounds[1:]):
+            handle.seek(lo)
+            quotes += handle.read(hi - lo).count(b'"')
+            if quotes % 2 == 0 or hi == size:
+                ranges.append((low, hi))
+                low, quotes = hi, 0
+    return ranges
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def _results(csv_path: str, header: bytes, ranges: Sequence[Tuple[int, int]], workdir: str,
+             pool: Optional[ProcessPoolExecutor], workers: int) -> Iterator[Dict[str, Any]]:
+    """Range results in file order, with at most two ranges per worker in flight."""
+    if pool is None:
+        for start, end in ranges:
+            yield _validate_range(csv_path, header, start, end, workdir)
+        return
+    pending: Deque[Future] = deque()
+    for start, end in ranges:
+        pending.append(pool.submit(_validate_range, csv_path, header, start, end, workdir))
+        if len(pending) >= 2 * workers:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _append_report(chunk_report: str, output, first: bool) -> None:
+    """Append a chunk's report to the output, keeping only the first header."""
+    with open(chunk_report, "rb") as report:
+        if not first:
+            report.readline()
+        shutil.copyfileobj(report, output)
+
+
+def validate_metadata(csv_path: str, output_path: str, workers: Optional[int] = None,
+                      chunk_bytes: int = VALIDATION_CHUNK_BYTES,
+                      max_errors: Optional[int] = None) -> Dict[str, Any]:
+    """Validate a metadata CSV with lab_data_manager, in parallel chunks.
+
+    The invalid rows reported by data_validation.validate_csv for every
+    chunk are merged in file order, and the chunks' reports are concatenated
+    into `output_path`. A stale report from an earlier run is removed when
+    this run writes none.
+
+    Args:
+        csv_path: Metadata CSV, one row per raw, tracking or mask file.
+        output_path: CSV file receiving the invalid rows.
+        workers: Worker processes; 1 validates in this process. Defaults to
+            VALIDATION_WORKERS.
+        chunk_bytes: Upper bound on the bytes validated per task.
+        max_errors: Stop after this many invalid rows; 0 reads the whole
+            file. Defaults to VALIDATION_MAX_ERRORS.
+
+    Returns:
+        Invalid row count, the first MAX_REPORTED_INVALID invalid rows as
+        returned by validate_csv, whether validation stopped early, the
+        output path, and timing.
+
+    Raises:
+        FileNotFoundError: if the CSV does not exist.
+        ImportError: if lab_data_manager is not installed.
+    """
+    if data_validation is None:
+        raise ImportError("the parallel validator needs lab_data_manager.data_validation")
+    started = time.perf_counter()
+    workers = max(1, workers or VALIDATION_WORKERS)
+    max_errors = VALIDATION_MAX_ERRORS if max_errors is None else max_errors
+    header, body, size = _read_header(csv_path)
+    if size <= body:
+        # Empty or header-only: let the library report it exactly as the serial path does.
+        invalid = _rows(data_validation.validate_csv(csv_path, output_path))
+        ranges: List[Tuple[int, int]] = []
+    else:
+        parts = max(workers, -(-(size - body) // max(chunk_bytes, 1)))
+        ranges = _byte_ranges(csv_path, body, size, parts)
+        invalid = []
+    workers = min(workers, len(ranges)) or 1
+    reported: List[Any] = invalid[:MAX_REPORTED_INVALID]
+    invalid_count = len(invalid)
+    stopped = False
+
+    if ranges:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        pool = _pool(workers) if workers > 1 else None
+        wrote_report = False
+        try:
+            with tempfile.TemporaryDirectory(prefix="validate_") as workdir, \
+                    open(f"{output_path}.partial", "wb") as output:
+                for result in _results(csv_path, header, ranges, workdir, pool, workers):
+                    rows = result["invalid"]
+                    if result["output_path"] is not None:
+                        _append_report(result["output_path"], output, first=not wrote_report)
+                        wrote_report = True
+                    invalid_count += len(rows)
+                    reported.extend(rows[:MAX_REPORTED_INVALID - len(reported)])
+                    if max_errors and invalid_count >= max_errors:
+                        stopped = True
+                        break
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        if wrote_report:
+            os.replace(f"{output_path}.partial", output_path)
+        else:
+            os.remove(f"{output_path}.partial")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+    seconds = time.perf_counter() - started
+    result = {
+        "invalid_count": invalid_count,
+        "invalid_rows": reported,
+        "stopped_early": stopped,
+        "output_path": output_path,
+        "chunks": len(ranges),
+        "workers": workers,
+        "seconds": round(seconds, 3),
+    }
+    logger.info(
+        "Validation complete | csv=%s invalid=%s stopped_early=%s chunks=%s workers=%s seconds=%.3f",
+        csv_path, invalid_count, stopped, len(ranges), workers, seconds,
+    )
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Validate a metadata CSV before insertion.")
+    parser.add_argument("csv_path", help="Path to the metadata CSV file.")
+    parser.add_argument("output_path", help="CSV file receiving the invalid rows.")
+    parser.add_argument("--workers", type=int, default=VALIDATION_WORKERS, help="Worker processes; 1 is serial.")
+    parser.add_argument("--chunk-bytes", type=int, default=VALIDATION_CHUNK_BYTES, help="Bytes validated per task.")
+    parser.add_argument("--max-errors", type=int, default=VALIDATION_MAX_ERRORS, help="Stop after this many invalid rows.")
+    args = parser.parse_args()
+    result = validate_metadata(args.csv_path, args.output_path, args.workers, args.chunk_bytes, args.max_errors)
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,10 @@ import logging
 
 from lab_data_manager import data_validation
 
-from .config import retry_config
+from .config import VALIDATION_ENGINE, retry_config
+from .rate_limiter import record_model_usage, throttle_model_call
+from .utils import validate_metadata_csv
+from .validation_gate import record_validation
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +38,7 @@ prompt =   """
         
         1. **Regular / Experiment Metadata:**
         - Keywords: "regular data", "metadata", "experiment info", "standard".
-        - ACTION: Call `validate_csv`.
+        - ACTION: Call the metadata validation tool (`validate_csv` or `validate_metadata_csv`).
         
         2. **Analysis / Result Metadata:**
         - Keywords: "analysis data", "results", "processed data", "analysis metadata".
@@ -44,16 +47,10 @@ prompt =   """
         *If the type is unclear, ask the user to clarify.*
 
         **OUTPUT PROTOCOL (STRICT):**
-        Analyze the tool's return list (invalid_rows):
-        
-        1. IF the list is EMPTY (0 invalid rows): 
-        Return: `validation_result = {PASS: "All records are valid. No invalid records found."}`
-
-        2. IF the list is NOT EMPTY (Invalid rows found): 
-        Return: `validation_result = {FAIL: "Validation failed. Found invalid rows. See output path."}`
-
-        3. IF the file path or output path are missing:
-        Return: `validation_result = {ERROR: "Missing required inputs."}`
+        - Call exactly one validation tool. Its result is recorded as the validation verdict automatically,
+          and your turn ends with the tool call. Do not restate or interpret the result.
+        - IF the file path or output path are missing: do not call a tool; reply "Missing required inputs."
+          and name the missing input.
     """
 
 try: 
@@ -62,8 +59,15 @@ try:
         model = Gemini(model = "gemini-2.5-flash-lite", api_key=os.getenv("GOOGLE_API_KEY"), retry_options = retry_config),
         description = "An agent to validate  csv metadata file before inserting into the database.",
         instruction = prompt,
-        tools = [FunctionTool(data_validation.validate_csv), FunctionTool(data_validation.validate_analysis_metadata)],
-        output_key = "validation_result"
+        before_model_callback = throttle_model_call,
+        after_model_callback = record_model_usage,
+        # Writes the structured verdict to state["validation_result"] and
+        # ends the turn without a summarising model call.
+        after_tool_callback = record_validation,
+        tools = [
+            FunctionTool(validate_metadata_csv if VALIDATION_ENGINE == "parallel" else data_validation.validate_csv),
+            FunctionTool(data_validation.validate_analysis_metadata),
+        ],
     )
     logger.info("Created agent: %s", data_validation_agent.name)
 except Exception as e:
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .result_cache import normalize_db_path
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Connection tuning
+# ---------------------------------------------------------------------------
+
+MAX_READERS = int(os.getenv("SQLITE_POOL_MAX_READERS", "8"))
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Seconds a connection may sit idle before it is health-checked on checkout.
+HEALTH_CHECK_AFTER = 30.0
+
+_PRAGMAS = (
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA mmap_size = 268435456",     # 256 MiB memory-mapped I/O
+    "PRAGMA cache_size = -65536",       # 64 MiB page cache per connection
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA synchronous = NORMAL",      # safe with WAL
+    "PRAGMA foreign_keys = ON",
+)
+
+
+# Called with every connection the pools open (e.g. to attach SQL tracing).
+_connection_hooks: List[Callable[[sqlite3.Connection], None]] = []
+
+
+def add_connection_hook(hook: Callable[[sqlite3.Connection], None]) -> None:
+    """Run `hook` on each pooled connection opened from now on."""
+    if hook not in _connection_hooks:
+        _connection_hooks.append(hook)
+
+
+def _open_connection(db_path: str, read_only: bool) -> sqlite3.Connection:
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database not found: {db_path}")
+    conn = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,  # connections move between worker threads
+        isolation_level=None,     # explicit BEGIN/COMMIT in write()
+    )
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    if read_only:
+        conn.execute("PRAGMA query_only = ON")
+    for hook in _connection_hooks:
+        hook(conn)
+    return conn
+
+
+def _is_healthy(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("SELECT 1").fetchone()
+        return True
+    except sqlite3.Error:
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Per-database pool
+# ---------------------------------------------------------------------------
+
+class SQLitePool:
+    """Pool of pre-tuned read connections plus one serialized writer.
+
+    SQLite in WAL mode allows many concurrent readers and a single writer,
+    which is exactly what this pool hands out. Connections are created lazily
+    and reused across tool calls and sessions.
+    """
+
+    def __init__(self, db_path: str, max_readers: int = MAX_READERS):
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self._idle: "queue.LifoQueue[tuple[sqlite3.Connection, float]]" = queue.LifoQueue()
+        self._created = 0
+        self._created_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+        self._enable_wal()
+
+    def _enable_wal(self) -> None:
+        # journal_mode is persistent in the file, so this also benefits
+        # connections opened elsewhere (e.g. inside lab_data_manager).
+        conn = _open_connection(self.db_path, read_only=False)
+        try:
+            mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            logger.info("SQLite pool created | db_path=%s journal_mode=%s", self.db_path, mode)
+        finally:
+            conn.close()
+
+    def _checkout_reader(self) -> sqlite3.Connection:
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                with self._created_lock:
+                    can_create = self._created < self.max_readers
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return _open_connection(self.db_path, read_only=True)
+                    except BaseException:
+                        with self._created_lock:
+                            self._created -= 1
+                        raise
+                try:
+                    conn, last_used = self._idle.get(timeout=BUSY_TIMEOUT_MS / 1000)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f"No SQLite connection available for {self.db_path}"
+                    ) from None
+
+            if time.monotonic() - last_used < HEALTH_CHECK_AFTER or _is_healthy(conn):
+                return conn
+            logger.warning("Discarding unhealthy SQLite connection | db_path=%s", self.db_path)
+            self._discard(conn)
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._created_lock:
+            self._created -= 1
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection for the duration of the block."""
+        if self._closed:
+            raise RuntimeError(f"SQLite pool for {self.db_path} is closed")
+        conn = self._checkout_reader()
+        broken = False
+        try:
+            yield conn
+        except sqlite3.DatabaseError:
+            broken = True
+            raise
+        finally:
+            if broken or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """Hold the single writer connection inside one IMMEDIATE transaction."""
+        if self._closed:
+            raise RuntimeError(f"SQLite pool for {self.db_path} is closed")
+        with self._writer_lock:
+            if self._writer is not None and not _is_healthy(self._writer):
+                logger.warning("Replacing unhealthy SQLite writer | db_path=%s", self.db_path)
+                self._close_writer()
+            if self._writer is None:
+                self._writer = _open_connection(self.db_path, read_only=False)
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                self._abort(conn)
+                raise
+            else:
+                try:
+                    conn.execute("COMMIT")
+                except BaseException:
+                    # e.g. SQLITE_BUSY or a deferred constraint: the
+                    # transaction is still open and must not leak into the
+                    # next write.
+                    self._abort(conn)
+                    raise
+
+    def _abort(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            # SQLite may already have rolled back; keep the original error.
+            pass
+        if conn.in_transaction:
+            logger.warning("Discarding SQLite writer stuck in a transaction | db_path=%s", self.db_path)
+            self._close_writer()
+
+    def _close_writer(self) -> None:
+        # Caller holds _writer_lock.
+        try:
+            self._writer.close()
+        except sqlite3.Error:
+            pass
+        self._writer = None
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._close_writer()
+        logger.info("SQLite pool closed | db_path=%s", self.db_path)
+
+
+# ---------------------------------------------------------------------------
+# Process-wide registry
+# ---------------------------------------------------------------------------
+
+_pools: Dict[str, SQLitePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> SQLitePool:
+    """Return the shared pool for a database, creating it on first use."""
+    key = normalize_db_path(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SQLitePool(key)
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools() -> None:
+    """Close every pooled connection. Registered to run at interpreter exit."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_all_pools)
@@ -11,6 +11,7 @@ import logging
 
 from . import utils
 from .config import retry_config
+from .rate_limiter import record_model_usage, throttle_model_call
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +38,8 @@ try:
         model=Gemini(model="gemini-2.5-flash-lite", api_key=os.getenv("GOOGLE_API_KEY"), retry_config=retry_config),
         description = "You delete records based on inferred filter dictionary and operate with user confirmation.",
         instruction = delete_prompt,
+        before_model_callback = throttle_model_call,
+        after_model_callback = record_model_usage,
         tools = [
             FunctionTool(utils.preview_deletion),
             FunctionTool(
@@ -0,0 +1,444 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from .db_pool import get_pool
+from .dimensions import DIMENSION_FIELDS
+from .lab_sql import FILTER_FIELDS, experiment_query
+from .migrations import Migration, apply_migrations
+from .pydantic_models import StrictLabFilters
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Set-based cascading deletes
+# ---------------------------------------------------------------------------
+# A deletion is planned from the schema's foreign keys: the target rows are
+# resolved once, then every table that references them (RawFiles,
+# TrackingFiles, Masks and the analysis link tables for experiments;
+# experiments and their files for a dimension row) gets its own id set,
+# resolved parents-first. Rows are deleted children-first in batches of
+# DELETE_BATCH_ROWS ids, each batch in its own short write transaction, so a
+# large cleanup never holds the write lock for long.
+#
+# The preview stages every id set in STAGING_TABLE under a random token, and
+# the confirmed delete removes exactly those ids by primary key: rows added
+# after the preview are never deleted and the filters are not evaluated
+# again. Session state carries only the token and a checksum of the ids.
+
+DELETE_BATCH_ROWS = int(os.getenv("DELETE_BATCH_ROWS", "5000"))
+# Previews never confirmed are dropped when a newer one is staged.
+PREVIEW_TTL_SECONDS = int(os.getenv("DELETE_PREVIEW_TTL_SECONDS", "86400"))
+
+STAGING_TABLE = "_delete_staging"
+PREVIEWS_TABLE = "_delete_previews"
+
+STAGING_MIGRATION = Migration(
+    5,
+    "deletion_staging",
+    (
+        f"CREATE TABLE IF NOT EXISTS {PREVIEWS_TABLE} ("
+        "token TEXT PRIMARY KEY, table_name TEXT NOT NULL, filters TEXT NOT NULL, "
+        "counts TEXT NOT NULL, checksum TEXT NOT NULL, created_at REAL NOT NULL)",
+        f"CREATE TABLE IF NOT EXISTS {STAGING_TABLE} ("
+        "token TEXT NOT NULL, table_name TEXT NOT NULL, id INTEGER NOT NULL, "
+        "PRIMARY KEY (token, table_name, id)) WITHOUT ROWID",
+    ),
+)
+
+# Tables accepted under a different name by ALLOWED_TABLES.
+_TABLE_NAMES = {"AnalysisResultExperiment": "AnalysisResultExperiments"}
+
+# Filters on a target table's own columns; all other filters select through
+# the experiments the rows belong to.
+_OWN_FILTERS: Dict[str, Dict[str, str]] = {
+    "RawFiles": {"raw_file_id": "id", "raw_file_name": "file_name", "raw_file_type": "file_type"},
+    "TrackingFiles": {"tracking_file_id": "id"},
+    "Masks": {"mask_id": "id", "mask_type": "mask_type", "mask_file_type": "file_type"},
+    "AnalysisFiles": {"analysis_file_id": "id", "analysis_file_type": "file_type"},
+    "AnalysisResults": {"analysis_result_id": "id", "analysis_result_type": "result_type"},
+    "ExperimentAnalysisFiles": {"analysis_file_id": "analysis_file_id"},
+    "AnalysisResultExperiments": {"analysis_result_id": "analysis_result_id"},
+}
+for _key, _spec in DIMENSION_FIELDS.items():
+    _OWN_FILTERS.setdefault(_spec.table, {})[_key] = _spec.column
+
+# Many-to-many tables linking experiments to rows that do not reference them.
+_EXPERIMENT_LINKS = {
+    "AnalysisFiles": ("ExperimentAnalysisFiles", "analysis_file_id"),
+    "AnalysisResults": ("AnalysisResultExperiments", "analysis_result_id"),
+}
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+@dataclass(frozen=True)
+class ForeignKey:
+    child: str
+    column: str
+    parent: str
+    parent_column: str
+
+
+@dataclass
+class DeletePlan:
+    """Rows a deletion removes, per table, in the order they are deleted."""
+
+    table: str
+    filters: Dict[str, object]
+    counts: Dict[str, int] = field(default_factory=dict)
+    order: List[str] = field(default_factory=list)
+    token: Optional[str] = None
+    checksum: Optional[str] = None
+
+    @property
+    def target_count(self) -> int:
+        return self.counts.get(self.table, 0)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+@dataclass
+class DeleteResult:
+    table: str
+    deleted: Dict[str, int]
+    batches: int
+    seconds: float
+
+    @property
+    def total(self) -> int:
+        return sum(self.deleted.values())
+
+
+def foreign_key_graph(conn) -> Dict[str, List[ForeignKey]]:
+    """Map each table to the foreign keys that reference it."""
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )]
+    canonical = {name.lower(): name for name in tables}
+    referenced_by: Dict[str, List[ForeignKey]] = {name: [] for name in tables}
+    for child in tables:
+        for parent, column, target in conn.execute(
+            'SELECT "table", "from", "to" FROM pragma_foreign_key_list(?)', (child,)
+        ):
+            parent = canonical.get(parent.lower(), parent)
+            if parent != child:
+                referenced_by.setdefault(parent, []).append(ForeignKey(child, column, parent, target or "id"))
+    return referenced_by
+
+
+def _cascade_order(graph: Dict[str, List[ForeignKey]], table: str) -> List[str]:
+    """Tables reachable from `table` through referencing rows, parents first."""
+    reachable, stack = {table}, [table]
+    while stack:
+        for fk in graph.get(stack.pop(), []):
+            if fk.child not in reachable:
+                reachable.add(fk.child)
+                stack.append(fk.child)
+    order, done = [], set()
+
+    def visit(name: str, path: frozenset) -> None:
+        if name in done:
+            return
+        if name in path:
+            raise ValueError(f"Foreign-key cycle through '{name}'; cannot plan a cascading delete")
+        # A table is resolved after every reachable table it references.
+        for parent, fks in graph.items():
+            if parent in reachable and parent != name and any(fk.child == name for fk in fks):
+                visit(parent, path | {name})
+        done.add(name)
+        order.append(name)
+
+    for name in sorted(reachable, key=lambda n: n != table):
+        visit(name, frozenset())
+    return order
+
+
+DIMENSION_TABLES = frozenset(spec.table for spec in DIMENSION_FIELDS.values())
+
+
+def _target_sql(db_path: str, table: str, filters: dict, limit: Optional[int]) -> tuple[str, list]:
+    """SELECT of the target row ids for validated filters.
+
+    Experiment accepts every filter. Other tables accept their own columns
+    and, unless they are dimension tables, Experiment-side filters selecting
+    the experiments their rows belong to; filters on unrelated child tables
+    are rejected rather than widened into a join.
+    """
+    if table == "Experiment":
+        query = experiment_query(filters, db_path)
+        query.columns = ["e.id"]
+        sql, params = query.relation_sql()
+    else:
+        own = _OWN_FILTERS.get(table, {})
+        unsupported = sorted(
+            key for key in filters
+            if key not in own and (table in DIMENSION_TABLES or FILTER_FIELDS[key].child)
+        )
+        if unsupported:
+            raise ValueError(f"Filters {unsupported} cannot select rows of '{table}'")
+        where, params = [], []
+        for key, value in filters.items():
+            if key in own:
+                where.append(f't."{own[key]}" = ?')
+                params.append(value)
+        experiment_filters = {key: value for key, value in filters.items() if key not in own}
+        if experiment_filters:
+            query = experiment_query(experiment_filters, db_path)
+            query.columns = ["e.id"]
+            experiments, experiment_params = query.relation_sql()
+            if table in _EXPERIMENT_LINKS:
+                link, column = _EXPERIMENT_LINKS[table]
+                where.append(f"t.id IN (SELECT {column} FROM {link} WHERE experiment_id IN ({experiments}))")
+            elif table in _OWN_FILTERS:
+                where.append(f"t.experiment_id IN ({experiments})")
+            else:
+                raise ValueError(f"Filters {sorted(experiment_filters)} cannot select rows of '{table}'")
+            params.extend(experiment_params)
+        sql = f'SELECT t.id FROM "{table}" t' + (f" WHERE {' AND '.join(where)}" if where else "")
+    if limit:
+        sql = f"SELECT id FROM ({sql}) ORDER BY id LIMIT ?"
+        params = [*params, int(limit)]
+    return sql, params
+
+
+def _cascade_sql(
+    graph: Dict[str, List[ForeignKey]], name: str, id_sets: Dict[str, tuple[str, list]]
+) -> tuple[str, list]:
+    """SELECT of the `name` rows referencing any already resolved id set."""
+    selects, params = [], []
+    for parent, fks in graph.items():
+        if parent not in id_sets:
+            continue
+        for fk in fks:
+            if fk.child == name:
+                parent_sql, parent_params = id_sets[parent]
+                selects.append(
+                    f'SELECT id FROM "{name}" WHERE "{fk.column}" IN '
+                    f'(SELECT "{fk.parent_column}" FROM "{parent}" WHERE id IN ({parent_sql}))'
+                )
+                params.extend(parent_params)
+    return " UNION ".join(selects), params
+
+
+def _staged_sql(token: str, table: str) -> tuple[str, list]:
+    return f"SELECT id FROM {STAGING_TABLE} WHERE token = ? AND table_name = ?", [token, table]
+
+
+def _resolve(
+    conn, db_path: str, table: str, filters: dict, limit: Optional[int], token: Optional[str] = None
+) -> DeletePlan:
+    """Count the rows to delete per table, staging their ids under `token`.
+
+    Without a token each id set is a subquery over its parents' sets, which
+    a read-only connection can count. With one every set is materialised
+    once into STAGING_TABLE and the following sets read it from there.
+    """
+    graph = foreign_key_graph(conn)
+    if table not in graph:
+        raise ValueError(f"Unknown table '{table}'")
+    plan = DeletePlan(table, filters, token=token)
+    resolve_order = _cascade_order(graph, table)
+    id_sets: Dict[str, tuple[str, list]] = {}
+    for name in resolve_order:
+        if name == table:
+            sql, params = _target_sql(db_path, table, filters, limit)
+        else:
+            sql, params = _cascade_sql(graph, name, id_sets)
+        if token is not None:
+            conn.execute(f"INSERT OR IGNORE INTO {STAGING_TABLE} (token, table_name, id) SELECT ?, ?, id FROM ({sql})",
+                         [token, name, *params])
+            sql, params = _staged_sql(token, name)
+        id_sets[name] = (sql, params)
+        plan.counts[name] = conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+    plan.order = [name for name in reversed(resolve_order) if plan.counts[name]]
+    return plan
+
+
+def _checksum(conn, token: str) -> str:
+    """Digest of every id staged under a token, table by table."""
+    digest = hashlib.sha256()
+    cursor = conn.execute(
+        f"SELECT table_name, id FROM {STAGING_TABLE} WHERE token = ? ORDER BY table_name, id", (token,)
+    )
+    while True:
+        rows = cursor.fetchmany(10_000)
+        if not rows:
+            break
+        digest.update("".join(f"{name}:{row_id}," for name, row_id in rows).encode())
+    return digest.hexdigest()
+
+
+def _clean_filters(table: str, filters: dict) -> tuple[str, dict]:
+    table = _TABLE_NAMES.get(table, table)
+    clean = StrictLabFilters(**(filters or {})).model_dump(exclude_none=True)
+    if not clean:
+        raise ValueError("Refusing to plan a deletion without filters")
+    return table, clean
+
+
+def plan_deletion(db_path: str, table: str, filters: dict, limit: Optional[int] = None) -> DeletePlan:
+    """Dry run: count the rows a deletion would remove from each table.
+
+    Raises:
+        ValueError: for empty or invalid filters, unknown tables, or filters
+            that cannot select rows of `table`.
+    """
+    table, clean = _clean_filters(table, filters)
+    with get_pool(db_path).read() as conn:
+        plan = _resolve(conn, db_path, table, clean, limit)
+    logger.info("Deletion planned | table=%s counts=%s", table, plan.counts)
+    return plan
+
+
+def stage_deletion(db_path: str, table: str, filters: dict, limit: Optional[int] = None) -> DeletePlan:
+    """Preview a deletion and stage the ids it would remove.
+
+    Returns:
+        The plan with its token and checksum. Nothing is staged when no
+        target rows match (token is None).
+
+    Raises:
+        ValueError: as for plan_deletion.
+    """
+    table, clean = _clean_filters(table, filters)
+    apply_migrations(db_path, [STAGING_MIGRATION])
+    token = uuid.uuid4().hex
+    with get_pool(db_path).write() as conn:
+        _prune_previews(conn, time.time() - PREVIEW_TTL_SECONDS)
+        plan = _resolve(conn, db_path, table, clean, limit, token=token)
+        if plan.target_count:
+            plan.checksum = _checksum(conn, token)
+            conn.execute(
+                f"INSERT INTO {PREVIEWS_TABLE} (token, table_name, filters, counts, checksum, created_at) "
+                f"VALUES (?, ?, ?, ?, ?, ?)",
+                (token, table, json.dumps(clean, default=str), json.dumps(plan.counts), plan.checksum, time.time()),
+            )
+        else:
+            conn.execute(f"DELETE FROM {STAGING_TABLE} WHERE token = ?", (token,))
+            plan.token = None
+    logger.info("Deletion staged | table=%s token=%s counts=%s", table, plan.token, plan.counts)
+    return plan
+
+
+def _prune_previews(conn, before: float) -> None:
+    for (token,) in conn.execute(f"SELECT token FROM {PREVIEWS_TABLE} WHERE created_at < ?", (before,)).fetchall():
+        _discard(conn, token)
+
+
+def _discard(conn, token: str) -> None:
+    conn.execute(f"DELETE FROM {STAGING_TABLE} WHERE token = ?", (token,))
+    conn.execute(f"DELETE FROM {PREVIEWS_TABLE} WHERE token = ?", (token,))
+
+
+def discard_deletion(db_path: str, token: str) -> None:
+    """Drop a staged preview that will not be executed."""
+    with get_pool(db_path).write() as conn:
+        _discard(conn, token)
+
+
+def _unstaged_references(conn, token: str, counts: Dict[str, int]) -> Dict[str, int]:
+    """Rows added since the preview that reference a staged row."""
+    graph = foreign_key_graph(conn)
+    added: Dict[str, int] = {}
+    for parent in counts:
+        for fk in graph.get(parent, []):
+            staged_parent, parent_params = _staged_sql(token, parent)
+            staged_child, child_params = _staged_sql(token, fk.child)
+            n = conn.execute(
+                f'SELECT COUNT(*) FROM "{fk.child}" WHERE "{fk.column}" IN '
+                f'(SELECT "{fk.parent_column}" FROM "{parent}" WHERE id IN ({staged_parent})) '
+                f"AND id NOT IN ({staged_child})",
+                [*parent_params, *child_params],
+            ).fetchone()[0]
+            if n:
+                added[fk.child] = added.get(fk.child, 0) + n
+    return added
+
+
+def execute_delete(
+    db_path: str,
+    token: str,
+    checksum: str,
+    batch_rows: int = DELETE_BATCH_ROWS,
+    progress: Optional[ProgressCallback] = None,
+) -> DeleteResult:
+    """Delete exactly the rows staged by stage_deletion, in batches.
+
+    Each batch of at most `batch_rows` staged ids per table is deleted and
+    committed on its own. Children are emptied before the rows they
+    reference, so a run stopped part-way never leaves dangling foreign keys.
+    Staged rows already deleted by someone else are skipped.
+
+    Args:
+        token:    Token returned by stage_deletion.
+        checksum: Checksum returned with it; the staged ids must still match.
+        progress: Called as progress(table, deleted_so_far, table_total)
+                  after every batch.
+
+    Raises:
+        ValueError: if the preview is unknown or expired, the staged ids no
+            longer match the checksum, or rows referencing the staged ones
+            were added since the preview (the preview must be repeated).
+    """
+    pool = get_pool(db_path)
+    started = time.perf_counter()
+    apply_migrations(db_path, [STAGING_MIGRATION])
+    # A preview is executed at most once: its staged ids are dropped whether
+    # the delete completes, fails validation or stops part-way.
+    try:
+        with pool.write() as conn:
+            row = conn.execute(
+                f"SELECT table_name, counts FROM {PREVIEWS_TABLE} WHERE token = ?", (token,)
+            ).fetchone()
+            if row is None:
+                raise ValueError("Deletion preview not found or expired; preview again")
+            table, counts = row[0], json.loads(row[1])
+            if _checksum(conn, token) != checksum:
+                raise ValueError("Staged ids do not match the preview checksum; preview again")
+            added = _unstaged_references(conn, token, counts)
+            if added:
+                raise ValueError(f"Rows referencing the previewed records were added since the preview: {added}")
+        # counts is stored in resolution order, parents first.
+        order = [name for name in reversed(list(counts)) if counts[name]]
+        deleted = {name: 0 for name in order}
+        batches = 0
+        for name in order:
+            staged, params = _staged_sql(token, name)
+            last_id = 0
+            while True:
+                with pool.write() as conn:
+                    bound = conn.execute(
+                        f"SELECT MAX(id) FROM ({staged} AND id > ? ORDER BY id LIMIT ?)",
+                        [*params, last_id, batch_rows],
+                    ).fetchone()[0]
+                    if bound is None:
+                        break
+                    cursor = conn.execute(
+                        f'DELETE FROM "{name}" WHERE id IN ({staged} AND id > ? AND id <= ?)',
+                        [*params, last_id, bound],
+                    )
+                    deleted[name] += cursor.rowcount
+                last_id = bound
+                batches += 1
+                logger.info("Delete batch | table=%s deleted=%s/%s", name, deleted[name], counts[name])
+                if progress is not None:
+                    progress(name, deleted[name], counts[name])
+    finally:
+        discard_deletion(db_path, token)
+    result = DeleteResult(table, deleted, batches, time.perf_counter() - started)
+    logger.info(
+        "Deletion complete | table=%s deleted=%s batches=%s seconds=%.2f",
+        table, result.deleted, result.batches, result.seconds,
+    )
+    return result
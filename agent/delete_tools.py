@@ -0,0 +1,233 @@
+"""Deletion tools: preview a deletion, then execute it after confirmation.
+
+The preview stages the matching ids in the database (see delete_planner) and
+keeps only a token and checksum in session state; execution deletes exactly
+those ids once the platform confirmation has been approved.
+"""
+
+from __future__ import annotations
+
+import re
+import logging
+from typing import Any, Dict
+
+try:
+    from google.adk.tools.tool_context import ToolContext
+except ImportError:  # The tools only use .state and .tool_confirmation.
+    ToolContext = Any
+
+from .delete_planner import discard_deletion, execute_delete, stage_deletion
+from .pydantic_models import ALLOWED_TABLES, StrictLabFilters, TABLE_ALIASES
+from .result_cache import invalidate_db
+from .tool_executor import offload
+
+
+logger = logging.getLogger(__name__)
+
+
+# ADK State is mapping-like but does not implement dict.pop(). Assigning None
+# records a state delta and makes subsequent pending-deletion checks evaluate
+# as empty.
+def clear_pending_deletion(tool_context: ToolContext, discard: bool = True) -> None:
+    pending = tool_context.state.get("pending_deletion")
+    if discard and pending and pending.get("token"):
+        # Staged ids left behind are also dropped once they expire.
+        try:
+            discard_deletion(pending["db_path"], pending["token"])
+        except Exception:
+            logger.exception("Could not discard staged deletion | token=%s", pending["token"])
+    tool_context.state["pending_deletion"] = None
+
+
+# -----------------------------------------------------------------
+# Table name normalisation (replaces DeletionSchema.map_table_names)
+# -----------------------------------------------------------------
+
+def resolve_table_name(table: str) -> str:
+    """Map natural language aliases to canonical table names.
+
+    For example, "track" maps to "TrackingFiles" and "raw files" maps to
+    "RawFiles".
+    Returns the input unchanged if no alias matches.
+    """
+    name = table.strip().lower()
+    for alias, canonical in TABLE_ALIASES.items():
+        if re.search(rf'\b{alias}\b', name):
+            return canonical
+    return table
+
+
+# -----------------------------------------------------------------
+# Delete operation utilities
+# -----------------------------------------------------------------
+
+@offload(max_concurrency=4)
+def preview_deletion(tool_context: ToolContext, db_path: str, table: str, filters: dict, limit: int | None = None) -> Dict[str, Any]:
+    """
+    Validates filters, performs a dry-run, and stores the pending operation in
+    session state. Does NOT delete anything.
+    """
+    # --- Resolve table alias ("track" → "TrackingFiles") ---
+    table = resolve_table_name(table)
+
+    # --- Safety checks ---
+    if not table:
+        logger.warning("preview_deletion blocked: no table specified")
+        return {"status": "blocked", "message": "No table specified. Please provide a table name."}
+    if not filters:
+        logger.warning("preview_deletion blocked: empty filters for table=%s", table)
+        return {
+            "status": "blocked",
+            "message": (
+                f"No filter criteria provided. Deleting without filters would remove "
+                f"ALL records from '{table}'. Please specify criteria (e.g. date, organism, is_valid)."
+            ),
+        }
+    if table not in ALLOWED_TABLES:
+        logger.warning("preview_deletion blocked: unsupported table=%s", table)
+        return {
+            "status": "blocked",
+            "message": f"Unsupported table name: '{table}'.",
+        }
+
+    # Validate again at the database boundary and reject unsupported fields.
+    try:
+        validated = StrictLabFilters(**filters)
+        clean_filters = validated.model_dump(exclude_none=True)
+    except Exception as e:
+        logger.warning("preview_deletion blocked: invalid filters | %s", e)
+        return {
+            "status": "blocked",
+            "message": f"Invalid filter fields: {e}",
+        }
+
+    logger.info("preview_deletion | table=%s filters=%s", table, clean_filters)
+    # A new preview supersedes any earlier one that was never confirmed.
+    clear_pending_deletion(tool_context)
+    try:
+        plan = stage_deletion(db_path, table, clean_filters, limit)
+    except Exception as e:
+        logger.exception(
+            "preview_deletion failed | table=%s filters=%s",
+            table,
+            clean_filters,
+        )
+        return {
+            "status": "error",
+            "message": f"Deletion preview failed: {e}",
+        }
+
+    preview_count = plan.target_count
+    if preview_count <= 0:
+        return {
+            "status": "no_matches",
+            "preview_count": 0,
+            "message": "No records matched the deletion criteria.",
+        }
+
+    # The previewed ids are staged in the database; execute_deletion on the
+    # next turn needs only the token and the checksum of those ids.
+    tool_context.state["pending_deletion"] = {
+        "db_path": db_path,
+        "table": table,
+        "token": plan.token,
+        "checksum": plan.checksum,
+        "preview_count": preview_count,
+    }
+    logger.info("preview_deletion stored in state | token=%s cascade=%s", plan.token, plan.counts)
+    dependents = {name: n for name, n in plan.counts.items() if name != plan.table and n}
+    return {
+        "status": "preview",
+        "preview_count": preview_count,
+        "cascade_counts": plan.counts,
+        "message": (
+            f"{preview_count} record(s) from '{table}' would be deleted.\n"
+            + (f"Dependent rows also deleted: {dependents}\n" if dependents else "")
+            + f"Filters applied: {clean_filters}\n"
+            "Review the platform confirmation request to approve or reject deletion."
+        ),
+    }
+
+
+@offload(max_concurrency=1)
+def execute_deletion(tool_context: ToolContext) -> Dict[str, Any]:
+    """
+    Handles the confirmed or rejected deletion that was previewed previously.
+    Reads db_path, the preview token and its checksum from session state key
+    'pending_deletion' and deletes exactly the rows staged by the preview.
+    This tool must be registered with confirmation required.
+    Pending state is cleared after approval, rejection, or execution failure.
+    """
+    pending = tool_context.state.get("pending_deletion")
+    if not pending:
+        logger.warning("execute_deletion called but no pending_deletion in state")
+        return {
+            "status": "error",
+            "message": "No pending deletion found. Please submit a new delete request.",
+        }
+
+    confirmation = getattr(tool_context, "tool_confirmation", None)
+    if confirmation is None:
+        logger.error("execute_deletion called without confirmation context")
+        clear_pending_deletion(tool_context)
+        return {
+            "status": "error",
+            "message": "Deletion was not executed because confirmation was unavailable.",
+        }
+
+    if not confirmation.confirmed:
+        clear_pending_deletion(tool_context)
+        logger.info("execute_deletion denied | table=%s", pending["table"])
+        return {
+            "status": "cancelled",
+            "message": "Deletion cancelled. No records were removed.",
+        }
+
+    db_path  = pending["db_path"]
+    table    = pending["table"]
+    token    = pending["token"]
+    checksum = pending["checksum"]
+
+    # The request has reached a terminal approved state. Remove it before
+    # execution so a database failure cannot leave an old deletion pending.
+    clear_pending_deletion(tool_context, discard=False)
+
+    logger.info("execute_deletion | table=%s token=%s", table, token)
+    try:
+        result = execute_delete(db_path, token, checksum)
+    except ValueError as e:
+        # The preview no longer matches the database; nothing was deleted.
+        logger.warning("execute_deletion refused | table=%s token=%s | %s", table, token, e)
+        return {
+            "status": "error",
+            "message": f"Deletion was not executed: {e}",
+        }
+    except Exception as e:
+        logger.exception(
+            "execute_deletion failed | table=%s token=%s",
+            table,
+            token,
+        )
+        # Batches commit one at a time, so a failure can follow partial progress.
+        invalidate_db(db_path)
+        return {
+            "status": "error",
+            "message": (
+                f"Deletion stopped with an error: {e}. Batches committed before "
+                "the error stay deleted; preview again to see what remains."
+            ),
+        }
+
+    logger.info("execute_deletion complete | deleted=%s batches=%s", result.deleted, result.batches)
+    invalidate_db(db_path)
+    deleted = result.deleted.get(result.table, 0)
+    dependents = {name: n for name, n in result.deleted.items() if name != result.table}
+    return {
+        "status": "completed",
+        "deleted_count": deleted,
+        "deleted_by_table": result.deleted,
+        "message": (
+            f"Successfully deleted {deleted} record(s) from '{table}'."
+            + (f" Dependent rows deleted: {dependents}." if dependents else "")
+        ),
+    }
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import string
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional
+
+from .db_pool import get_pool
+from .result_cache import db_version, normalize_db_path
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# In-process dimension dictionary
+# ---------------------------------------------------------------------------
+# Dimension tables (Organism, Protein, ...) hold a few hundred rows at most,
+# while Experiment holds the facts. Filters on dimension attributes are
+# resolved here to sets of ids, so Experiment queries test indexed foreign
+# keys with `IN (...)` instead of joining and comparing NOCASE strings, and
+# a value that names nothing is answered without querying at all.
+#
+# The dictionary is reloaded whenever the database fingerprint changes
+# (result_cache.db_version). Matching follows SQLite: COLLATE NOCASE folds
+# ASCII letters only, and REAL columns never equal stored text such as 'n/a'.
+
+@dataclass(frozen=True)
+class DimensionField:
+    table: str
+    column: str
+    fk: str
+    kind: str  # "nocase" or "real"
+
+
+DIMENSION_FIELDS: Dict[str, DimensionField] = {
+    "organism": DimensionField("Organism", "organism_name", "organism_id", "nocase"),
+    "protein": DimensionField("Protein", "protein_name", "protein_id", "nocase"),
+    "strain": DimensionField("StrainOrCellLine", "strain_name", "strain_id", "nocase"),
+    "condition": DimensionField("Condition", "condition_name", "condition_id", "nocase"),
+    "concentration_value": DimensionField("Condition", "concentration_value", "condition_id", "real"),
+    "concentration_unit": DimensionField("Condition", "concentration_unit", "condition_id", "nocase"),
+    "user_name": DimensionField("User", "user_name", "user_id", "nocase"),
+    "email": DimensionField("User", "email", "user_id", "nocase"),
+    "capture_type": DimensionField("CaptureSetting", "capture_type", "capture_setting_id", "nocase"),
+    "exposure_time": DimensionField("CaptureSetting", "exposure_time", "capture_setting_id", "real"),
+    "time_interval": DimensionField("CaptureSetting", "time_interval", "capture_setting_id", "real"),
+    "dye_concentration_value": DimensionField("CaptureSetting", "dye_concentration_value", "capture_setting_id", "real"),
+    "dye_concentration_unit": DimensionField("CaptureSetting", "dye_concentration_unit", "capture_setting_id", "nocase"),
+}
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _match_key(kind: str, value: Any) -> Optional[Any]:
+    """Comparison key under SQLite semantics, or None if the value can never match."""
+    if value is None or isinstance(value, bool):
+        return None
+    if kind == "nocase":
+        return value.translate(_ASCII_LOWER) if isinstance(value, str) else None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+class DimensionDictionary:
+    """Value -> id sets for every DIMENSION_FIELDS column of one database."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._version: Optional[tuple] = None
+        self._index: Dict[str, Dict[Any, FrozenSet[int]]] = {}
+
+    def _load(self) -> None:
+        index: Dict[str, Dict[Any, set]] = {key: {} for key in DIMENSION_FIELDS}
+        tables: Dict[str, list] = {}
+        for key, spec in DIMENSION_FIELDS.items():
+            tables.setdefault(spec.table, []).append(key)
+        with get_pool(self.db_path).read() as conn:
+            for table, keys in tables.items():
+                columns = ", ".join(DIMENSION_FIELDS[key].column for key in keys)
+                for row in conn.execute(f"SELECT id, {columns} FROM {table}"):
+                    for key, value in zip(keys, row[1:]):
+                        match = _match_key(DIMENSION_FIELDS[key].kind, value)
+                        if match is not None:
+                            index[key].setdefault(match, set()).add(row[0])
+        self._index = {key: {v: frozenset(ids) for v, ids in values.items()} for key, values in index.items()}
+        logger.info(
+            "Dimension dictionary loaded | db_path=%s values=%s",
+            self.db_path, sum(len(values) for values in self._index.values()),
+        )
+
+    def resolve(self, filters: Dict[str, Any]) -> Dict[str, FrozenSet[int]]:
+        """Map validated filters to the Experiment foreign keys and ids they allow.
+
+        Conditions on the same table are intersected, since they must hold for
+        the same dimension row. Filters that are not dimension attributes are
+        ignored. An empty set means nothing can match.
+        """
+        with self._lock:
+            version = db_version(self.db_path)
+            if version is None or version != self._version:
+                self._load()
+                self._version = version
+            index = self._index
+        allowed: Dict[str, FrozenSet[int]] = {}
+        for key, value in filters.items():
+            spec = DIMENSION_FIELDS.get(key)
+            if spec is None:
+                continue
+            ids = index[key].get(_match_key(spec.kind, value), frozenset())
+            allowed[spec.fk] = allowed[spec.fk] & ids if spec.fk in allowed else ids
+        return allowed
+
+
+_dictionaries: Dict[str, DimensionDictionary] = {}
+_dictionaries_lock = threading.Lock()
+
+
+def get_dictionary(db_path: str) -> DimensionDictionary:
+    key = normalize_db_path(db_path)
+    with _dictionaries_lock:
+        dictionary = _dictionaries.get(key)
+        if dictionary is None:
+            dictionary = DimensionDictionary(key)
+            _dictionaries[key] = dictionary
+        return dictionary
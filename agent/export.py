@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import os
+import csv
+import json
+import time
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+from .db_pool import get_pool
+from .lab_sql import PagedQuery
+
+try:  # Parquet export is optional.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Streaming export of listing queries
+# ---------------------------------------------------------------------------
+# Rows go straight from the SQLite cursor to the output file in fixed-size
+# batches; nothing is collected in a DataFrame, so memory stays flat however
+# many rows match.
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "./exports")
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+_WRITE_BUFFER = 1 << 20
+
+# Columns written as int64 in Parquet; everything else is stored as text
+# because SQLite columns may mix numbers and strings (e.g. 'n/a').
+_INTEGER_COLUMNS = frozenset({"replicate", "max_frame_gap", "camera_binning"})
+
+
+@dataclass
+class ExportResult:
+    path: str
+    rows: int
+    bytes: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+
+def _batches(conn, query: PagedQuery) -> tuple[List[str], Iterator[List[tuple]]]:
+    """Open the full listing (no LIMIT) and yield it in EXPORT_BATCH_ROWS chunks."""
+    sql, params = query.select_sql()
+    cursor = conn.execute(sql[: sql.rindex(" LIMIT ?")], params)
+    width = len(query.key)
+    columns = [d[0] for d in cursor.description][:-width]
+
+    def generate() -> Iterator[List[tuple]]:
+        try:
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_ROWS)
+                if not rows:
+                    return
+                yield [row[:-width] for row in rows]
+        finally:
+            cursor.close()
+
+    return columns, generate()
+
+
+def _write_csv(path: str, columns: List[str], batches: Iterator[List[tuple]], metadata: Dict[str, Any]) -> int:
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8", buffering=_WRITE_BUFFER) as handle:
+        for key, value in metadata.items():
+            handle.write(f"# {key}: {json.dumps(value) if not isinstance(value, str) else value}\n")
+        writer = csv.writer(handle)
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows(batch)
+            rows += len(batch)
+    return rows
+
+
+def _write_jsonl(path: str, columns: List[str], batches: Iterator[List[tuple]], metadata: Dict[str, Any]) -> int:
+    rows = 0
+    with open(path, "w", encoding="utf-8", buffering=_WRITE_BUFFER) as handle:
+        handle.write(json.dumps({"_metadata": metadata}) + "\n")
+        for batch in batches:
+            handle.writelines(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in batch)
+            rows += len(batch)
+    return rows
+
+
+def _arrow_schema(columns: List[str], metadata: Dict[str, Any]):
+    fields = [
+        pa.field(name, pa.int64() if name.endswith("_id") or name in _INTEGER_COLUMNS else pa.string())
+        for name in columns
+    ]
+    return pa.schema(fields, metadata={"lab_export": json.dumps(metadata)})
+
+
+def _write_parquet(path: str, columns: List[str], batches: Iterator[List[tuple]], metadata: Dict[str, Any]) -> int:
+    schema = _arrow_schema(columns, metadata)
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            arrays = []
+            for index, field in enumerate(schema):
+                values = [row[index] for row in batch]
+                if pa.types.is_string(field.type):
+                    values = [None if v is None else str(v) for v in values]
+                arrays.append(pa.array(values, type=field.type))
+            # One row group per batch, written as soon as it is read.
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(batch)
+    return rows
+
+
+_WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet}
+
+
+def default_export_path(name: str, fmt: str) -> str:
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(EXPORT_DIR, f"{name}_{stamp}.{fmt}")
+
+
+def resolve_export_path(output_path: str, db_path: str) -> str:
+    """Resolve a requested export destination inside EXPORT_DIR.
+
+    Relative paths are taken relative to EXPORT_DIR unless they already point
+    into it. Symlinks are resolved before the check, so a link cannot lead
+    out of the folder.
+
+    Raises:
+        ValueError: if the path leaves EXPORT_DIR, names an existing file, or
+            names the database or one of its -wal/-shm/-journal files.
+    """
+    base = os.path.realpath(EXPORT_DIR)
+    requested = os.path.expanduser(output_path)
+    candidate = os.path.realpath(requested)
+    if not os.path.isabs(requested) and os.path.commonpath([base, candidate]) != base:
+        candidate = os.path.realpath(os.path.join(base, requested))
+    if os.path.commonpath([base, candidate]) != base or candidate == base:
+        raise ValueError(f"Exports must be written inside {EXPORT_DIR}; got {output_path!r}.")
+    database = os.path.realpath(db_path)
+    if candidate in {database, *(database + suffix for suffix in ("-wal", "-shm", "-journal"))}:
+        raise ValueError("The export path names the database itself.")
+    if os.path.lexists(candidate):
+        raise ValueError(f"{output_path!r} already exists; choose a new file name.")
+    return candidate
+
+
+def export_query(db_path: str, query: PagedQuery, fmt: str, output_path: str, metadata: Dict[str, Any]) -> ExportResult:
+    """Stream every row of a listing query to a CSV, JSON Lines or Parquet file.
+
+    Args:
+        db_path:     Path to the SQLite database file.
+        query:       Listing to export (its LIMIT is dropped).
+        fmt:         "csv", "jsonl" or "parquet".
+        output_path: Destination file, resolved with resolve_export_path;
+                     parent directories are created. An existing file is
+                     never replaced.
+        metadata:    Written as a header (CSV comment lines, the first JSONL
+                     record, or Parquet schema metadata).
+
+    Returns:
+        The written path, row count, file size and elapsed time.
+
+    Raises:
+        ValueError: for unknown formats, when pyarrow is missing for Parquet,
+            or for a destination resolve_export_path rejects.
+    """
+    fmt = fmt.lower()
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format '{fmt}'; expected one of {sorted(_WRITERS)}")
+    if fmt == "parquet" and pa is None:
+        raise ValueError("Parquet export needs pyarrow; install it or export as csv/jsonl.")
+    output_path = resolve_export_path(output_path, db_path)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    started = time.perf_counter()
+    partial = output_path + ".partial"
+    try:
+        with get_pool(db_path).read() as conn:
+            columns, batches = _batches(conn, query)
+            rows = _WRITERS[fmt](partial, columns, batches, metadata)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    try:
+        # A hard link fails if the destination appeared meanwhile, so a file
+        # created after the check is never overwritten.
+        os.link(partial, output_path)
+    except FileExistsError:
+        raise ValueError(f"{output_path!r} already exists; choose a new file name.") from None
+    finally:
+        os.remove(partial)
+    result = ExportResult(output_path, rows, os.path.getsize(output_path), time.perf_counter() - started)
+    logger.info(
+        "Exported query | path=%s format=%s rows=%s bytes=%s rows_per_s=%.0f",
+        result.path, fmt, result.rows, result.bytes, result.rows_per_second,
+    )
+    return result
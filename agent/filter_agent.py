@@ -9,6 +9,7 @@ import logging
 from datetime import datetime
 
 from .config import retry_config
+from .rate_limiter import record_model_usage, throttle_model_call
 from .pydantic_models import DeletionSchema
 
 logger = logging.getLogger(__name__)
@@ -57,6 +58,8 @@ try:
         model = Gemini(model="gemini-2.5-flash-lite", api_key=os.getenv("GOOGLE_API_KEY"), retry_config=retry_config),
         description = "An agent to infer SQL filters from user requests for the following delete/ search operations.",
         instruction = filter_prompt,
+        before_model_callback = throttle_model_call,
+        after_model_callback = record_model_usage,
         output_schema=DeletionSchema,
         output_key="filters"
     )
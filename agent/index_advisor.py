@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import json
+import time
+import logging
+import argparse
+import statistics
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from .db_pool import get_pool
+from .migrations import Migration, apply_migrations
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Query shapes
+# ---------------------------------------------------------------------------
+# Representative versions of the joins issued by the lab_data_manager query
+# builders: dimension filters resolved through Experiment foreign keys, date
+# ranges, and the one-to-many file tables joined on experiment_id. Each shape
+# lists the (table, columns) indexes it can use.
+
+@dataclass(frozen=True)
+class QueryShape:
+    name: str
+    sql: str
+    candidates: tuple[tuple[str, tuple[str, ...]], ...]
+
+
+QUERY_SHAPES: tuple[QueryShape, ...] = (
+    QueryShape(
+        "experiments_by_protein",
+        "SELECT e.id, e.date FROM Experiment e JOIN Protein p ON p.id = e.protein_id "
+        "WHERE p.protein_name = (SELECT protein_name FROM Protein LIMIT 1)",
+        (("Experiment", ("protein_id", "date")),),
+    ),
+    QueryShape(
+        "experiments_by_condition",
+        "SELECT e.id, e.date FROM Experiment e JOIN Condition c ON c.id = e.condition_id "
+        "WHERE c.condition_name = (SELECT condition_name FROM Condition LIMIT 1)",
+        (("Experiment", ("condition_id", "date")),),
+    ),
+    QueryShape(
+        "experiments_by_user",
+        "SELECT e.id, e.date FROM Experiment e JOIN User u ON u.id = e.user_id "
+        "WHERE u.user_name = (SELECT user_name FROM User LIMIT 1)",
+        (("Experiment", ("user_id", "date")),),
+    ),
+    QueryShape(
+        "experiments_by_strain",
+        "SELECT e.id FROM Experiment e JOIN StrainOrCellLine s ON s.id = e.strain_id "
+        "WHERE s.strain_name = (SELECT strain_name FROM StrainOrCellLine LIMIT 1)",
+        (("Experiment", ("strain_id",)),),
+    ),
+    QueryShape(
+        "experiments_by_capture_type",
+        "SELECT e.id FROM Experiment e JOIN CaptureSetting cs ON cs.id = e.capture_setting_id "
+        "WHERE cs.capture_type = (SELECT capture_type FROM CaptureSetting LIMIT 1)",
+        (("Experiment", ("capture_setting_id",)),),
+    ),
+    QueryShape(
+        "experiments_by_organism",
+        "SELECT e.id FROM Experiment e JOIN Organism o ON o.id = e.organism_id "
+        "WHERE o.organism_name = (SELECT organism_name FROM Organism LIMIT 1)",
+        (("Experiment", ("organism_id",)),),
+    ),
+    QueryShape(
+        "experiments_by_date_range",
+        "SELECT e.id, e.date FROM Experiment e "
+        "WHERE e.date BETWEEN '20230101' AND '20231231' ORDER BY e.date, e.id",
+        (("Experiment", ("date", "id")),),
+    ),
+    QueryShape(
+        "raw_files_by_type",
+        "SELECT r.experiment_id, r.file_name FROM RawFiles r "
+        "WHERE r.file_type = (SELECT file_type FROM RawFiles LIMIT 1)",
+        (("RawFiles", ("file_type", "experiment_id")),),
+    ),
+    QueryShape(
+        "raw_files_for_experiments",
+        "SELECT r.file_name FROM Experiment e JOIN RawFiles r ON r.experiment_id = e.id "
+        "WHERE e.protein_id = (SELECT MIN(id) FROM Protein)",
+        (("Experiment", ("protein_id", "date")), ("RawFiles", ("experiment_id",))),
+    ),
+    QueryShape(
+        "tracking_files_for_experiments",
+        "SELECT t.file_name FROM Experiment e JOIN TrackingFiles t ON t.experiment_id = e.id "
+        "WHERE e.protein_id = (SELECT MIN(id) FROM Protein)",
+        (("Experiment", ("protein_id", "date")), ("TrackingFiles", ("experiment_id",))),
+    ),
+    QueryShape(
+        "masks_by_type",
+        "SELECT m.experiment_id FROM Masks m WHERE m.mask_type = (SELECT mask_type FROM Masks LIMIT 1)",
+        (("Masks", ("mask_type", "experiment_id")),),
+    ),
+    QueryShape(
+        "experiments_missing_masks",
+        "SELECT e.id FROM Experiment e "
+        "WHERE NOT EXISTS (SELECT 1 FROM Masks m WHERE m.experiment_id = e.id)",
+        (("Masks", ("experiment_id",)),),
+    ),
+    QueryShape(
+        "analysis_results_for_experiments",
+        "SELECT ar.result_type FROM Experiment e "
+        "JOIN AnalysisResultExperiments are_ ON are_.experiment_id = e.id "
+        "JOIN AnalysisResults ar ON ar.id = are_.analysis_result_id "
+        "WHERE e.protein_id = (SELECT MIN(id) FROM Protein)",
+        (("Experiment", ("protein_id", "date")), ("AnalysisResultExperiments", ("experiment_id", "analysis_result_id"))),
+    ),
+    QueryShape(
+        "analysis_files_for_experiments",
+        "SELECT af.file_name FROM Experiment e "
+        "JOIN ExperimentAnalysisFiles eaf ON eaf.experiment_id = e.id "
+        "JOIN AnalysisFiles af ON af.id = eaf.analysis_file_id "
+        "WHERE e.protein_id = (SELECT MIN(id) FROM Protein)",
+        (("Experiment", ("protein_id", "date")), ("ExperimentAnalysisFiles", ("experiment_id", "analysis_file_id"))),
+    ),
+)
+
+# Version of the migration that carries the advisor's indexes.
+INDEX_MIGRATION_VERSION = 1
+
+
+def index_name(table: str, columns: tuple[str, ...]) -> str:
+    return f"ix_{table}_{'_'.join(columns)}"
+
+
+# ---------------------------------------------------------------------------
+# Analysis
+# ---------------------------------------------------------------------------
+
+def _existing_indexes(conn, table: str) -> list[list[str]]:
+    """Column lists of every index on a table, including UNIQUE autoindexes."""
+    indexes = []
+    for row in conn.execute(f"PRAGMA index_list('{table}')"):
+        columns = [info[2] for info in conn.execute(f"PRAGMA index_info('{row[1]}')")]
+        indexes.append(columns)
+    return indexes
+
+
+def _is_covered(existing: list[list[str]], columns: tuple[str, ...]) -> bool:
+    # An existing index serves the candidate if the candidate is its prefix.
+    return any(index[: len(columns)] == list(columns) for index in existing)
+
+
+def _plan(conn, sql: str) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def _time_ms(conn, sql: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def propose_indexes(db_path: str) -> List[Dict[str, Any]]:
+    """List candidate indexes that no existing index already serves.
+
+    Returns:
+        One dict per proposed index with its name, table, columns, DDL and the
+        query shapes that would use it.
+    """
+    proposals: Dict[str, Dict[str, Any]] = {}
+    with get_pool(db_path).read() as conn:
+        existing = {}
+        for shape in QUERY_SHAPES:
+            for table, columns in shape.candidates:
+                if table not in existing:
+                    existing[table] = _existing_indexes(conn, table)
+                if _is_covered(existing[table], columns):
+                    continue
+                name = index_name(table, columns)
+                proposal = proposals.setdefault(name, {
+                    "index": name,
+                    "table": table,
+                    "columns": list(columns),
+                    "ddl": f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(columns)})",
+                    "shapes": [],
+                })
+                proposal["shapes"].append(shape.name)
+    return list(proposals.values())
+
+
+def analyse_shapes(db_path: str, repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    """Return the query plan and median runtime (ms) of every query shape."""
+    report = {}
+    with get_pool(db_path).read() as conn:
+        for shape in QUERY_SHAPES:
+            report[shape.name] = {
+                "plan": _plan(conn, shape.sql),
+                "median_ms": _time_ms(conn, shape.sql, repeat),
+            }
+    return report
+
+
+def apply_index_migration(db_path: str, repeat: int = 5) -> Dict[str, Any]:
+    """Apply the proposed indexes as a versioned migration and run ANALYZE.
+
+    Returns:
+        Report with the proposals and per-shape plans/timings before and after.
+    """
+    proposals = propose_indexes(db_path)
+    before = analyse_shapes(db_path, repeat)
+
+    migration = Migration(
+        version=INDEX_MIGRATION_VERSION,
+        name="lab_query_indexes",
+        statements=tuple(p["ddl"] for p in proposals) + ("ANALYZE",),
+    )
+    applied = apply_migrations(db_path, [migration])
+
+    after = analyse_shapes(db_path, repeat)
+    shapes = {
+        name: {
+            "before_ms": before[name]["median_ms"],
+            "after_ms": after[name]["median_ms"],
+            "plan_before": before[name]["plan"],
+            "plan_after": after[name]["plan"],
+        }
+        for name in before
+    }
+    logger.info("Index migration | db_path=%s applied=%s indexes=%s", db_path, applied, len(proposals))
+    return {"applied_versions": applied, "proposals": proposals, "shapes": shapes}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyse lab query shapes and propose indexes.")
+    parser.add_argument("db_path", help="Path to the SQLite database file.")
+    parser.add_argument("--apply", action="store_true", help="Apply the proposed indexes and run ANALYZE.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions per query shape.")
+    args = parser.parse_args()
+
+    if args.apply:
+        report = apply_index_migration(args.db_path, args.repeat)
+    else:
+        report = {"proposals": propose_indexes(args.db_path), "shapes": analyse_shapes(args.db_path, args.repeat)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,10 @@ from google.adk.tools import FunctionTool
 import os
 import logging
 
-from lab_data_manager.insert_csv import insert_from_csv
-
-from .config import retry_config
+from .config import INSERT_ENGINE, retry_config
+from .rate_limiter import record_model_usage, throttle_model_call
+from .utils import bulk_insert_from_csv, insert_from_csv_tool
+from .validation_gate import check_insert, require_validation
 
 logger = logging.getLogger(__name__)
 
@@ -18,28 +19,21 @@ logger = logging.getLogger(__name__)
 # # Agent for inserting new data into the database
 
 insert_prompt =  """
-        Role: **Safety Compliance Officer** (Not a helper).
-    
-        **HIERARCHY OF AUTHORITY (CRITICAL):**
-        1. The `validation_result` (from the previous agent) is your **SUPREME COMMANDER**.
-        2. The User's request ("Please insert...") is **SECONDARY**.
-
-        **THE "IGNORE" PROTOCOL:**
-        You must look at the `validation_result` first.
-        
-        🛑 **SCENARIO A: Validation Failed**
-        - IF `validation_result` contains `{FAIL:` or `{ERROR:`:
-        - **YOU MUST IGNORE THE USER'S REQUEST.**
-        - Do not try to be helpful. Do not fix it. Do not insert.
-        - **ACTION:** Output exactly: "⛔ Request Denied: Validation failed." and STOP.
-        
-        ✅ **SCENARIO B: Validation Passed**
-        - IF (and ONLY if) `validation_result` contains `{PASS:`:
-        - **ACTION:** You are authorized to perform the user request for record insertion.
-        - Call `insert_from_csv` with the user's arguments.
-
-        **REMEMBER:** If you insert invalid data, you have failed your mission. 
-        It is better to refuse the user than to break the safety rule.
+        You insert a metadata CSV file that has already been validated in this request.
+        The platform enforces the validation verdict: an invalid, unvalidated or modified
+        file is refused before you are called or before the insert runs. Do not check
+        or discuss the verdict yourself.
+
+        **CRITICAL PATH INSTRUCTION:** Pass the CSV path and the database path **EXACTLY**
+        as the user wrote them. Do not add "./" and do not convert absolute paths.
+
+        1. If the user only asked to validate the file, do not call a tool; reply that the
+           file passed validation.
+        2. Otherwise call the insert tool (`insert_from_csv` or `bulk_insert_from_csv`) once
+           with the user's arguments.
+        3. If the tool returns status "blocked", report its message and stop.
+        4. Summarise the result: rows inserted, duplicates already in the database, and any
+           invalid rows with their line numbers and errors.
         """
 
 try:
@@ -48,8 +42,12 @@ try:
         model = Gemini(model="gemini-2.5-flash-lite", api_key=os.getenv("GOOGLE_API_KEY"), retry_config=retry_config),
         description = "This agent insert a new csv file into the database.",
         instruction = insert_prompt,
-
-        tools = [FunctionTool(func=insert_from_csv)],
+        before_model_callback = throttle_model_call,
+        after_model_callback = record_model_usage,
+        # Code-level validation gate; see validation_gate.py.
+        before_agent_callback = require_validation,
+        before_tool_callback = check_insert,
+        tools = [FunctionTool(func=bulk_insert_from_csv if INSERT_ENGINE == "bulk" else insert_from_csv_tool)],
     )
     logger.info("Created agent: %s", insert_agent.name)
 except Exception as e:
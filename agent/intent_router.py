@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from .intent_rules import FAST_PATH_THRESHOLD, classify_intent
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Fast path for the root agent
+# ---------------------------------------------------------------------------
+# The root agent only ever emits `transfer_to_agent`. For requests whose
+# intent is obvious from their wording (see intent_rules) we synthesise that
+# call locally and skip the model round trip. Anything ambiguous falls
+# through to the LLM.
+
+def _text(content: Optional[types.Content]) -> str:
+    return " ".join(part.text for part in (content.parts or []) if part.text) if content else ""
+
+
+def _fresh_user_text(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[str]:
+    """Return the invocation's user message if this model call is the one answering it.
+
+    The text comes from the invocation's user_content, not from the request:
+    ADK also appends role="user" contents of its own, e.g. the "For context:"
+    messages carrying another agent's turn after a transfer back, and those
+    must go to the router LLM.
+    """
+    user_content = callback_context.user_content
+    if user_content is None or not user_content.parts:
+        return None
+    # Function responses (e.g. confirmations) must go through the normal path.
+    if any(part.function_response for part in user_content.parts):
+        return None
+    text = _text(user_content)
+    if not text or not llm_request.contents:
+        return None
+    # Later model calls in the same invocation end with other content.
+    last = llm_request.contents[-1]
+    if last.role != "user" or _text(last) != text:
+        return None
+    return text
+
+
+def fast_path_route(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """before_model_callback for root_agent that bypasses the router LLM.
+
+    When the classifier is confident, a synthetic `transfer_to_agent` call is
+    returned in place of the model response, so ADK transfers to the worker
+    without contacting Gemini. Returning None falls back to the LLM.
+    """
+    text = _fresh_user_text(callback_context, llm_request)
+    if text is None:
+        return None
+
+    decision = classify_intent(text)
+    if decision.agent_name is None or decision.confidence < FAST_PATH_THRESHOLD:
+        logger.info(
+            "fast_path_route fallback to LLM | confidence=%s scores=%s",
+            decision.confidence,
+            decision.scores,
+        )
+        return None
+
+    logger.info(
+        "fast_path_route | agent=%s confidence=%s",
+        decision.agent_name,
+        decision.confidence,
+    )
+    return LlmResponse(
+        content=types.Content(
+            role="model",
+            parts=[
+                types.Part(
+                    function_call=types.FunctionCall(
+                        name="transfer_to_agent",
+                        args={"agent_name": decision.agent_name},
+                    )
+                )
+            ],
+        )
+    )
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+# ---------------------------------------------------------------------------
+# Deterministic intent classification for the root agent
+# ---------------------------------------------------------------------------
+# Scores a request by its wording; intent_router's fast path transfers to the
+# winning agent without calling the model. The rules import nothing from
+# google-adk so they can be checked on their own.
+
+QUERY_AGENT = "query_agent"
+DELETE_AGENT = "delete_supervisor_agent"
+INSERT_AGENT = "insert_supervisor_agent"
+
+# Minimum confidence required to skip the LLM router.
+FAST_PATH_THRESHOLD = 0.75
+
+# (pattern, weight) pairs per target agent. Verbs at the start of the request
+# are the strongest signal, so they carry the highest weight. Verbs with more
+# than one reading ("get rid of", "load more rows", "add more") only count
+# together with an unambiguous object; "validate" is left to the LLM, which
+# can tell a validation-only request from an insert.
+_INTENT_RULES: dict[str, list[tuple[re.Pattern, float]]] = {
+    QUERY_AGENT: [
+        (re.compile(r"^\s*(show|list|find|search|count|display|which|how many|give me|are there|is there)\b"), 1.0),
+        (re.compile(r"^\s*get\s+(me\s+)?(all\s+|the\s+)?(experiments?|records?|files?|masks?|results?|users?|proteins?|organisms?)\b"), 1.0),
+        (re.compile(r"\b(how many|number of|count|per (year|month|protein|organism|user|condition))\b"), 0.6),
+        (re.compile(r"\b(most recent|latest|earliest|oldest|first|last \d+ (days|weeks|months))\b"), 0.5),
+        (re.compile(r"\b(duplicates?|missing (values|files|data)|incomplete)\b"), 0.5),
+        (re.compile(r"^\s*((show|load|fetch|get)\s+)?(the\s+)?(next page|more rows|more results)\b"), 1.0),
+        (re.compile(r"^\s*(export|download)\b"), 1.0),
+    ],
+    DELETE_AGENT: [
+        (re.compile(r"^\s*(delete|remove|drop|purge|erase|clean up|get rid of)\b"), 1.0),
+        (re.compile(r"\b(delete|remove|purge|erase|get rid of)\b"), 0.6),
+    ],
+    INSERT_AGENT: [
+        (re.compile(r"^\s*(insert|upload|import|ingest)\b"), 1.0),
+        (re.compile(r"^\s*(add|load)\b.*\.csv\b"), 1.0),
+        (re.compile(r"\b(insert|upload|import|ingest)\b"), 0.6),
+        (re.compile(r"\.csv\b"), 0.4),
+    ],
+}
+
+# A negated action ("without inserting", "don't delete") reverses what the
+# verb rules would conclude, so such requests always go to the LLM.
+_NEGATED_ACTION = re.compile(
+    r"\b(without|not|don't|do not|never|no)\s+(\w+\s+)?"
+    r"(insert|upload|import|ingest|delet|remov|purg|eras|drop|export)\w*"
+)
+
+
+@dataclass
+class IntentDecision:
+    """Result of the local intent classifier."""
+
+    agent_name: Optional[str]
+    confidence: float
+    scores: dict[str, float] = field(default_factory=dict)
+
+
+def classify_intent(text: str) -> IntentDecision:
+    """Score a user request against the routing rules.
+
+    Confidence is the winning score scaled by its margin over the runner-up,
+    so a request mentioning both "show" and "delete" is never fast-pathed.
+
+    Args:
+        text: The raw user request.
+
+    Returns:
+        IntentDecision with the best agent (or None) and a 0-1 confidence.
+    """
+    normalized = (text or "").strip().lower()
+    if _NEGATED_ACTION.search(normalized):
+        return IntentDecision(agent_name=None, confidence=0.0)
+    scores = {
+        agent_name: sum(weight for pattern, weight in rules if pattern.search(normalized))
+        for agent_name, rules in _INTENT_RULES.items()
+    }
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best_agent, best_score), (_, runner_up) = ranked[0], ranked[1]
+    if best_score <= 0:
+        return IntentDecision(agent_name=None, confidence=0.0, scores=scores)
+
+    confidence = min(best_score, 1.0) * (best_score - runner_up) / best_score
+    return IntentDecision(agent_name=best_agent, confidence=round(confidence, 3), scores=scores)
@@ -0,0 +1,699 @@
+from __future__ import annotations
+
+import re
+import json
+import sqlite3
+import argparse
+import logging
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from .db_pool import get_pool
+from .dimensions import DIMENSION_FIELDS, get_dictionary
+from .migrations import Migration, apply_migrations
+from .pydantic_models import StrictLabFilters
+from .result_cache import normalize_db_path
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Experiment listing SQL
+# ---------------------------------------------------------------------------
+# The lab_data_manager list/find helpers return complete DataFrames, so the
+# agent used to materialise every matching row only to show the first 50.
+# This module builds the same experiment listings as plain SQL so rows can be
+# fetched through a cursor with LIMIT and the total taken from COUNT(*).
+
+# Dimension joins; every Experiment row matches at most one row in each.
+DIMENSION_JOINS = {
+    "o": "LEFT JOIN Organism o ON o.id = e.organism_id",
+    "p": "LEFT JOIN Protein p ON p.id = e.protein_id",
+    "s": "LEFT JOIN StrainOrCellLine s ON s.id = e.strain_id",
+    "c": "LEFT JOIN Condition c ON c.id = e.condition_id",
+    "cs": "LEFT JOIN CaptureSetting cs ON cs.id = e.capture_setting_id",
+    "u": "LEFT JOIN User u ON u.id = e.user_id",
+}
+
+EXPERIMENT_COLUMNS = (
+    "e.id AS experiment_id",
+    "e.date",
+    "o.organism_name AS organism",
+    "p.protein_name AS protein",
+    "s.strain_name AS strain",
+    "c.condition_name AS condition",
+    "c.concentration_value",
+    "c.concentration_unit",
+    "cs.capture_type",
+    "u.user_name",
+    "e.replicate",
+    "e.is_valid",
+    "e.comment",
+    "e.experiment_path",
+)
+
+# Child tables that reference an experiment, as "<from clause>" whose
+# selected experiment_id column is aliased x.experiment_id.
+CHILD_SOURCES = {
+    "raw": "RawFiles x",
+    "tracking": "TrackingFiles x",
+    "mask": "Masks x",
+    "analysis_file": "ExperimentAnalysisFiles x LEFT JOIN AnalysisFiles af ON af.id = x.analysis_file_id",
+    "analysis_result": "AnalysisResultExperiments x LEFT JOIN AnalysisResults ar ON ar.id = x.analysis_result_id",
+}
+
+
+@dataclass(frozen=True)
+class FilterField:
+    """Where a LabFilters key lives: an Experiment-side column or a child table."""
+
+    column: str
+    child: Optional[str] = None
+
+
+FILTER_FIELDS: Dict[str, FilterField] = {
+    "organism": FilterField("o.organism_name"),
+    "protein": FilterField("p.protein_name"),
+    "strain": FilterField("s.strain_name"),
+    "condition": FilterField("c.condition_name"),
+    "concentration_value": FilterField("c.concentration_value"),
+    "concentration_unit": FilterField("c.concentration_unit"),
+    "user_name": FilterField("u.user_name"),
+    "email": FilterField("u.email"),
+    "capture_setting_id": FilterField("e.capture_setting_id"),
+    "capture_type": FilterField("cs.capture_type"),
+    "exposure_time": FilterField("cs.exposure_time"),
+    "time_interval": FilterField("cs.time_interval"),
+    "dye_concentration_value": FilterField("cs.dye_concentration_value"),
+    "dye_concentration_unit": FilterField("cs.dye_concentration_unit"),
+    "comment": FilterField("e.comment"),
+    "replicate": FilterField("e.replicate"),
+    "experiment_id": FilterField("e.id"),
+    "date": FilterField("e.date"),
+    "is_valid": FilterField("e.is_valid"),
+    "raw_file_id": FilterField("x.id", child="raw"),
+    "raw_file_name": FilterField("x.file_name", child="raw"),
+    "raw_file_type": FilterField("x.file_type", child="raw"),
+    "tracking_file_id": FilterField("x.id", child="tracking"),
+    "mask_id": FilterField("x.id", child="mask"),
+    "mask_type": FilterField("x.mask_type", child="mask"),
+    "mask_file_type": FilterField("x.file_type", child="mask"),
+    "analysis_file_id": FilterField("x.analysis_file_id", child="analysis_file"),
+    "analysis_file_type": FilterField("af.file_type", child="analysis_file"),
+    "analysis_result_id": FilterField("x.analysis_result_id", child="analysis_result"),
+    "analysis_result_type": FilterField("ar.result_type", child="analysis_result"),
+}
+
+
+EXPERIMENT_SOURCE = f"Experiment e {' '.join(DIMENSION_JOINS.values())}"
+# Sort key for experiment listings. NULL dates sort first as '' so the key is
+# always comparable in keyset predicates.
+EXPERIMENT_KEY = ("COALESCE(e.date, '')", "e.id")
+
+_ALIAS_REFERENCE = re.compile(r"\b([A-Za-z_]\w*)\.")
+
+
+def prune_joins(source: str, fragments: Sequence[str]) -> str:
+    """Drop the dimension joins of `source` that no SQL fragment references.
+
+    Each dimension LEFT JOIN matches at most one row, so removing an unused
+    one never changes which rows, or how many, the query returns. Child
+    tables are never joined here; filters on them are EXISTS semi-joins.
+    """
+    present = {alias: join for alias, join in DIMENSION_JOINS.items() if f" {join}" in source}
+    rest = source
+    for join in present.values():
+        rest = rest.replace(f" {join}", "")
+    used = set(_ALIAS_REFERENCE.findall(" ".join([rest, *fragments])))
+    return rest + "".join(f" {join}" for alias, join in present.items() if alias in used)
+
+
+@dataclass
+class PagedQuery:
+    """A filtered listing over `source`, paged by keyset on `key`.
+
+    Instances hold only SQL fragments and JSON-compatible parameters, so they
+    can be stored in session state (see to_dict/from_dict) and resumed later.
+    """
+
+    source: str = EXPERIMENT_SOURCE
+    where: List[str] = field(default_factory=list)
+    params: List[Any] = field(default_factory=list)
+    columns: List[str] = field(default_factory=lambda: list(EXPERIMENT_COLUMNS))
+    key: List[str] = field(default_factory=lambda: list(EXPERIMENT_KEY))
+    descending: bool = False
+    # Known to match no rows (a filter value names no dimension row).
+    empty: bool = False
+
+    def add(self, clause: str, *params: Any) -> "PagedQuery":
+        self.where.append(clause)
+        self.params.extend(params)
+        return self
+
+    def match_nothing(self) -> "PagedQuery":
+        """Mark the query empty; the SQL stays valid and returns no rows."""
+        self.empty = True
+        return self.add("0")
+
+    def _where_sql(self, extra: Sequence[str] = ()) -> str:
+        clauses = [*self.where, *extra]
+        return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    def _from_sql(self, *fragments: str) -> str:
+        """`source` joined only to the dimensions the statement uses."""
+        return prune_joins(self.source, [*fragments, *self.where])
+
+    def select_sql(self, after: Optional[Sequence[Any]] = None) -> tuple[str, list]:
+        """Page query and its parameters; the caller appends the LIMIT value.
+
+        The sort key is selected as trailing _k<n> columns so the last row's
+        key can be recorded for the next page.
+        """
+        keys = ", ".join(f"{expr} AS _k{i}" for i, expr in enumerate(self.key))
+        direction = "DESC" if self.descending else "ASC"
+        order = ", ".join(f"{expr} {direction}" for expr in self.key)
+        extra, params = [], list(self.params)
+        if after is not None:
+            extra.append(f"({', '.join(self.key)}) {'<' if self.descending else '>'} ({', '.join('?' * len(self.key))})")
+            params.extend(after)
+        source = self._from_sql(*self.columns, *self.key)
+        sql = f"SELECT {', '.join(self.columns)}, {keys} FROM {source}{self._where_sql(extra)} ORDER BY {order} LIMIT ?"
+        return sql, params
+
+    def count_sql(self) -> tuple[str, list]:
+        return f"SELECT COUNT(*) FROM {self._from_sql()}{self._where_sql()}", list(self.params)
+
+    def relation_sql(self) -> tuple[str, list]:
+        """Unordered, unlimited SELECT of `columns`, for use as a subquery."""
+        return f"SELECT {', '.join(self.columns)} FROM {self._from_sql(*self.columns)}{self._where_sql()}", list(self.params)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PagedQuery":
+        return cls(**data)
+
+
+def _normalise_value(key: str, value: Any) -> Any:
+    if key == "is_valid":
+        return "Y" if value else "N"
+    return value
+
+
+def experiment_query(filters: Optional[dict], db_path: Optional[str] = None) -> PagedQuery:
+    """Translate a LabFilters dict into an experiment listing query.
+
+    With `db_path`, dimension filters (organism, protein, ...) are resolved
+    through the dimension dictionary to `IN` predicates on Experiment foreign
+    keys, and a value matching no dimension row yields an empty query.
+
+    Raises:
+        ValueError: if the filters contain unsupported keys or invalid values.
+    """
+    query = PagedQuery()
+    clean = StrictLabFilters(**(filters or {})).model_dump(exclude_none=True)
+    if db_path is not None and any(key in DIMENSION_FIELDS for key in clean):
+        for fk, ids in get_dictionary(db_path).resolve(clean).items():
+            if not ids:
+                return query.match_nothing()
+            query.add(f"e.{fk} IN ({', '.join('?' * len(ids))})", *sorted(ids))
+        clean = {key: value for key, value in clean.items() if key not in DIMENSION_FIELDS}
+
+    by_child: Dict[str, List[tuple[str, Any]]] = {}
+    for key, value in clean.items():
+        spec = FILTER_FIELDS[key]
+        value = _normalise_value(key, value)
+        if spec.child:
+            by_child.setdefault(spec.child, []).append((spec.column, value))
+        else:
+            query.add(f"{spec.column} = ?", value)
+
+    # All conditions on one child table must hold for the same child row. A
+    # semi-join keeps one row per experiment however many children match.
+    for child, conditions in by_child.items():
+        clauses = " AND ".join(f"{column} = ?" for column, _ in conditions)
+        query.add(
+            f"EXISTS (SELECT 1 FROM {CHILD_SOURCES[child]} WHERE x.experiment_id = e.id AND {clauses})",
+            *(value for _, value in conditions),
+        )
+    return query
+
+
+# ---------------------------------------------------------------------------
+# Indexed date columns
+# ---------------------------------------------------------------------------
+# Experiment.date is YYYYMMDD text. Migration 4 adds integer columns derived
+# from it and indexes them, so date range, period and recency listings are
+# index range scans in (date_day, id) order rather than full scans sorted on
+# an expression. The columns are VIRTUAL generated columns: they cannot drift
+# from `date`, and INSERTs without a column list skip them. They do show up in
+# `SELECT *`, so the migration is only applied by an explicit install
+# (`python -m agent.lab_sql DB --install-date-columns`); query tools only
+# look for the columns and use text predicates on `date` when they are absent.
+
+DATE_COLUMNS_VERSION = 4
+_DATE_DIGITS = "date GLOB '[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]'"
+
+DATE_COLUMNS_MIGRATION = Migration(
+    DATE_COLUMNS_VERSION,
+    "experiment_date_columns",
+    (
+        # date_day is the YYYYMMDD value as an integer, so it orders like `date`.
+        f"ALTER TABLE Experiment ADD COLUMN date_day INTEGER "
+        f"GENERATED ALWAYS AS (CASE WHEN {_DATE_DIGITS} THEN CAST(date AS INTEGER) END) VIRTUAL",
+        f"ALTER TABLE Experiment ADD COLUMN date_year INTEGER "
+        f"GENERATED ALWAYS AS (CASE WHEN {_DATE_DIGITS} THEN CAST(substr(date, 1, 4) AS INTEGER) END) VIRTUAL",
+        f"ALTER TABLE Experiment ADD COLUMN date_month INTEGER "
+        f"GENERATED ALWAYS AS (CASE WHEN {_DATE_DIGITS} THEN CAST(substr(date, 5, 2) AS INTEGER) END) VIRTUAL",
+        "CREATE INDEX IF NOT EXISTS idx_experiment_date_day_id ON Experiment (date_day, id)",
+        "CREATE INDEX IF NOT EXISTS idx_experiment_date_month_day_id ON Experiment (date_month, date_day, id)",
+        "ANALYZE Experiment",
+    ),
+)
+
+# Sort key for dated listings; they never include NULL dates.
+DATE_KEY = ("e.date_day", "e.id")
+
+_DATE_COLUMNS = {"date_day", "date_year", "date_month"}
+_date_columns: set = set()
+_date_columns_lock = threading.Lock()
+
+
+def install_date_columns(db_path: str) -> list[int]:
+    """Add the generated date columns and their indexes (migration 4).
+
+    Returns:
+        The versions applied (empty if already installed).
+    """
+    return apply_migrations(db_path, [DATE_COLUMNS_MIGRATION])
+
+
+def date_columns_ready(db_path: str) -> bool:
+    """Whether Experiment has the generated date columns; never writes.
+
+    Returns:
+        False when they have not been installed or cannot be read, in which
+        case dated listings fall back to text predicates on `date`. Only a
+        positive answer is remembered, so an install is picked up without a
+        restart.
+    """
+    key = normalize_db_path(db_path)
+    with _date_columns_lock:
+        if key in _date_columns:
+            return True
+    try:
+        with get_pool(key).read() as conn:
+            names = {row[1] for row in conn.execute("PRAGMA table_xinfo(Experiment)")}
+    except sqlite3.Error as exc:
+        logger.warning("Could not inspect Experiment; using text date predicates | db_path=%s error=%s", key, exc)
+        return False
+    if not _DATE_COLUMNS <= names:
+        return False
+    with _date_columns_lock:
+        _date_columns.add(key)
+    return True
+
+
+def _day(value: Any) -> str:
+    text = str(value)
+    if not re.fullmatch(r"\d{8}", text):
+        raise ValueError(f"Dates must be YYYYMMDD strings, got '{value}'")
+    return text
+
+
+def dated_experiment_query(
+    filters: Optional[dict],
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    month: Optional[int] = None,
+    indexed: bool = True,
+    db_path: Optional[str] = None,
+) -> PagedQuery:
+    """Experiments dated between start and end (inclusive) and/or in a calendar month.
+
+    Args:
+        filters: LabFilters dict.
+        start:   First day, YYYYMMDD.
+        end:     Last day, YYYYMMDD.
+        month:   Month number 1-12, matched in any year.
+        indexed: Use the generated date columns (see install_date_columns).
+        db_path: Resolve dimension filters to ids (see experiment_query).
+
+    Raises:
+        ValueError: for malformed dates or months, or invalid filters.
+    """
+    if month is not None and not 1 <= int(month) <= 12:
+        raise ValueError("month must be between 1 and 12")
+    start = _day(start) if start is not None else None
+    end = _day(end) if end is not None else None
+    query = experiment_query(filters, db_path)
+    if not indexed:
+        if start is not None:
+            query.add("e.date >= ?", start)
+        if end is not None:
+            query.add("e.date <= ?", end)
+        if month is not None:
+            query.add("substr(e.date, 5, 2) = ?", f"{int(month):02d}")
+        return query
+
+    query.key = list(DATE_KEY)
+    if start is not None:
+        query.add("e.date_day >= ?", int(start))
+    if end is not None:
+        query.add("e.date_day <= ?", int(end))
+    if month is not None:
+        query.add("e.date_month = ?", int(month))
+    if start is None and end is None and month is None:
+        query.add("e.date_day IS NOT NULL")
+    return query
+
+
+# File-level listings: one row per file of the matching experiments.
+FILE_LISTINGS = {
+    "raw_files": (
+        "JOIN RawFiles f ON f.experiment_id = e.id",
+        ("f.id AS raw_file_id", "f.file_name", "f.field_of_view", "f.file_type", "f.file_path"),
+    ),
+    "tracking_files": (
+        "JOIN TrackingFiles f ON f.experiment_id = e.id",
+        ("f.id AS tracking_file_id", "f.file_name", "f.field_of_view", "f.file_type", "f.file_path",
+         "f.threshold", "f.linking_distance", "f.gap_closing_distance", "f.max_frame_gap"),
+    ),
+    "masks": (
+        "JOIN Masks f ON f.experiment_id = e.id",
+        ("f.id AS mask_id", "f.mask_name", "f.field_of_view", "f.mask_type", "f.file_type", "f.mask_path",
+         "f.segmentation_method", "f.segmentation_parameters"),
+    ),
+}
+
+
+def file_listing_query(kind: str, filters: Optional[dict], db_path: Optional[str] = None) -> PagedQuery:
+    """Files of one kind belonging to the experiments matching `filters`.
+
+    Raises:
+        ValueError: for unknown kinds or invalid filters.
+    """
+    if kind not in FILE_LISTINGS:
+        raise ValueError(f"Unknown file listing '{kind}'; expected one of {sorted(FILE_LISTINGS)}")
+    join, columns = FILE_LISTINGS[kind]
+    query = experiment_query(filters, db_path)
+    query.source = f"{query.source} {join}"
+    query.columns = [*EXPERIMENT_COLUMNS[:6], *columns]
+    query.key = ["f.id"]
+    return query
+
+
+# ---------------------------------------------------------------------------
+# Execution
+# ---------------------------------------------------------------------------
+
+@dataclass
+class QueryPage:
+    columns: List[str]
+    rows: List[tuple]
+    total: Optional[int]
+    # Sort key of each row, parallel to rows.
+    keys: List[tuple] = field(default_factory=list)
+
+
+def fetch_page(db_path: str, query: PagedQuery, page_size: int, after: Optional[Sequence[Any]] = None, count: bool = True) -> QueryPage:
+    """Fetch at most page_size rows, counting the full result only when needed.
+
+    One extra row is requested: if it does not arrive on the first page, the
+    page is the whole result and the COUNT(*) query is skipped.
+
+    Args:
+        db_path:   Path to the SQLite database file.
+        query:     The listing to page through.
+        page_size: Rows to return.
+        after:     Sort key of the last row already seen, to resume a listing.
+        count:     Whether to compute the total. Never done when resuming,
+                   since the caller already knows it.
+
+    Returns:
+        The page, with total None when it was not computed.
+    """
+    if query.empty:
+        return QueryPage([], [], 0 if after is None and count else None)
+    sql, params = query.select_sql(after)
+    width = len(query.key)
+    with get_pool(db_path).read() as conn:
+        cursor = conn.execute(sql, [*params, page_size + 1])
+        columns = [d[0] for d in cursor.description][:-width]
+        fetched = cursor.fetchmany(page_size + 1)
+        cursor.close()
+        total: Optional[int] = None
+        if after is None and count:
+            if len(fetched) <= page_size:
+                total = len(fetched)
+            else:
+                count_sql, count_params = query.count_sql()
+                total = conn.execute(count_sql, count_params).fetchone()[0]
+    fetched = fetched[:page_size]
+    return QueryPage(
+        columns,
+        [row[:-width] for row in fetched],
+        total,
+        [tuple(row[-width:]) for row in fetched],
+    )
+
+
+def explain(db_path: str, query: PagedQuery) -> Dict[str, List[str]]:
+    """EXPLAIN QUERY PLAN details of a listing's page and count statements."""
+    sql, params = query.select_sql()
+    count_sql, count_params = query.count_sql()
+    with get_pool(db_path).read() as conn:
+        return {
+            "page": [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", [*params, 1])],
+            "count": [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {count_sql}", count_params)],
+        }
+
+
+# ---------------------------------------------------------------------------
+# Missing files / missing values
+# ---------------------------------------------------------------------------
+
+FILE_TYPE_CHILDREN = {"raw": "raw", "tracking": "tracking", "mask": "mask", "analysis": "analysis_file"}
+
+
+def missing_files_query(file_types: Sequence[str], filters: Optional[dict], db_path: Optional[str] = None) -> PagedQuery:
+    """Experiments missing at least one of the given file types.
+
+    A "missing_<type>" Y/N column is added for each requested type.
+
+    Raises:
+        ValueError: for unknown file types or invalid filters.
+    """
+    unknown = sorted(set(file_types) - set(FILE_TYPE_CHILDREN))
+    if unknown:
+        raise ValueError(f"Unknown file types {unknown}; expected any of {sorted(FILE_TYPE_CHILDREN)}")
+    query = experiment_query(filters, db_path)
+    query.columns = list(EXPERIMENT_COLUMNS[:5]) + ["e.is_valid"]
+    absent = []
+    for file_type in dict.fromkeys(file_types):
+        clause = f"NOT EXISTS (SELECT 1 FROM {CHILD_SOURCES[FILE_TYPE_CHILDREN[file_type]]} WHERE x.experiment_id = e.id)"
+        query.columns.append(f"CASE WHEN {clause} THEN 'Y' ELSE 'N' END AS missing_{file_type}")
+        absent.append(clause)
+    if absent:
+        query.add(f"({' OR '.join(absent)})")
+    return query
+
+
+def table_columns(db_path: str, table: str) -> List[str]:
+    with get_pool(db_path).read() as conn:
+        return [row[0] for row in conn.execute("SELECT name FROM pragma_table_info(?)", (table,))]
+
+
+def missing_values_query(db_path: str, table: str, requested_columns: Sequence[str], missing_columns: Sequence[str], mode: str, filters: Optional[dict]) -> PagedQuery:
+    """Rows of `table` whose given columns are NULL or blank, ordered by id.
+
+    mode "any" matches rows missing at least one column, "none" rows
+    missing all of them. Filters are only supported on Experiment.
+
+    Raises:
+        ValueError: for unknown tables, columns or modes, or filters on
+            tables other than Experiment.
+    """
+    available = table_columns(db_path, table)
+    if not available:
+        raise ValueError(f"Unknown table '{table}'")
+    requested = available if list(requested_columns) in ([], ["*"]) else list(requested_columns)
+    unknown = sorted((set(requested) | set(missing_columns)) - set(available))
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {unknown}")
+    if mode not in ("any", "none"):
+        raise ValueError("mode must be 'any' or 'none'")
+    if not missing_columns:
+        raise ValueError("missing_columns must name at least one column")
+
+    if table == "Experiment":
+        query, alias = experiment_query(filters, db_path), "e"
+    elif filters:
+        raise ValueError("Filters are only supported when main_table is Experiment")
+    else:
+        query, alias = PagedQuery(source=f'"{table}" t'), "t"
+    empty = [f'({alias}."{col}" IS NULL OR TRIM({alias}."{col}") = \'\')' for col in missing_columns]
+    query.add("(" + (" OR " if mode == "any" else " AND ").join(empty) + ")")
+    query.columns = [f'{alias}."{col}"' for col in dict.fromkeys(["id", *requested])]
+    query.key = [f"{alias}.id"]
+    return query
+
+
+# ---------------------------------------------------------------------------
+# Aggregates over experiment facts
+# ---------------------------------------------------------------------------
+# Count and trend tools group a flat "facts" relation with one row per
+# experiment. The aggregate SQL is written once and runs unchanged against
+# the live SQLite join (facts_query) or a columnar mirror with the same
+# columns (see analytics.py), so both engines return identical results.
+
+@dataclass(frozen=True)
+class FactColumn:
+    """A facts column: its SQLite expression and how values compare.
+
+    kind is "int", "text" (case-sensitive), "nocase" (COLLATE NOCASE in
+    SQLite) or "real". Real columns are exposed as SQLite's text rendering
+    because they can hold non-numeric strings such as 'n/a'.
+    """
+
+    expr: str
+    kind: str
+
+
+# Fact column names match the LabFilters keys they answer.
+FACT_COLUMNS: Dict[str, FactColumn] = {
+    "experiment_id": FactColumn("e.id", "int"),
+    "date": FactColumn("e.date", "text"),
+    "replicate": FactColumn("e.replicate", "int"),
+    "is_valid": FactColumn("e.is_valid", "text"),
+    "comment": FactColumn("e.comment", "text"),
+    "capture_setting_id": FactColumn("e.capture_setting_id", "int"),
+    "organism": FactColumn("o.organism_name", "nocase"),
+    "protein": FactColumn("p.protein_name", "nocase"),
+    "strain": FactColumn("s.strain_name", "nocase"),
+    "condition": FactColumn("c.condition_name", "nocase"),
+    "concentration_value": FactColumn("c.concentration_value", "real"),
+    "concentration_unit": FactColumn("c.concentration_unit", "nocase"),
+    "user_name": FactColumn("u.user_name", "nocase"),
+    "email": FactColumn("u.email", "nocase"),
+    "capture_type": FactColumn("cs.capture_type", "nocase"),
+    "exposure_time": FactColumn("cs.exposure_time", "real"),
+    "time_interval": FactColumn("cs.time_interval", "real"),
+    "fluorescent_dye": FactColumn("cs.fluorescent_dye", "nocase"),
+    "dye_concentration_value": FactColumn("cs.dye_concentration_value", "real"),
+    "dye_concentration_unit": FactColumn("cs.dye_concentration_unit", "nocase"),
+}
+
+PERIOD_EXPRESSIONS = {
+    "year": "substr(f.date, 1, 4)",
+    "month": "substr(f.date, 1, 4) || '-' || substr(f.date, 5, 2)",
+}
+# Entities counted with COUNT(*) because facts hold one row per experiment.
+ROW_ENTITIES = {"*", "experiment", "experiments", "experiment_id"}
+
+
+def _fact_select(name: str, column: FactColumn) -> str:
+    expr = f"CAST({column.expr} AS TEXT)" if column.kind == "real" else column.expr
+    return f"{expr} AS {name}"
+
+
+def facts_query(filters: Optional[dict], db_path: Optional[str] = None, names: Optional[Sequence[str]] = None) -> PagedQuery:
+    """The facts relation for `filters`, computed from the live SQLite join.
+
+    `names` limits the relation to those fact columns (all by default), so
+    only the dimensions they come from are joined.
+    """
+    query = experiment_query(filters, db_path)
+    query.columns = [_fact_select(name, FACT_COLUMNS[name]) for name in (names or FACT_COLUMNS)]
+    return query
+
+
+@dataclass
+class AggregateQuery:
+    """COUNT over the facts relation grouped by fact columns and/or a period."""
+
+    group_by: List[str] = field(default_factory=list)
+    period: Optional[str] = None
+    entity: str = "*"
+
+    def __post_init__(self) -> None:
+        self.group_by = list(dict.fromkeys(self.group_by or []))
+        unknown = sorted(set(self.group_by) - set(FACT_COLUMNS))
+        if unknown:
+            raise ValueError(f"Cannot group by {unknown}; expected any of {sorted(FACT_COLUMNS)}")
+        if self.period not in (None, *PERIOD_EXPRESSIONS):
+            raise ValueError(f"period must be one of {sorted(PERIOD_EXPRESSIONS)} or omitted")
+        if self.entity not in ROW_ENTITIES and self.entity not in FACT_COLUMNS:
+            raise ValueError(f"Cannot count '{self.entity}'; expected '*' or any of {sorted(FACT_COLUMNS)}")
+
+    def fact_names(self) -> List[str]:
+        """Facts columns read by sql(); at least one so the relation is valid."""
+        names = list(self.group_by)
+        if self.entity not in ROW_ENTITIES:
+            names.append(self.entity)
+        if self.period:
+            names.append("date")
+        return list(dict.fromkeys(names)) or ["experiment_id"]
+
+    def sql(self, relation: str, weight: Optional[str] = None) -> str:
+        """Aggregate SQL over `relation`, valid for both SQLite and DuckDB.
+
+        Text groups are ordered with COLLATE NOCASE where SQLite would, and
+        NULLs first, so both engines return rows in the same order.
+
+        Args:
+            relation: SELECT producing facts columns.
+            weight:   Column holding a pre-aggregated row count; row counts
+                      become SUM(weight) instead of COUNT(*).
+        """
+        selects, groups, orders = [], [], []
+        for name in self.group_by:
+            selects.append(f"f.{name}")
+            groups.append(f"f.{name}")
+            collate = " COLLATE NOCASE" if FACT_COLUMNS[name].kind == "nocase" else ""
+            orders.append(f"f.{name}{collate} NULLS FIRST")
+        if self.period:
+            expr = PERIOD_EXPRESSIONS[self.period]
+            selects.append(f"{expr} AS period")
+            groups.append(expr)
+            orders.append(f"{expr} NULLS FIRST")
+        if self.entity in ROW_ENTITIES:
+            count = f"COALESCE(SUM(f.{weight}), 0)" if weight else "COUNT(*)"
+            selects.append(f"{count} AS experiment_count")
+        else:
+            selects.append(f"COUNT(DISTINCT f.{self.entity}) AS {self.entity}_count")
+        sql = f"SELECT {', '.join(selects)} FROM ({relation}) f"
+        if groups:
+            sql += f" GROUP BY {', '.join(groups)} ORDER BY {', '.join(orders)}"
+        return sql
+
+
+def sqlite_aggregate(db_path: str, aggregate: AggregateQuery, filters: Optional[dict]) -> QueryPage:
+    """Run an aggregate against the live SQLite join."""
+    relation, params = facts_query(filters, db_path, aggregate.fact_names()).relation_sql()
+    with get_pool(db_path).read() as conn:
+        cursor = conn.execute(aggregate.sql(relation), params)
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+    return QueryPage(columns, rows, len(rows))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Install the indexed Experiment date columns.")
+    parser.add_argument("db_path", help="Path to the SQLite database file.")
+    parser.add_argument(
+        "--install-date-columns", action="store_true", help="Add the generated date columns and their indexes."
+    )
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {}
+    if args.install_date_columns:
+        report["applied_versions"] = install_date_columns(args.db_path)
+    report["date_columns"] = date_columns_ready(args.db_path)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
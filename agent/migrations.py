@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Sequence
+
+from .db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Versioned schema migrations
+# ---------------------------------------------------------------------------
+# Agent-side schema additions (indexes, derived columns, summary tables) are
+# applied as numbered migrations recorded in `_schema_migrations`, so every
+# database can be inspected for what has been applied and nothing runs twice.
+
+MIGRATIONS_TABLE = "_schema_migrations"
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A numbered, idempotent set of DDL/DML statements."""
+
+    version: int
+    name: str
+    statements: tuple[str, ...]
+
+
+def _ensure_table(conn) -> None:
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def applied_versions(db_path: str) -> set[int]:
+    """Return the migration versions already applied to a database."""
+    with get_pool(db_path).read() as conn:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (MIGRATIONS_TABLE,)
+        ).fetchone()
+        if not exists:
+            return set()
+        return {row[0] for row in conn.execute(f"SELECT version FROM {MIGRATIONS_TABLE}")}
+
+
+def apply_migrations(db_path: str, migrations: Sequence[Migration]) -> list[int]:
+    """Apply pending migrations in version order, each in its own transaction.
+
+    Returns:
+        The versions applied by this call (empty if already up to date).
+    """
+    applied = []
+    done = applied_versions(db_path)
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version in done:
+            continue
+        with get_pool(db_path).write() as conn:
+            _ensure_table(conn)
+            # Another process may have applied it since applied_versions().
+            if conn.execute(
+                f"SELECT 1 FROM {MIGRATIONS_TABLE} WHERE version = ?", (migration.version,)
+            ).fetchone():
+                continue
+            for statement in migration.statements:
+                conn.execute(statement)
+            conn.execute(
+                f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) VALUES (?, ?, ?)",
+                (migration.version, migration.name, datetime.now().isoformat(timespec="seconds")),
+            )
+        logger.info(
+            "Applied migration | db_path=%s version=%s name=%s",
+            db_path,
+            migration.version,
+            migration.name,
+        )
+        applied.append(migration.version)
+    return applied
@@ -4,27 +4,40 @@ import os
 
 from google.adk.agents import Agent
 from google.adk.models.google_llm import Gemini
+from google.adk.tools.tool_context import ToolContext
 
 import logging
-from datetime import datetime
-from typing import Optional
-
-from lab_data_manager.queries import (
-    list_experiments,
-    list_experiments_between_dates,
-    list_experiments_in_period,
-    list_recent_experiments,
-    find_most_recent_experiment,
-    find_earliest_experiment,
-    count_experiments_by_period,
-    count_experiments_trend,
-    count_entity_by_another,
-    find_experiments_missing_files,
-    find_duplicate_experiments,
-    find_missing_values,
-)
+import uuid
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+from lab_data_manager.queries import count_entity_by_another, find_duplicate_experiments
 
+from . import config
+from .analytics import run_aggregate
 from .config import retry_config
+from .export import default_export_path, export_query
+from .lab_sql import (
+    FACT_COLUMNS,
+    ROW_ENTITIES,
+    AggregateQuery,
+    PagedQuery,
+    QueryPage,
+    date_columns_ready,
+    dated_experiment_query,
+    experiment_query,
+    fetch_page,
+    file_listing_query,
+    missing_files_query,
+    missing_values_query,
+)
+from .rate_limiter import record_model_usage, throttle_model_call
+from .result_cache import UncachedResult, cached_query
+from .result_encoding import encode_rows, estimate_tokens
+from .tool_executor import offload
 
 logger = logging.getLogger(__name__)
 
@@ -33,30 +46,135 @@ _DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sample
 
 current_date = datetime.now().strftime("%B %d, %Y")
 
+# Most rows a listing tool fetches and shows; the total is counted in SQL.
+MAX_RESULT_ROWS = 50
+# Session state key holding open result cursors, and how many are kept.
+QUERY_CURSORS_KEY = "query_cursors"
+MAX_CURSORS = 10
+
 # ---------------------------------------------------------------------------
-# Helper: convert a DataFrame result to a readable string for the agent
+# Helpers: render query results as strings for the agent
 # ---------------------------------------------------------------------------
 
-def _df_to_str(df, max_rows: int = 50) -> str:
+def _render(columns: list, rows: list, total: int, offset: int = 0) -> tuple[str, int]:
+    """Render rows in the configured result format.
+
+    Returns:
+        The text and how many rows it shows (the compact format may stop
+        early to stay within its token budget).
+    """
+    if config.QUERY_RESULT_FORMAT == "compact":
+        result, shown = encode_rows(columns, rows, total, config.QUERY_RESULT_TOKEN_BUDGET, offset)
+    else:
+        shown = len(rows)
+        result = pd.DataFrame(rows, columns=columns).to_string(index=False)
+        if total > offset + shown:
+            result += f"\n\n... ({total - offset - shown} more rows not shown.)"
+        else:
+            result += f"\n\nTotal records: {total}"
+    logger.info("Query result | rows=%s/%s tokens=%s", shown, total, estimate_tokens(result))
+    return result, shown
+
+
+def _df_to_str(df, max_rows: int = MAX_RESULT_ROWS) -> str:
     if df is None:
-        return "No results found or a database error occurred."
+        return UncachedResult("No results found or a database error occurred.")
     if df.empty:
         return "No records matched the given criteria."
-    total = len(df)
     shown = df.head(max_rows)
-    result = shown.to_string(index=False)
-    if total > max_rows:
-        result += f"\n\n... ({total - max_rows} more rows not shown. Use the limit parameter to retrieve more.)"
+    return _render(list(df.columns), list(shown.itertuples(index=False, name=None)), len(df))[0]
+
+
+def _page_size(limit: Optional[int]) -> int:
+    return max(1, min(limit or MAX_RESULT_ROWS, MAX_RESULT_ROWS))
+
+
+@cached_query
+def _cached_page(db_path: str, query: dict, page_size: int, after: Optional[list] = None, count: bool = True) -> QueryPage:
+    return fetch_page(db_path, PagedQuery.from_dict(query), page_size, after, count)
+
+
+def _save_cursor(tool_context: ToolContext, cursor_id: Optional[str], entry: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Create, update (entry given) or drop (entry None) a cursor in session state.
+
+    The whole mapping is reassigned so ADK records the state delta.
+    """
+    cursors = dict(tool_context.state.get(QUERY_CURSORS_KEY) or {})
+    if entry is None:
+        cursors.pop(cursor_id, None)
     else:
-        result += f"\n\nTotal records: {total}"
+        cursor_id = cursor_id or uuid.uuid4().hex[:8]
+        cursors.pop(cursor_id, None)
+        cursors[cursor_id] = entry
+        while len(cursors) > MAX_CURSORS:
+            cursors.pop(next(iter(cursors)))
+    tool_context.state[QUERY_CURSORS_KEY] = cursors
+    return cursor_id
+
+
+def _more_rows_hint(cursor_id: str, remaining: int) -> str:
+    return f"\n#cursor {cursor_id}: {remaining} more rows; call fetch_next_page with this cursor to continue."
+
+
+def _listing(tool_context: ToolContext, label: str, db_path: str, build: Callable[[], PagedQuery], limit: Optional[int], count: bool = True) -> str:
+    """Run a listing query and render its first page.
+
+    If rows remain, a cursor holding the query and the last shown sort key is
+    saved in session state so fetch_next_page can continue from there.
+    """
+    try:
+        query = build()
+        page = _cached_page(db_path, query.to_dict(), _page_size(limit), None, count)
+    except ValueError as exc:
+        logger.warning("%s rejected | %s", label, exc)
+        return f"Invalid request: {exc}"
+    except (sqlite3.Error, FileNotFoundError):
+        logger.exception("%s failed", label)
+        return "No results found or a database error occurred."
+    if not page.rows:
+        return "No records matched the given criteria."
+
+    total = page.total if page.total is not None else len(page.rows)
+    result, shown = _render(page.columns, page.rows, total)
+    if shown < total:
+        cursor_id = _save_cursor(tool_context, None, {
+            "tool": label,
+            "db_path": db_path,
+            "query": query.to_dict(),
+            "after": list(page.keys[shown - 1]),
+            "shown": shown,
+            "total": total,
+        })
+        result += _more_rows_hint(cursor_id, total - shown)
     return result
 
 
+def _aggregate(label: str, db_path: str, build: Callable[[], AggregateQuery], filters: Optional[dict]) -> str:
+    """Run a count/trend aggregate (mirror or SQLite) and render its groups."""
+    try:
+        page = run_aggregate(db_path, build(), filters)
+    except ValueError as exc:
+        logger.warning("%s rejected | %s", label, exc)
+        return UncachedResult(f"Invalid request: {exc}")
+    except (sqlite3.Error, FileNotFoundError):
+        # Often transient (e.g. "database is locked"); never cache it.
+        logger.exception("%s failed", label)
+        return UncachedResult("No results found or a database error occurred.")
+    if not page.rows:
+        return "No records matched the given criteria."
+    return _render(page.columns, page.rows[:MAX_RESULT_ROWS], len(page.rows))[0]
+
+
 # ---------------------------------------------------------------------------
-# Tool functions (each wraps one library query)
+# Tool functions
 # ---------------------------------------------------------------------------
+# Listings run through lab_sql so only the shown rows leave SQLite; counts
+# and trends go through analytics.run_aggregate; duplicate checks wrap the
+# lab_data_manager query directly.
 
+@offload()
 def search_experiments(
+    tool_context: ToolContext,
     filters: dict,
     db_path: str = _DEFAULT_DB_PATH,
     limit: int = 20,
@@ -82,11 +200,12 @@ def search_experiments(
         Formatted table of matching experiments.
     """
     logger.info("search_experiments | filters=%s limit=%s", filters, limit)
-    df = list_experiments(db_path, filters=filters, limit=limit)
-    return _df_to_str(df)
+    return _listing(tool_context, "search_experiments", db_path, lambda: experiment_query(filters, db_path), limit)
 
 
+@offload()
 def search_experiments_by_date_range(
+    tool_context: ToolContext,
     start_date: str,
     end_date: str,
     filters: dict,
@@ -107,11 +226,18 @@ def search_experiments_by_date_range(
         Formatted table of matching experiments ordered by date ascending.
     """
     logger.info("search_experiments_by_date_range | %s to %s filters=%s", start_date, end_date, filters)
-    df = list_experiments_between_dates(db_path, start_date, end_date, filters=filters, limit=limit)
-    return _df_to_str(df)
 
+    def build() -> PagedQuery:
+        return dated_experiment_query(
+            filters, start_date, end_date, indexed=date_columns_ready(db_path), db_path=db_path,
+        )
+
+    return _listing(tool_context, "search_experiments_by_date_range", db_path, build, limit)
 
+
+@offload()
 def search_experiments_in_period(
+    tool_context: ToolContext,
     filters: dict,
     db_path: str = _DEFAULT_DB_PATH,
     year: Optional[int] = None,
@@ -132,11 +258,25 @@ def search_experiments_in_period(
         Formatted table of matching experiments.
     """
     logger.info("search_experiments_in_period | year=%s month=%s filters=%s", year, month, filters)
-    df = list_experiments_in_period(db_path, year=year, month=month, filters=filters, limit=limit)
-    return _df_to_str(df)
 
+    def build() -> PagedQuery:
+        if year is None and month is None:
+            return experiment_query(filters, db_path)
+        if month is not None and not 1 <= int(month) <= 12:
+            raise ValueError("month must be between 1 and 12")
+        indexed = date_columns_ready(db_path)
+        if year is None:
+            return dated_experiment_query(filters, month=month, indexed=indexed, db_path=db_path)
+        start = f"{int(year):04d}{int(month or 1):02d}01"
+        end = f"{int(year):04d}{int(month or 12):02d}31"
+        return dated_experiment_query(filters, start, end, indexed=indexed, db_path=db_path)
 
+    return _listing(tool_context, "search_experiments_in_period", db_path, build, limit)
+
+
+@offload()
 def search_recent_experiments(
+    tool_context: ToolContext,
     days: int = 30,
     filters: dict = {},
     db_path: str = _DEFAULT_DB_PATH,
@@ -155,11 +295,19 @@ def search_recent_experiments(
         Formatted table of recent experiments ordered by date descending.
     """
     logger.info("search_recent_experiments | days=%s filters=%s", days, filters)
-    df = list_recent_experiments(db_path, days=days, filters=filters, limit=limit)
-    return _df_to_str(df)
+
+    def build() -> PagedQuery:
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y%m%d")
+        query = dated_experiment_query(filters, start=cutoff, indexed=date_columns_ready(db_path), db_path=db_path)
+        query.descending = True
+        return query
+
+    return _listing(tool_context, "search_recent_experiments", db_path, build, limit)
 
 
+@offload()
 def get_most_recent_experiment(
+    tool_context: ToolContext,
     filters: dict,
     db_path: str = _DEFAULT_DB_PATH,
 ) -> str:
@@ -174,11 +322,18 @@ def get_most_recent_experiment(
         The most recent matching experiment's details.
     """
     logger.info("get_most_recent_experiment | filters=%s", filters)
-    df = find_most_recent_experiment(db_path, filters=filters)
-    return _df_to_str(df)
+
+    def build() -> PagedQuery:
+        query = experiment_query(filters, db_path)
+        query.descending = True
+        return query
+
+    return _listing(tool_context, "get_most_recent_experiment", db_path, build, 1, count=False)
 
 
+@offload()
 def get_earliest_experiment(
+    tool_context: ToolContext,
     filters: dict,
     db_path: str = _DEFAULT_DB_PATH,
 ) -> str:
@@ -193,10 +348,12 @@ def get_earliest_experiment(
         The earliest matching experiment's details.
     """
     logger.info("get_earliest_experiment | filters=%s", filters)
-    df = find_earliest_experiment(db_path, filters=filters)
-    return _df_to_str(df)
+
+    return _listing(tool_context, "get_earliest_experiment", db_path, lambda: experiment_query(filters, db_path), 1, count=False)
 
 
+@offload()
+@cached_query
 def count_experiments_by_time_period(
     period: str = "year",
     filters: dict = {},
@@ -214,10 +371,13 @@ def count_experiments_by_time_period(
         Counts per period.
     """
     logger.info("count_experiments_by_time_period | period=%s filters=%s", period, filters)
-    df = count_experiments_by_period(db_path, period=period, filters=filters)
-    return _df_to_str(df)
+    return _aggregate(
+        "count_experiments_by_time_period", db_path, lambda: AggregateQuery(period=period), filters,
+    )
 
 
+@offload()
+@cached_query
 def count_experiments_by_group(
     group_by: list[str],
     filters: dict = {},
@@ -239,10 +399,13 @@ def count_experiments_by_group(
         Counts per group.
     """
     logger.info("count_experiments_by_group | group_by=%s period=%s filters=%s", group_by, period, filters)
-    df = count_experiments_trend(db_path, period=period, group_by=group_by, filters=filters)
-    return _df_to_str(df)
+    return _aggregate(
+        "count_experiments_by_group", db_path, lambda: AggregateQuery(group_by=group_by, period=period), filters,
+    )
 
 
+@offload()
+@cached_query
 def count_one_entity_by_another(
     entity: str,
     by_entities: list[str],
@@ -254,7 +417,9 @@ def count_one_entity_by_another(
     For example: "how many proteins per organism", "how many experiments per user".
 
     Args:
-        entity:      The entity to count (e.g., "experiment_id", "protein", "*" for rows).
+        entity:      The entity to count (e.g., "experiment_id", "protein", "raw_file_id").
+                     "*" counts experiments (the same as "experiment_id"), not
+                     rows of the experiment/file join.
         by_entities: List of entities to group by (e.g., ["organism"], ["user_name", "protein"]).
         filters:     Additional filter criteria.
         db_path:     Path to the SQLite database file.
@@ -263,11 +428,20 @@ def count_one_entity_by_another(
         Counts per group.
     """
     logger.info("count_one_entity_by_another | entity=%s by=%s filters=%s", entity, by_entities, filters)
-    df = count_entity_by_another(db_path, entity=entity, by_entities=by_entities, filters=filters)
-    return _df_to_str(df)
+    counted = entity in ROW_ENTITIES or entity in FACT_COLUMNS
+    if not counted or not set(by_entities or []) <= set(FACT_COLUMNS):
+        # File-level entities (raw_file_id, mask_type, ...) are not in the
+        # per-experiment facts; count them over lab_data_manager's full join.
+        df = count_entity_by_another(db_path, entity=entity, by_entities=by_entities, filters=filters)
+        return _df_to_str(df)
+    return _aggregate(
+        "count_one_entity_by_another", db_path, lambda: AggregateQuery(group_by=by_entities, entity=entity), filters,
+    )
 
 
+@offload(max_concurrency=2)
 def find_experiments_with_missing_files(
+    tool_context: ToolContext,
     file_types: list[str] = ["raw", "tracking", "mask", "analysis"],
     filters: dict = {},
     db_path: str = _DEFAULT_DB_PATH,
@@ -286,10 +460,14 @@ def find_experiments_with_missing_files(
         Table of experiments missing the specified file types.
     """
     logger.info("find_experiments_with_missing_files | file_types=%s filters=%s", file_types, filters)
-    df = find_experiments_missing_files(db_path, file_types=file_types, filters=filters, limit=limit)
-    return _df_to_str(df)
+    return _listing(
+        tool_context, "find_experiments_with_missing_files", db_path,
+        lambda: missing_files_query(file_types, filters, db_path), limit,
+    )
 
 
+@offload(max_concurrency=2)
+@cached_query
 def find_duplicate_experiment_records(
     filters: dict = {},
     db_path: str = _DEFAULT_DB_PATH,
@@ -311,7 +489,9 @@ def find_duplicate_experiment_records(
     return _df_to_str(df)
 
 
+@offload(max_concurrency=2)
 def find_records_with_missing_values(
+    tool_context: ToolContext,
     requested_columns: list[str],
     missing_columns: list[str],
     main_table: str = "Experiment",
@@ -336,8 +516,108 @@ def find_records_with_missing_values(
         Records that have missing values in the specified columns.
     """
     logger.info("find_records_with_missing_values | missing=%s table=%s mode=%s", missing_columns, main_table, mode)
-    df = find_missing_values(db_path, requested_columns, missing_columns, main_table=main_table, mode=mode, filters=filters, limit=limit)
-    return _df_to_str(df)
+
+    return _listing(
+        tool_context, "find_records_with_missing_values", db_path,
+        lambda: missing_values_query(db_path, main_table, requested_columns, missing_columns, mode, filters), limit,
+    )
+
+
+@offload()
+def fetch_next_page(
+    tool_context: ToolContext,
+    cursor: str,
+    page_size: int = 20,
+) -> str:
+    """
+    Continue a listing that was cut short, returning only rows not shown yet.
+
+    Args:
+        cursor:    The cursor id from a previous result's "#cursor" line.
+        page_size: Maximum number of rows to return.
+
+    Returns:
+        The next rows of the listing, with a new cursor if more remain.
+    """
+    logger.info("fetch_next_page | cursor=%s page_size=%s", cursor, page_size)
+    entry = (tool_context.state.get(QUERY_CURSORS_KEY) or {}).get(cursor)
+    if entry is None:
+        return f"Cursor '{cursor}' is unknown or exhausted. Rerun the original query instead."
+    try:
+        page = _cached_page(entry["db_path"], entry["query"], _page_size(page_size), entry["after"], False)
+    except (sqlite3.Error, FileNotFoundError):
+        logger.exception("fetch_next_page failed | cursor=%s", cursor)
+        return "No results found or a database error occurred."
+    if not page.rows:
+        _save_cursor(tool_context, cursor, None)
+        return "No more rows."
+
+    # The total was counted on the first page; rows inserted since may exceed it.
+    total = max(entry["total"], entry["shown"] + len(page.rows))
+    result, shown = _render(page.columns, page.rows, total, entry["shown"])
+    seen = entry["shown"] + shown
+    if shown < len(page.rows) or seen < total:
+        _save_cursor(tool_context, cursor, {**entry, "after": list(page.keys[shown - 1]), "shown": seen, "total": total})
+        result += _more_rows_hint(cursor, total - seen)
+    else:
+        _save_cursor(tool_context, cursor, None)
+    return result
+
+
+def _user_request_text(tool_context: ToolContext) -> str:
+    content = getattr(tool_context, "user_content", None)
+    parts = getattr(content, "parts", None) or []
+    return " ".join(part.text for part in parts if getattr(part, "text", None))
+
+
+@offload(max_concurrency=2)
+def export_query_results(
+    tool_context: ToolContext,
+    filters: dict,
+    record_type: str = "experiments",
+    file_format: str = "csv",
+    output_path: Optional[str] = None,
+    db_path: str = _DEFAULT_DB_PATH,
+) -> str:
+    """
+    Export every matching record to a file instead of showing it in the chat.
+
+    Args:
+        filters:     Filter criteria (same keys as search_experiments).
+        record_type: "experiments" for one row per experiment, or "raw_files",
+                     "tracking_files", "masks" for one row per file of the
+                     matching experiments.
+        file_format: "csv", "jsonl" or "parquet".
+        output_path: New file name inside the exports folder. Omit to generate one.
+                     Paths outside that folder and existing files are refused.
+        db_path:     Path to the SQLite database file.
+
+    Returns:
+        The path of the written file and how many rows it contains.
+    """
+    logger.info("export_query_results | record_type=%s format=%s filters=%s", record_type, file_format, filters)
+    file_format = (file_format or "csv").lower()
+    try:
+        if record_type == "experiments":
+            query = experiment_query(filters, db_path)
+        else:
+            query = file_listing_query(record_type, filters, db_path)
+        path = output_path or default_export_path(record_type, file_format)
+        metadata = {
+            "request": _user_request_text(tool_context),
+            "record_type": record_type,
+            "filters": filters or {},
+            "database": os.path.abspath(db_path),
+            "exported_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        result = export_query(db_path, query, file_format, path, metadata)
+    except ValueError as exc:
+        logger.warning("export_query_results rejected | %s", exc)
+        return f"Invalid request: {exc}"
+    except (sqlite3.Error, OSError):
+        logger.exception("export_query_results failed")
+        return "The export failed because of a database or file system error."
+    return f"Exported {result.rows} rows to {result.path}"
 
 
 # ---------------------------------------------------------------------------
@@ -382,8 +662,19 @@ Do NOT use synonyms or variations. Do NOT include keys that the user did not men
 - "experiments missing [file type] files" → find_experiments_with_missing_files
 - "duplicate experiments" → find_duplicate_experiment_records
 - "experiments with missing [column]" or "incomplete data" → find_records_with_missing_values
+- "show more", "next page", "the rest" after a truncated result → fetch_next_page with the result's cursor
+- "export/save/download [records] to a file/CSV/JSON/Parquet" → export_query_results
 
 # OUTPUT RULES
+- Tool results are tab-separated. Lines starting with "@" apply to every row:
+  "@const col=value" is a column with the same value in all rows, "@prefix col=P" means
+  P is prepended to every value of col, and "@dict $n=value" defines what $n stands for.
+  A leading backslash escapes a literal value ("\\$1" is the text "$1"), and a value ending in
+  "…[+N chars]" was shortened.
+  "#rows first-last/total" gives which rows were returned out of all matches.
+  Expand these when presenting results; never show the encoding to the user.
+- A "#cursor ID" line means more rows exist. To show them, call fetch_next_page(cursor=ID);
+  do not rerun the original query with a larger limit.
 - After calling a tool, present the results clearly and concisely to the user.
 - If the result is empty, say so and suggest the user refine their query.
 - If you are unsure which tool to use, pick the closest match and explain your interpretation.
@@ -396,6 +687,8 @@ try:
         model=Gemini(model="gemini-2.5-flash-lite", api_key=os.getenv("GOOGLE_API_KEY"), retry_config=retry_config),
         description="Answers natural language questions about lab data by querying the database. Handles search, filtering, counting, trend analysis, and data quality checks.",
         instruction=query_prompt,
+        before_model_callback=throttle_model_call,
+        after_model_callback=record_model_usage,
         tools=[
             search_experiments,
             search_experiments_by_date_range,
@@ -409,6 +702,8 @@ try:
             find_experiments_with_missing_files,
             find_duplicate_experiment_records,
             find_records_with_missing_values,
+            fetch_next_page,
+            export_query_results,
         ],
         output_key="query_result",
     )
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import re
+import time
+import random
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+from .config import DEFAULT_MODEL_QUOTA, MODEL_QUOTAS
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Token buckets
+# ---------------------------------------------------------------------------
+
+class TokenBucket:
+    """Continuously refilling bucket. The level may go negative after a
+    usage correction, which simply delays the next grant."""
+
+    def __init__(self, capacity: float, per_minute: float):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+
+@dataclass
+class LimiterStats:
+    granted: int = 0
+    total_wait_s: float = 0.0
+    max_wait_s: float = 0.0
+    penalties: int = 0
+
+
+class ModelRateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter for one model.
+
+    Waiters are queued per session and granted round-robin, so one session
+    issuing a burst of calls cannot starve the others.
+    """
+
+    def __init__(self, model: str, rpm: int, tpm: int):
+        self.model = model
+        self.requests = TokenBucket(rpm, rpm)
+        self.tokens = TokenBucket(tpm, tpm)
+        self.stats = LimiterStats()
+        self._blocked_until = 0.0
+        self._queues: OrderedDict[str, deque] = OrderedDict()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def penalize(self, retry_after: float) -> None:
+        """Pause all grants after the provider rejected a call with 429."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        self.stats.penalties += 1
+
+    def correct_usage(self, delta_tokens: float) -> None:
+        """Adjust the token bucket once the real token count is known."""
+        self.tokens.take(delta_tokens)
+
+    def _delay_for(self, tokens: float) -> float:
+        return max(
+            self._blocked_until - time.monotonic(),
+            self.requests.delay_for(1),
+            self.tokens.delay_for(tokens),
+        )
+
+    async def _dispatch(self) -> None:
+        while self._queues:
+            session_key = next(iter(self._queues))
+            queue = self._queues[session_key]
+            future, tokens = queue.popleft()
+            if queue:
+                self._queues.move_to_end(session_key)
+            else:
+                del self._queues[session_key]
+            if future.cancelled():
+                continue
+            delay = self._delay_for(tokens)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self._delay_for(tokens)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            if not future.cancelled():
+                future.set_result(None)
+
+    async def acquire(self, session_key: str, tokens: float) -> float:
+        """Wait for capacity; returns the seconds spent waiting."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queues.setdefault(session_key, deque()).append((future, tokens))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+
+        started = time.monotonic()
+        await future
+        waited = time.monotonic() - started
+        self.stats.granted += 1
+        self.stats.total_wait_s += waited
+        self.stats.max_wait_s = max(self.stats.max_wait_s, waited)
+        return waited
+
+
+_limiters: Dict[str, ModelRateLimiter] = {}
+
+
+def get_limiter(model: str) -> ModelRateLimiter:
+    """Process-wide limiter for a model, sized from MODEL_QUOTAS."""
+    limiter = _limiters.get(model)
+    if limiter is None:
+        rpm, tpm = MODEL_QUOTAS.get(model, DEFAULT_MODEL_QUOTA)
+        limiter = _limiters[model] = ModelRateLimiter(model, rpm, tpm)
+    return limiter
+
+
+def penalize_all(retry_after: float) -> None:
+    for limiter in _limiters.values():
+        limiter.penalize(retry_after)
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-model grant counts and queueing delays."""
+    return {model: dict(vars(limiter.stats)) for model, limiter in _limiters.items()}
+
+
+# ---------------------------------------------------------------------------
+# Backoff helpers
+# ---------------------------------------------------------------------------
+
+_RETRY_DELAY_RE = re.compile(r"retry(?:Delay| in)[\"':\s]*([\d.]+)\s*s", re.IGNORECASE)
+
+
+def retry_after_hint(error: Exception) -> Optional[float]:
+    """Extract a retry delay in seconds from a Gemini 429 error, if present."""
+    match = _RETRY_DELAY_RE.search(str(getattr(error, "details", "")) + " " + str(error))
+    return float(match.group(1)) if match else None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None, base: float = 2.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter, never shorter than retry_after."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+# ---------------------------------------------------------------------------
+# Agent callbacks
+# ---------------------------------------------------------------------------
+
+def _estimate_tokens(llm_request: LlmRequest) -> int:
+    chars = sum(
+        len(part.text or "")
+        for content in llm_request.contents or []
+        for part in content.parts or []
+    )
+    instruction = getattr(llm_request.config, "system_instruction", None)
+    chars += len(str(instruction or ""))
+    return max(1, chars // 4)
+
+
+def _session_key(callback_context: CallbackContext) -> str:
+    session = getattr(callback_context, "session", None)
+    if session is None:
+        session = callback_context._invocation_context.session
+    return session.id
+
+
+async def throttle_model_call(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """before_model_callback that waits for rate-limit capacity.
+
+    The time spent waiting is stored in temp state so tracing can attach it
+    to the model span.
+    """
+    model = llm_request.model or "unknown"
+    estimated = _estimate_tokens(llm_request)
+    waited = await get_limiter(model).acquire(_session_key(callback_context), estimated)
+    callback_context.state["temp:rate_limit_wait_s"] = round(waited, 3)
+    callback_context.state["temp:rate_limit_estimated_tokens"] = estimated
+    callback_context.state["temp:rate_limit_model"] = model
+    if waited > 0.05:
+        logger.info("Rate limiter wait | model=%s agent=%s waited=%.2fs", model, callback_context.agent_name, waited)
+    return None
+
+
+def record_model_usage(callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+    """after_model_callback that reconciles estimated and actual token usage."""
+    usage = llm_response.usage_metadata
+    estimated = callback_context.state.get("temp:rate_limit_estimated_tokens")
+    model = callback_context.state.get("temp:rate_limit_model")
+    if usage is None or not usage.total_token_count or estimated is None or model not in _limiters:
+        return None
+    _limiters[model].correct_usage(usage.total_token_count - estimated)
+    return None
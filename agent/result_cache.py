@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import inspect
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Database change detection
+# ---------------------------------------------------------------------------
+
+def db_version(db_path: str) -> Optional[tuple]:
+    """Return a cheap fingerprint that changes whenever the SQLite file changes.
+
+    Both the main file and its WAL are included, because in WAL mode committed
+    writes may only touch the -wal file until the next checkpoint.
+    Returns None if the database file does not exist.
+    """
+    fingerprint = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            if path == db_path:
+                return None
+            continue
+        fingerprint.append((st.st_mtime_ns, st.st_size))
+    return tuple(fingerprint)
+
+
+def normalize_db_path(db_path: str) -> str:
+    """Canonical form of a database path used as a cache and pool key."""
+    return os.path.realpath(os.path.expanduser(db_path))
+
+
+# ---------------------------------------------------------------------------
+# Bounded LRU + TTL cache
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    version: Optional[tuple]
+    created_at: float
+
+
+class QueryResultCache:
+    """Thread-safe LRU cache with a TTL and per-database invalidation.
+
+    Entries are stored together with the database fingerprint observed when
+    they were computed; a lookup against a changed database is a miss.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple, _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: tuple, version: Optional[tuple]) -> tuple[bool, Any]:
+        """Return (found, value) for a key at the given database version."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return False, None
+            expired = time.monotonic() - entry.created_at > self.ttl_seconds
+            if expired or entry.version != version:
+                del self._entries[key]
+                self._counters["misses"] += 1
+                self._counters["invalidations"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return True, entry.value
+
+    def put(self, key: tuple, value: Any, version: Optional[tuple]) -> None:
+        with self._lock:
+            self._entries[key] = _CacheEntry(value, version, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, db_path: Optional[str] = None) -> int:
+        """Drop all entries for one database, or everything if db_path is None."""
+        with self._lock:
+            if db_path is None:
+                keys = list(self._entries)
+            else:
+                target = normalize_db_path(db_path)
+                keys = [key for key in self._entries if key[0] == target]
+            for key in keys:
+                del self._entries[key]
+            self._counters["invalidations"] += len(keys)
+        logger.info("query cache invalidated | db_path=%s entries=%s", db_path, len(keys))
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+
+query_cache = QueryResultCache(
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", "300")),
+)
+
+
+def invalidate_db(db_path: Optional[str] = None) -> None:
+    """Hook for write paths (deletion, insertion) to drop stale results."""
+    query_cache.invalidate(db_path)
+
+
+# ---------------------------------------------------------------------------
+# Decorator for query tools
+# ---------------------------------------------------------------------------
+
+class UncachedResult(str):
+    """A tool result that cached_query returns but never stores.
+
+    Query tools report failures as text; wrapping that text keeps a transient
+    error (e.g. "database is locked") from being served again from the cache.
+    """
+
+
+def _canonical(value: Any) -> Any:
+    """Normalise arguments so equivalent requests share a cache key."""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items()) if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def cached_query(func: Callable) -> Callable:
+    """Cache a query tool's result keyed on (db_path, tool name, arguments).
+
+    The wrapped function keeps its name, signature and docstring so ADK builds
+    the same tool declaration as for the undecorated function. Results of
+    type UncachedResult are returned without being stored.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        db_path = normalize_db_path(arguments.pop("db_path"))
+        key = (
+            db_path,
+            func.__name__,
+            json.dumps(_canonical(arguments), sort_keys=True, default=str),
+        )
+        version = db_version(db_path)
+        if version is None:
+            # Missing database: let the query report the error, never cache it.
+            return func(*args, **kwargs)
+        found, value = query_cache.get(key, version)
+        if found:
+            logger.debug("query cache hit | tool=%s", func.__name__)
+            return value
+        value = func(*args, **kwargs)
+        if isinstance(value, UncachedResult):
+            logger.debug("query cache skip | tool=%s", func.__name__)
+        else:
+            query_cache.put(key, value, version)
+        return value
+
+    return wrapper
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import math
+import os
+import logging
+from collections import Counter
+from typing import Any, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Token-lean tabular encoding for tool results
+# ---------------------------------------------------------------------------
+# Results are sent back to the model on the next turn, so every padded cell
+# and repeated path costs prompt tokens. The compact format is:
+#
+#   @const organism=yeast              value shared by every row (column dropped)
+#   @prefix file_path=/lab/data/exp1/  strip this prefix from the column's cells
+#   @dict $1=20230803-1_yeast_Rfa1...  long value repeated across rows
+#   experiment_id<TAB>date<TAB>...     TSV header, then one TSV line per row
+#   #rows 1-50/1234                    rows shown / total rows
+#
+# A cell that starts with "$" or "\" but is not a reference gets a leading
+# "\". Cells longer than the budget allows are cut and end in
+# "…[+N chars]". The header lines describe only the rows shown.
+
+PATH_COLUMNS = frozenset({
+    "file_path", "experiment_path", "mask_path", "result_path", "Analysis_file_path", "analysis_file_path",
+})
+# Values at least this long that repeat are replaced by dictionary references.
+DICT_MIN_LENGTH = 12
+DICT_MIN_REPEATS = 3
+# Longest cell kept whole; a tight budget lowers this so one row still fits.
+MAX_CELL_CHARS = int(os.getenv("QUERY_RESULT_MAX_CELL_CHARS", "300"))
+MIN_CELL_CHARS = 24
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English/TSV)."""
+    return math.ceil(len(text) / 4)
+
+
+def _cell(value: Any) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    # Tabs and newlines would break the TSV framing.
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    marker = f"…[+{len(text) - limit} chars]"
+    return text[: max(limit - len(marker), 0)] + marker
+
+
+def _escape(text: str) -> str:
+    return "\\" + text if text.startswith(("$", "\\")) else text
+
+
+def _common_prefix(values: List[str]) -> str:
+    prefix = os.path.commonprefix(values)
+    # Only fold whole directory components.
+    cut = prefix.rfind("/")
+    return prefix[: cut + 1] if cut > 0 else ""
+
+
+def _encode(columns: List[str], cells: List[List[str]]) -> List[str]:
+    """Header and TSV lines for exactly these rows."""
+    cells = [list(row) for row in cells]
+    header: List[str] = []
+    keep = list(range(len(columns)))
+    refs: dict = {}
+
+    if len(cells) > 1:
+        for index, name in enumerate(columns):
+            values = {row[index] for row in cells}
+            if len(values) == 1:
+                header.append(f"@const {name}={next(iter(values))}")
+                keep.remove(index)
+            elif name in PATH_COLUMNS:
+                prefix = _common_prefix([row[index] for row in cells if row[index]])
+                if prefix:
+                    header.append(f"@prefix {name}={prefix}")
+                    for row in cells:
+                        if row[index].startswith(prefix):
+                            row[index] = row[index][len(prefix):]
+
+        counts = Counter(row[i] for row in cells for i in keep if len(row[i]) >= DICT_MIN_LENGTH)
+        refs = {value: f"${n}" for n, (value, count) in enumerate(counts.most_common(), 1) if count >= DICT_MIN_REPEATS}
+        header.extend(f"@dict {ref}={value}" for value, ref in refs.items())
+
+    lines = header + ["\t".join(columns[i] for i in keep)]
+    for row in cells:
+        lines.append("\t".join(refs.get(row[i]) or _escape(row[i]) for i in keep))
+    return lines
+
+
+def encode_rows(columns: Sequence[str], rows: Sequence[Sequence[Any]], total: int, token_budget: int, offset: int = 0) -> tuple[str, int]:
+    """Encode rows in the compact format, keeping as many rows as fit the budget.
+
+    At least one row is shown; its cells are cut so that it roughly fits.
+
+    Args:
+        columns:      Column names.
+        rows:         Candidate rows (already limited by the caller).
+        total:        Total number of matching rows, used in the footer.
+        token_budget: Approximate maximum tokens for the whole result.
+        offset:       Rows shown on earlier pages of the same listing.
+
+    Returns:
+        The encoded result and how many of `rows` it contains.
+    """
+    columns = list(columns)
+    cell_limit = max(MIN_CELL_CHARS, min(MAX_CELL_CHARS, token_budget * 4 // (2 * max(len(columns), 1))))
+    cells = [[_truncate(_cell(v), cell_limit) for v in row] for row in rows]
+
+    def cost(lines: List[str]) -> int:
+        return estimate_tokens("\n".join(lines)) + 10
+
+    # The header depends on which rows are shown, so search for the largest
+    # prefix of rows whose complete encoding fits.
+    lines = _encode(columns, cells[:1])
+    shown = min(len(cells), 1)
+    low, high = 2, len(cells)
+    while low <= high:
+        middle = (low + high) // 2
+        candidate = _encode(columns, cells[:middle])
+        if cost(candidate) <= token_budget:
+            lines, shown, low = candidate, middle, middle + 1
+        else:
+            high = middle - 1
+
+    lines.append(f"#rows {offset + 1}-{offset + shown}/{total}")
+    return "\n".join(lines), shown
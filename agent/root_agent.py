@@ -4,16 +4,19 @@ from __future__ import annotations
 from google.adk.agents import Agent
 from google.adk.models.google_llm import Gemini
 from google.adk.apps.app import App, ResumabilityConfig, EventsCompactionConfig
-from google.adk.plugins.logging_plugin import LoggingPlugin
 
 import os
 import logging
 
+from observability.tracing_plugin import TracingPlugin
+
 # Import sibling modules using relative imports
 from . import delete_supervisor_agent as delete_mod
 from . import insert_supervisor_agent as insert_mod
 from . import query_agent as query_mod
 from .config import retry_config
+from .intent_router import fast_path_route
+from .rate_limiter import record_model_usage, throttle_model_call
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +47,10 @@ try:
         model=Gemini(model="gemini-2.5-flash", api_key=os.getenv("GOOGLE_API_KEY"), retry_config=retry_config),
         description="Root orchestrator for Laboratory Data Management.",
         instruction=root_prompt,
+        # Unambiguous requests are routed locally without a model call;
+        # only requests that reach the LLM are charged to the rate limiter.
+        before_model_callback=[fast_path_route, throttle_model_call],
+        after_model_callback=record_model_usage,
     
         # We use the specialist operation agents as sub-agents
         # Pass the actual Agent instances defined in the modules
@@ -69,7 +76,7 @@ try:
         events_compaction_config=EventsCompactionConfig(
             compaction_interval=5,  # Cleanup every 5 turns
             overlap_size=2),          # Keep the 2 newest messages, summarize the rest
-        plugins=[LoggingPlugin()]
+        plugins=[TracingPlugin()]
         )
     logger.info(f"DB Manager app: {db_manager_app.name} created successfully.")
 except Exception as e:
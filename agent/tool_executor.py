@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import os
+import time
+import asyncio
+import logging
+import functools
+import weakref
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Shared worker pool for blocking tool bodies
+# ---------------------------------------------------------------------------
+# Tool functions run synchronous SQLite and pandas code. Executing them on the
+# event loop would stall every other session served by the same process, so
+# they are dispatched to a bounded thread pool instead. sqlite3 releases the
+# GIL while a statement runs, which keeps the threads genuinely concurrent.
+
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", str(min(8, (os.cpu_count() or 2) * 2))))
+
+_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="db-tool")
+
+
+@dataclass
+class ToolMetrics:
+    """Per-tool counters for queueing and execution."""
+
+    queued: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+    max_queue_depth: int = 0
+    total_wait_s: float = 0.0
+    total_run_s: float = 0.0
+
+
+_metrics: Dict[str, ToolMetrics] = {}
+_metrics_lock = threading.Lock()
+# Per-tool semaphores are created lazily for each running event loop and are
+# dropped together with the loop. A semaphore that ever had waiters references
+# its loop, so entries of closed loops are also pruned explicitly.
+_semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]] = weakref.WeakKeyDictionary()
+
+
+def tool_metrics() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of queue depth and timing counters for every offloaded tool."""
+    with _metrics_lock:
+        return {name: dict(vars(m)) for name, m in _metrics.items()}
+
+
+def _semaphore(name: str, limit: int) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _metrics_lock:
+        for stale in [other for other in _semaphores.keys() if other.is_closed()]:
+            del _semaphores[stale]
+        per_loop = _semaphores.setdefault(loop, {})
+    sem = per_loop.get(name)
+    if sem is None:
+        sem = per_loop[name] = asyncio.Semaphore(limit)
+    return sem
+
+
+def offload(max_concurrency: Optional[int] = None) -> Callable:
+    """Run a blocking tool in the worker pool behind an async wrapper.
+
+    The wrapper keeps the original name, signature and docstring, so ADK
+    registers the same tool declaration and awaits the coroutine.
+
+    Args:
+        max_concurrency: Optional cap on simultaneous executions of this tool,
+            on top of the global worker limit.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        name = func.__name__
+        with _metrics_lock:
+            metrics = _metrics.setdefault(name, ToolMetrics())
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            enqueued = time.perf_counter()
+            # "queued" until a worker starts it, "abandoned" if cancelled first.
+            call_state = {"started": False, "abandoned": False}
+            with _metrics_lock:
+                metrics.queued += 1
+                metrics.max_queue_depth = max(metrics.max_queue_depth, metrics.queued)
+
+            def run():
+                started = time.perf_counter()
+                with _metrics_lock:
+                    if not call_state["abandoned"]:
+                        metrics.queued -= 1
+                    call_state["started"] = True
+                    metrics.running += 1
+                    metrics.total_wait_s += started - enqueued
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    with _metrics_lock:
+                        metrics.running -= 1
+                        metrics.total_run_s += time.perf_counter() - started
+
+            # Copy the caller's context so contextvars (e.g. tracing spans)
+            # remain visible inside the worker thread.
+            call = functools.partial(contextvars.copy_context().run, run)
+            loop = asyncio.get_running_loop()
+            try:
+                if max_concurrency is None:
+                    result = await loop.run_in_executor(_executor, call)
+                else:
+                    async with _semaphore(name, max_concurrency):
+                        result = await loop.run_in_executor(_executor, call)
+            except BaseException:
+                with _metrics_lock:
+                    metrics.failed += 1
+                    if not call_state["started"]:
+                        call_state["abandoned"] = True
+                        metrics.queued -= 1
+                raise
+            with _metrics_lock:
+                metrics.completed += 1
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def shutdown_executor() -> None:
+    """Stop accepting tool work and wait for running calls to finish."""
+    _executor.shutdown(wait=True)
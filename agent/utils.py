@@ -1,222 +1,100 @@
 from __future__ import annotations
 
-from google.adk.tools.tool_context import ToolContext
 from google.genai.errors import ClientError
 from google.adk.runners import InMemoryRunner
 
 
 from lab_data_manager import data_validation, insert_csv
 from lab_data_manager.insert_csv import insert_from_csv
-from lab_data_manager.delete_records import delete_records_by_filter
 
-from .pydantic_models import ALLOWED_TABLES, StrictLabFilters, TABLE_ALIASES
+from .bulk_ingest import bulk_insert_csv
+from .csv_validation import validate_metadata
+from .delete_tools import clear_pending_deletion, execute_deletion, preview_deletion, resolve_table_name  # noqa: F401
+from .rate_limiter import backoff_delay, penalize_all, retry_after_hint
+from .result_cache import invalidate_db
+from .tool_executor import offload
 
-import re
+import inspect
 import logging
 import asyncio
+import functools
 from typing import Any, Dict, Optional
 
 
 logger = logging.getLogger(__name__)
 
 
-# ADK State is mapping-like but does not implement dict.pop(). Assigning None
-# records a state delta and makes subsequent pending-deletion checks evaluate
-# as empty.
-def clear_pending_deletion(tool_context: ToolContext) -> None:
-    tool_context.state["pending_deletion"] = None
-
-
 # -----------------------------------------------------------------
-# Table name normalisation (replaces DeletionSchema.map_table_names)
+# Validation utilities
 # -----------------------------------------------------------------
 
-def resolve_table_name(table: str) -> str:
-    """Map natural language aliases to canonical table names.
-
-    For example, "track" maps to "TrackingFiles" and "raw files" maps to
-    "RawFiles".
-    Returns the input unchanged if no alias matches.
+@offload(max_concurrency=1)
+def validate_metadata_csv(csv_path: str, output_path: str, max_errors: Optional[int] = None) -> Dict[str, Any]:
     """
-    name = table.strip().lower()
-    for alias, canonical in TABLE_ALIASES.items():
-        if re.search(rf'\b{alias}\b', name):
-            return canonical
-    return table
+    Validates a metadata CSV (raw, tracking and mask file rows) before
+    insertion and writes the invalid rows, with their line numbers and errors,
+    to output_path. Rows are checked by lab_data_manager's validate_csv, in
+    parallel chunks. Returns invalid_count and the first invalid rows. The
+    file is valid when invalid_count is 0.
+    Pass max_errors to stop reading after that many invalid rows.
+    """
+    try:
+        result = validate_metadata(csv_path, output_path, max_errors=max_errors)
+    except Exception as e:
+        logger.exception("validate_metadata_csv failed | csv=%s", csv_path)
+        return {"status": "error", "message": f"Validation failed: {e}"}
+    return {"status": "completed", **result}
 
 
 # -----------------------------------------------------------------
-# Delete operation utilities
+# Insert operation utilities
 # -----------------------------------------------------------------
 
-def preview_deletion(tool_context: ToolContext, db_path: str, table: str, filters: dict, limit: int | None = None) -> Dict[str, Any]:
-    """
-    Validates filters, performs a dry-run, and stores the pending operation in
-    session state. Does NOT delete anything.
-    """
-    # --- Resolve table alias ("track" → "TrackingFiles") ---
-    table = resolve_table_name(table)
+_INSERT_SIGNATURE = inspect.signature(insert_from_csv)
 
-    # --- Safety checks ---
-    if not table:
-        logger.warning("preview_deletion blocked: no table specified")
-        return {"status": "blocked", "message": "No table specified. Please provide a table name."}
-    if not filters:
-        logger.warning("preview_deletion blocked: empty filters for table=%s", table)
-        return {
-            "status": "blocked",
-            "message": (
-                f"No filter criteria provided. Deleting without filters would remove "
-                f"ALL records from '{table}'. Please specify criteria (e.g. date, organism, is_valid)."
-            ),
-        }
-    if table not in ALLOWED_TABLES:
-        logger.warning("preview_deletion blocked: unsupported table=%s", table)
-        return {
-            "status": "blocked",
-            "message": f"Unsupported table name: '{table}'.",
-        }
 
-    # Validate again at the database boundary and reject unsupported fields.
+def _insert_db_path(args: tuple, kwargs: dict) -> Optional[str]:
+    """db_path of an insert_from_csv call, or None (every database) if unknown."""
     try:
-        validated = StrictLabFilters(**filters)
-        clean_filters = validated.model_dump(exclude_none=True)
-    except Exception as e:
-        logger.warning("preview_deletion blocked: invalid filters | %s", e)
-        return {
-            "status": "blocked",
-            "message": f"Invalid filter fields: {e}",
-        }
-
-    logger.info("preview_deletion | table=%s filters=%s", table, clean_filters)
+        bound = _INSERT_SIGNATURE.bind(*args, **kwargs)
+    except TypeError:
+        return None
+    bound.apply_defaults()
+    return bound.arguments.get("db_path")
+
+
+@offload(max_concurrency=1)
+@functools.wraps(insert_from_csv)
+def insert_from_csv_tool(*args, **kwargs):
+    # Same name, signature and docstring as the library function so the
+    # insert agent sees an identical tool; cached query results for the
+    # target database are dropped once the insert has run.
     try:
-        result = delete_records_by_filter(
-            db_path,
-            table,
-            clean_filters,
-            limit,
-            dry_run=True,
-        )
-    except Exception as e:
-        clear_pending_deletion(tool_context)
-        logger.exception(
-            "preview_deletion failed | table=%s filters=%s",
-            table,
-            clean_filters,
-        )
-        return {
-            "status": "error",
-            "message": f"Deletion preview failed: {e}",
-        }
+        return insert_from_csv(*args, **kwargs)
+    finally:
+        invalidate_db(_insert_db_path(args, kwargs))
 
-    preview_count = result.get("preview_count", 0)
-    if preview_count <= 0:
-        clear_pending_deletion(tool_context)
-        return {
-            "status": "no_matches",
-            "preview_count": 0,
-            "message": "No records matched the deletion criteria.",
-        }
 
-    # Store pending deletion so execute_deletion can read it on the next turn
-    tool_context.state["pending_deletion"] = {
-        "db_path": db_path,
-        "table": table,
-        "filters": clean_filters,
-        "limit": limit,
-        "preview_count": preview_count,
-    }
-    logger.info("preview_deletion stored in state | count=%s", preview_count)
-    return {
-        "status": "preview",
-        "preview_count": preview_count,
-        "message": (
-            f"{preview_count} record(s) from '{table}' would be deleted.\n"
-            f"Filters applied: {clean_filters}\n"
-            "Review the platform confirmation request to approve or reject deletion."
-        ),
-    }
-
-
-def execute_deletion(tool_context: ToolContext) -> Dict[str, Any]:
+@offload(max_concurrency=1)
+def bulk_insert_from_csv(csv_path: str, db_path: str) -> Dict[str, Any]:
     """
-    Handles the confirmed or rejected deletion that was previewed previously.
-    Reads db_path, table, filters, and limit from session state key
-    'pending_deletion'. This tool must be registered with confirmation required.
-    Pending state is cleared after approval, rejection, or execution failure.
+    Inserts the rows of a validated metadata CSV into an existing database in
+    bulk. Missing organisms, proteins, conditions, capture settings, users and
+    experiments are created; files already in the database are counted as
+    duplicates. Returns rows read, inserted, duplicates and invalid rows, the
+    invalid rows with their line numbers and errors, and rows per second.
     """
-    pending = tool_context.state.get("pending_deletion")
-    if not pending:
-        logger.warning("execute_deletion called but no pending_deletion in state")
-        return {
-            "status": "error",
-            "message": "No pending deletion found. Please submit a new delete request.",
-        }
-
-    confirmation = getattr(tool_context, "tool_confirmation", None)
-    if confirmation is None:
-        logger.error("execute_deletion called without confirmation context")
-        clear_pending_deletion(tool_context)
-        return {
-            "status": "error",
-            "message": "Deletion was not executed because confirmation was unavailable.",
-        }
-
-    if not confirmation.confirmed:
-        clear_pending_deletion(tool_context)
-        logger.info("execute_deletion denied | table=%s", pending["table"])
-        return {
-            "status": "cancelled",
-            "message": "Deletion cancelled. No records were removed.",
-        }
-
-    db_path = pending["db_path"]
-    table   = pending["table"]
-    filters = pending["filters"]
-    limit   = pending.get("limit")
-
-    # The request has reached a terminal approved state. Remove it before
-    # execution so a database failure cannot leave an old deletion pending.
-    clear_pending_deletion(tool_context)
-
-    logger.info("execute_deletion | table=%s filters=%s", table, filters)
     try:
-        result = delete_records_by_filter(
-            db_path,
-            table,
-            filters,
-            limit,
-            dry_run=False,
-        )
+        result = bulk_insert_csv(csv_path, db_path)
     except Exception as e:
-        logger.exception(
-            "execute_deletion failed | table=%s filters=%s",
-            table,
-            filters,
-        )
-        return {
-            "status": "error",
-            "message": (
-                f"Deletion failed before any records were removed: {e}."
-            ),
-        }
-
-    if not isinstance(result, dict):
-        logger.error(
-            "execute_deletion received unexpected result type: %s",
-            type(result).__name__,
-        )
+        logger.exception("bulk_insert_from_csv failed | csv=%s db=%s", csv_path, db_path)
         return {
             "status": "error",
-            "message": "Deletion returned an unexpected result.",
+            "message": f"Insert failed: {e}. Chunks committed before the error remain inserted.",
         }
-
-    logger.info("execute_deletion complete | deleted=%s", result.get("deleted"))
-    return {
-        "status": "completed",
-        "deleted_count": result.get("deleted", 0),
-        "message": f"Successfully deleted {result.get('deleted', 0)} record(s) from '{table}'.",
-    }
+    finally:
+        invalidate_db(db_path)
+    return {"status": "completed", **result}
 
 
 # -----------------------------------------------------------------
@@ -229,7 +107,8 @@ def execute_deletion(tool_context: ToolContext) -> Dict[str, Any]:
 async def run_with_backoff(runner: InMemoryRunner, prompt: str = None, max_retries: int = 3, session_id: str = "default_session", user_id: str = "default_user", **kwargs):
     """
     Robust wrapper for tunner.run_async that:
-    1. Catches 429 errors and sleeps.
+    1. Catches 429 errors and sleeps with jittered exponential backoff,
+       honouring any retry-after hint from the API.
     2. Yields events like a normal runner.run_async call.
     """
     
@@ -264,9 +143,16 @@ async def run_with_backoff(runner: InMemoryRunner, prompt: str = None, max_retri
             
             if error_code == 429:
                 attempt += 1
-                wait_time = 65  # Safe buffer for 1-minute quota reset
-                
-                msg = f"[⚠️ QUOTA EXCEEDED] 429 Hit. Attempt {attempt}/{max_retries}. Sleeping {wait_time}s..."
+                retry_after = retry_after_hint(e)
+                wait_time = backoff_delay(attempt, retry_after)
+                # Hold every session's calls to this quota, not just this one,
+                # so waiting sessions do not stampede the API together.
+                penalize_all(wait_time)
+
+                msg = (
+                    f"[⚠️ QUOTA EXCEEDED] 429 Hit. Attempt {attempt}/{max_retries}. "
+                    f"Sleeping {wait_time:.1f}s (retry-after hint: {retry_after})..."
+                )
                 print(msg)
                 logger.warning(msg)
                 
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import os
+import inspect
+import logging
+from typing import Any, Dict, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Deterministic validation gate for the insert pipeline
+# ---------------------------------------------------------------------------
+# insert_supervisor_agent runs data_validation_agent, then insert_agent. The
+# verdict no longer travels as model-written text: the validator's result is
+# turned into a structured record in session state (VALIDATION_STATE_KEY) by
+# an after_tool_callback, and the validation agent ends its turn on the tool
+# response instead of asking the model to phrase it. insert_agent is skipped
+# outright unless that record passed in the same invocation, and its insert
+# tool is refused unless the CSV path and the file's size and modification
+# time still match what was validated. A passing record authorises a single
+# insert.
+
+VALIDATION_STATE_KEY = "validation_result"
+
+
+def _first_params(tool: BaseTool, count: int) -> list:
+    func = getattr(tool, "func", None)
+    if func is None:
+        return []
+    return list(inspect.signature(func).parameters)[:count]
+
+
+def _fingerprint(path: str) -> Optional[list]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _normalize(path: Any) -> Optional[str]:
+    return os.path.abspath(os.path.expanduser(path)) if isinstance(path, str) and path else None
+
+
+def _verdict(response: Any, args: Dict[str, Any], output_param: Optional[str]) -> Dict[str, Any]:
+    """Read invalid row count and report path from a validator's return value."""
+    if isinstance(response, dict) and set(response) == {"result"}:
+        response = response["result"]  # ADK's wrapping of non-dict returns
+    if isinstance(response, dict):
+        if response.get("status") == "error" or "invalid_count" not in response:
+            return {"status": "ERROR", "message": response.get("message") or "Validator returned no invalid_count."}
+        return {
+            "status": "PASS" if response["invalid_count"] == 0 else "FAIL",
+            "invalid_count": int(response["invalid_count"]),
+            "output_path": response.get("output_path"),
+            "stopped_early": bool(response.get("stopped_early")),
+        }
+    if response is None or isinstance(response, (str, bytes)) or not hasattr(response, "__len__"):
+        return {"status": "ERROR", "message": f"Unexpected validator result: {type(response).__name__}."}
+    # lab_data_manager returns the invalid rows themselves.
+    invalid = len(response)
+    return {
+        "status": "PASS" if invalid == 0 else "FAIL",
+        "invalid_count": invalid,
+        "output_path": args.get(output_param) if output_param else None,
+        "stopped_early": False,
+    }
+
+
+def record_validation(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext,
+                      tool_response: Any) -> Optional[Dict[str, Any]]:
+    """after_tool_callback for data_validation_agent.
+
+    Stores the verdict of whichever validator ran, bound to this invocation
+    and to the validated file, and skips the model call that would only
+    restate it. Returns None so the tool response is kept.
+    """
+    csv_param, output_param = (_first_params(tool, 2) + [None, None])[:2]
+    csv_path = _normalize(args.get(csv_param)) if csv_param else None
+    verdict = _verdict(tool_response, args, output_param)
+    if verdict["status"] != "ERROR" and csv_path is None:
+        verdict = {"status": "ERROR", "message": "Validated file path is unknown."}
+    tool_context.state[VALIDATION_STATE_KEY] = {
+        **verdict,
+        "tool": tool.name,
+        "csv_path": csv_path,
+        "fingerprint": _fingerprint(csv_path) if csv_path else None,
+        "invocation_id": tool_context.invocation_id,
+    }
+    tool_context.actions.skip_summarization = True
+    logger.info(
+        "Validation recorded | tool=%s status=%s invalid=%s csv=%s",
+        tool.name, verdict["status"], verdict.get("invalid_count"), csv_path,
+    )
+    return None
+
+
+def _current(context: CallbackContext) -> Optional[Dict[str, Any]]:
+    gate = context.state.get(VALIDATION_STATE_KEY)
+    if isinstance(gate, dict) and gate.get("invocation_id") == context.invocation_id:
+        return gate
+    return None
+
+
+def _denial(gate: Optional[Dict[str, Any]]) -> str:
+    if gate is None:
+        return "⛔ Request Denied: the file was not validated in this request. Nothing was inserted."
+    if gate["status"] == "FAIL":
+        report = f" See {gate['output_path']}." if gate.get("output_path") else ""
+        return f"⛔ Request Denied: Validation failed with {gate['invalid_count']} invalid row(s).{report}"
+    return f"⛔ Request Denied: Validation could not be completed: {gate.get('message')}"
+
+
+def require_validation(callback_context: CallbackContext) -> Optional[types.Content]:
+    """before_agent_callback for insert_agent.
+
+    Answers with a fixed denial, without calling the model, unless this
+    invocation's validation passed.
+    """
+    gate = _current(callback_context)
+    if gate is not None and gate["status"] == "PASS":
+        return None
+    logger.info("Insert skipped by validation gate | status=%s", gate["status"] if gate else None)
+    return types.Content(role="model", parts=[types.Part(text=_denial(gate))])
+
+
+def check_insert(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> Optional[Dict[str, Any]]:
+    """before_tool_callback for insert_agent.
+
+    Returns a blocked result in place of running the insert unless the CSV
+    passed validation in this invocation and is unchanged since. The pass is
+    consumed before the insert runs.
+    """
+    gate = _current(tool_context)
+    csv_param = (_first_params(tool, 1) or [None])[0]
+    csv_path = _normalize(args.get(csv_param)) if csv_param else None
+    if gate is None or gate["status"] != "PASS":
+        message = _denial(gate)
+    elif csv_path != gate["csv_path"]:
+        message = f"⛔ Request Denied: {args.get(csv_param)!r} is not the file that passed validation."
+    elif _fingerprint(csv_path) != gate["fingerprint"]:
+        message = "⛔ Request Denied: the file changed after it was validated. Validate it again."
+    else:
+        tool_context.state[VALIDATION_STATE_KEY] = None
+        logger.info("Validation gate passed | tool=%s csv=%s", tool.name, csv_path)
+        return None
+    logger.warning("Insert blocked by validation gate | tool=%s csv=%s | %s", tool.name, csv_path, message)
+    return {"status": "blocked", "message": message}
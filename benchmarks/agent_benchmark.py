@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+
+from agent.rate_limiter import rate_limiter_stats
+from agent.result_cache import query_cache
+from agent.root_agent import db_manager_app
+from agent.tool_executor import tool_metrics
+from workflow import run_db_workflow
+
+from .replay_llm import (
+    ReplayScript,
+    install_recording_models,
+    install_replay_models,
+    load_corpus,
+)
+
+logger = logging.getLogger(__name__)
+
+_REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CORPUS = Path(__file__).parent / "corpus" / "replay_cases.json"
+SAMPLE_DB = _REPO_ROOT / "data" / "sample_data.db"
+
+
+# ---------------------------------------------------------------------------
+# Stage timing
+# ---------------------------------------------------------------------------
+
+class TimedRunner:
+    """Runner proxy that stamps every yielded event with a perf_counter time."""
+
+    def __init__(self, runner: Runner):
+        self._runner = runner
+        self.marks: List[tuple[float, Any]] = []
+
+    async def run_async(self, **kwargs):
+        self.marks.append((time.perf_counter(), None))
+        async for event in self._runner.run_async(**kwargs):
+            self.marks.append((time.perf_counter(), event))
+            yield event
+
+
+def stage_durations(marks: List[tuple[float, Any]]) -> Dict[str, float]:
+    """Attribute the gap before each event to the stage that produced it.
+
+    Tool results are charged to "tool:<name>", everything else to
+    "agent:<author>". A None mark starts a new run segment (e.g. after the
+    confirmation pause) so the time spent waiting for approval is excluded.
+    """
+    stages: Dict[str, float] = defaultdict(float)
+    previous = None
+    for stamp, event in marks:
+        if event is None:
+            previous = stamp
+            continue
+        elapsed = (stamp - previous) * 1000
+        previous = stamp
+        responses = event.get_function_responses() if event.content else []
+        if responses:
+            for response in responses:
+                stages[f"tool:{response.name}"] += elapsed / len(responses)
+        else:
+            stages[f"agent:{event.author}"] += elapsed
+    return dict(stages)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty sample list."""
+    ordered = sorted(samples)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return round(ordered[rank - 1], 3)
+
+
+def summarise(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        stage: {
+            "n": len(values),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+        }
+        for stage, values in sorted(samples.items())
+    }
+
+
+# ---------------------------------------------------------------------------
+# Runs
+# ---------------------------------------------------------------------------
+
+async def run_replay_benchmark(corpus: List[Dict[str, Any]], repeat: int = 5) -> Dict[str, Any]:
+    """Drive every corpus case through run_db_workflow with replayed models.
+
+    Each iteration runs on a fresh copy of the sample database and a fresh
+    session, so deletions and inserts do not leak between iterations.
+    """
+    script = ReplayScript()
+    install_replay_models(db_manager_app.root_agent, script)
+    runner = TimedRunner(Runner(app=db_manager_app, session_service=InMemorySessionService()))
+    session_service = runner._runner.session_service
+
+    samples: Dict[str, List[float]] = defaultdict(list)
+    workdir = Path(tempfile.mkdtemp(prefix="agent_bench_"))
+    try:
+        for index, case in enumerate(corpus):
+            for iteration in range(repeat):
+                db_path = workdir / f"case{index}_{iteration}.db"
+                shutil.copy(SAMPLE_DB, db_path)
+                script.load(case["responses"], {"db_path": str(db_path)})
+                session_id = f"bench-{index}-{iteration}"
+                await session_service.create_session(
+                    app_name=db_manager_app.name, user_id="bench_user", session_id=session_id
+                )
+
+                runner.marks.clear()
+                started = time.perf_counter()
+                await run_db_workflow(
+                    runner,
+                    case["prompt"],
+                    session_id=session_id,
+                    user_id="bench_user",
+                    confirm=lambda _info, approve=case.get("approve", True): approve,
+                )
+                samples["total"].append((time.perf_counter() - started) * 1000)
+                for stage, elapsed in stage_durations(runner.marks).items():
+                    samples[stage].append(elapsed)
+
+                leftover = script.remaining()
+                if leftover:
+                    logger.warning("Unused scripted turns | case=%s remaining=%s", index, leftover)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "repeat": repeat,
+        "cases": len(corpus),
+        "stages": summarise(samples),
+        # Process-wide counters accumulated over all iterations.
+        "query_cache": query_cache.stats(),
+        "tools": tool_metrics(),
+        "rate_limiter": rate_limiter_stats(),
+    }
+
+
+async def record_corpus(prompts: List[str], output: Path, approve: bool = True) -> None:
+    """Run prompts against the live models and save their turns as a corpus."""
+    recording = install_recording_models(db_manager_app.root_agent)
+    session_service = InMemorySessionService()
+    runner = Runner(app=db_manager_app, session_service=session_service)
+    cases = []
+    for index, prompt in enumerate(prompts):
+        recording.clear()
+        session_id = f"record-{index}"
+        await session_service.create_session(app_name=db_manager_app.name, user_id="bench_user", session_id=session_id)
+        await run_db_workflow(runner, prompt, session_id=session_id, user_id="bench_user", confirm=lambda _info: approve)
+        cases.append({"prompt": prompt, "approve": approve, "responses": json.loads(json.dumps(recording))})
+    output.write_text(json.dumps({"cases": cases}, indent=2), encoding="utf-8")
+    print(f"Recorded {len(cases)} case(s) to {output}")
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{'stage':45} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for stage, row in report["stages"].items():
+        print(f"{stage:45} {row['n']:>5} {row['p50_ms']:>10} {row['p95_ms']:>10} {row['p99_ms']:>10}")
+
+    cache = report["query_cache"]
+    print(f"\nquery cache: {cache['hits']} hits, {cache['misses']} misses (hit rate {cache['hit_rate']}), {cache['size']} entries")
+    print(f"\n{'tool':45} {'done':>5} {'failed':>6} {'max queue':>9} {'wait ms':>10} {'run ms':>10}")
+    for name, m in sorted(report["tools"].items()):
+        if m["completed"] or m["failed"]:
+            print(f"{name:45} {m['completed']:>5} {m['failed']:>6} {m['max_queue_depth']:>9} "
+                  f"{m['total_wait_s'] * 1000:>10.1f} {m['total_run_s'] * 1000:>10.1f}")
+    for model, stats in sorted(report["rate_limiter"].items()):
+        print(f"\nrate limiter {model}: " + ", ".join(f"{key}={value}" for key, value in stats.items()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the agent graph with replayed model responses.")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS, help="Replay corpus JSON file.")
+    parser.add_argument("--repeat", type=int, default=5, help="Iterations per corpus case.")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here.")
+    parser.add_argument("--record", nargs="+", metavar="PROMPT", help="Record live responses for these prompts into --corpus instead of benchmarking.")
+    args = parser.parse_args()
+
+    if args.record:
+        if not os.getenv("GOOGLE_API_KEY"):
+            parser.error("Recording needs GOOGLE_API_KEY for the live models.")
+        asyncio.run(record_corpus(args.record, args.corpus))
+        return
+
+    report = asyncio.run(run_replay_benchmark(load_corpus(args.corpus), args.repeat))
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
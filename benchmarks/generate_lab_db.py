@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import os
+import time
+import math
+import random
+import sqlite3
+import logging
+import argparse
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+_REPO_ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_DB = _REPO_ROOT / "data" / "sample_data.db"
+
+# Per-experiment fan-out observed in the sample database (63 experiments).
+BASE_EXPERIMENTS = 63
+BATCH_SIZE = 50_000
+
+ORGANISMS = ["yeast", "human", "E.coli", "mouse", "B.subtilis", "C.elegans", "zebrafish", "drosophila"]
+PROTEIN_PREFIXES = ["Rfa", "Rad", "Mre", "Pol", "Dna", "Mcm", "Orc", "Smc", "Top", "Pcn"]
+CONDITIONS = ["untreated", "CPT", "HU", "MMS", "UV", "IR", "phleomycin", "zeocin", "aphidicolin", "4NQO"]
+CONCENTRATION_UNITS = ["nM", "uM", "mM", "M"]
+CAPTURE_TYPES = ["long", "fast", "time_lapse", "snapshot"]
+DYES = ["JF549", "JF646", "TMR", None]
+RAW_CHANNELS = ["nd", "w1BF", "w2GFP", "w3T3_RFP_CUST", "w4Cy5", "w5DAPI", "w6YFP", "w7CFP", "w8mCherry"]
+MASK_TYPES = ["cell", "nucleus", "nucleolus"]
+ANALYSIS_RESULT_TYPES = ["diffusion_coefficient", "bound_fraction", "residence_time", "track_length"]
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _zipf_weights(n: int, s: float = 1.2) -> List[float]:
+    """Skewed weights so a few organisms/proteins dominate, like real labs."""
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def _batched(rows: Iterable[Sequence], size: int = BATCH_SIZE) -> Iterator[List[Sequence]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _bulk_insert(conn: sqlite3.Connection, sql: str, rows: Iterable[Sequence]) -> int:
+    total = 0
+    for batch in _batched(rows):
+        conn.executemany(sql, batch)
+        total += len(batch)
+    return total
+
+
+def _copy_schema(conn: sqlite3.Connection, template: Path) -> None:
+    src = sqlite3.connect(template)
+    try:
+        statements = [
+            sql for (sql,) in src.execute(
+                "SELECT sql FROM sqlite_master "
+                "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+                "ORDER BY CASE type WHEN 'table' THEN 0 ELSE 1 END, rowid"
+            )
+        ]
+    finally:
+        src.close()
+    for statement in statements:
+        conn.execute(statement)
+
+
+# ---------------------------------------------------------------------------
+# Generator
+# ---------------------------------------------------------------------------
+
+class LabDataGenerator:
+    """Produces rows for every lab table at a given scale factor.
+
+    scale=1 roughly matches the sample database (63 experiments, ~5.7k raw
+    files); scale=1000 gives ~63k experiments and ~5.7M raw files.
+    """
+
+    def __init__(self, scale: float, seed: int):
+        self.rng = random.Random(seed)
+        self.scale = scale
+        self.n_experiments = max(1, int(BASE_EXPERIMENTS * scale))
+        growth = max(1.0, math.sqrt(scale))
+        self.n_proteins = int(10 * growth)
+        self.n_users = int(3 * growth)
+        self.n_strains = int(5 * growth)
+
+    # -- dimension tables -------------------------------------------------
+
+    def users(self):
+        for i in range(1, self.n_users + 1):
+            yield (i, f"user{i}", f"last{i}", None if self.rng.random() < 0.1 else f"user{i}@lab.example")
+
+    def organisms(self):
+        for i, name in enumerate(ORGANISMS, 1):
+            yield (i, name)
+
+    def proteins(self):
+        for i in range(1, self.n_proteins + 1):
+            yield (i, f"{PROTEIN_PREFIXES[i % len(PROTEIN_PREFIXES)]}{i}")
+
+    def strains(self):
+        for i in range(1, self.n_strains + 1):
+            yield (i, f"Zey{100 + i:04d}")
+
+    def conditions(self):
+        conditions = []
+        for name in CONDITIONS:
+            if name == "untreated":
+                conditions.append((name, None, None))
+                continue
+            for value in (1, 10, 100):
+                conditions.append((name, float(value), self.rng.choice(CONCENTRATION_UNITS)))
+        self.n_conditions = len(conditions)
+        for i, (name, value, unit) in enumerate(conditions, 1):
+            yield (i, name, value, unit)
+
+    def capture_settings(self):
+        settings = []
+        for capture_type in CAPTURE_TYPES:
+            for exposure in (0.01, 0.05, 0.1, 0.5):
+                dye = self.rng.choice(DYES)
+                settings.append((
+                    capture_type, exposure, exposure * self.rng.choice((1, 2, 10)), dye,
+                    50.0 if dye else None, "nM" if dye else None,
+                    self.rng.choice((488.0, 561.0, 640.0)), self.rng.choice((5.0, 10.0, 50.0)),
+                    self.rng.choice((1, 2)), 100.0, 94.0,
+                ))
+        self.n_capture_settings = len(settings)
+        for i, row in enumerate(settings, 1):
+            yield (i, *row)
+
+    # -- facts --------------------------------------------------------------
+
+    def experiments(self):
+        organism_w = _zipf_weights(len(ORGANISMS))
+        protein_w = _zipf_weights(self.n_proteins)
+        user_w = _zipf_weights(self.n_users, 0.8)
+        organism_ids = range(1, len(ORGANISMS) + 1)
+        protein_ids = range(1, self.n_proteins + 1)
+        user_ids = range(1, self.n_users + 1)
+        start = date(2015, 1, 1)
+        span_days = (date(2025, 12, 31) - start).days
+        seen: dict[tuple, int] = {}
+        previous = None
+
+        for exp_id in range(1, self.n_experiments + 1):
+            if previous is not None and self.rng.random() < 0.02:
+                # Near-duplicate: same metadata as the previous run, next replicate.
+                key = previous
+            else:
+                # Dates skew towards recent years.
+                day = int(span_days * (self.rng.random() ** 0.6))
+                key = (
+                    self.rng.choices(organism_ids, organism_w)[0],
+                    self.rng.choices(protein_ids, protein_w)[0],
+                    None if self.rng.random() < 0.05 else self.rng.randint(1, self.n_strains),
+                    self.rng.randint(1, self.n_conditions),
+                    self.rng.randint(1, self.n_capture_settings),
+                    self.rng.choices(user_ids, user_w)[0],
+                    (start + timedelta(days=day)).strftime("%Y%m%d"),
+                )
+            replicate = seen.get(key, 0) + 1
+            seen[key] = replicate
+            previous = key
+            comment = None if self.rng.random() < 0.6 else self.rng.choice(("", "good cells", "low signal", "drift"))
+            path = None if self.rng.random() < 0.2 else f"/lab/data/{key[6]}/exp{exp_id:07d}"
+            is_valid = "N" if self.rng.random() < 0.08 else "Y"
+            yield (exp_id, *key, replicate, is_valid, comment, path)
+
+    def _fields_of_view(self) -> int:
+        # Log-normal fan-out averaging ~13 fields of view per experiment,
+        # which gives the sample's ~90 raw files per experiment.
+        return max(1, int(self.rng.lognormvariate(2.4, 0.6)))
+
+    def files(self):
+        """Yield (table, row) pairs for RawFiles, TrackingFiles and Masks."""
+        for exp_id in range(1, self.n_experiments + 1):
+            prefix = f"/lab/data/exp{exp_id:07d}"
+            for fov in range(1, self._fields_of_view() + 1):
+                channels = self.rng.sample(RAW_CHANNELS, self.rng.randint(4, len(RAW_CHANNELS)))
+                for channel in channels:
+                    name = f"exp{exp_id}_{fov}_{channel}.TIF"
+                    path = None if self.rng.random() < 0.1 else f"{prefix}/raw/{name}"
+                    yield "RawFiles", (exp_id, name, str(fov), channel, path)
+                if self.rng.random() < 0.8:
+                    name = f"exp{exp_id}_{fov}_tracks.csv"
+                    yield "TrackingFiles", (
+                        exp_id, name, str(fov), "csv", f"{prefix}/tracking/{name}",
+                        round(self.rng.uniform(0.5, 3.0), 2), 0.5, 1.0, self.rng.choice((1, 2, 3)),
+                    )
+                for mask_type in self.rng.sample(MASK_TYPES, self.rng.randint(0, 2)):
+                    name = f"exp{exp_id}_{fov}_{mask_type}_mask.tif"
+                    yield "Masks", (
+                        exp_id, name, str(fov), mask_type, "tif", f"{prefix}/masks/{name}",
+                        "cellpose", "diameter=30",
+                    )
+
+    def analysis(self):
+        """Yield (table, row) pairs for analysis files, results and their links."""
+        file_id = result_id = 0
+        for exp_id in range(1, self.n_experiments + 1):
+            if self.rng.random() > 0.3:
+                continue
+            file_id += 1
+            name = f"analysis_exp{exp_id}.mat"
+            yield "AnalysisFiles", (file_id, name, f"/lab/analysis/{name}", "mat", None)
+            yield "ExperimentAnalysisFiles", (exp_id, file_id)
+            for result_type in self.rng.sample(ANALYSIS_RESULT_TYPES, 2):
+                result_id += 1
+                yield "AnalysisResults", (
+                    result_id, result_type, f"/lab/analysis/results/{result_id}.csv",
+                    round(self.rng.uniform(0.01, 5.0), 4), self.rng.randint(50, 5000),
+                    round(self.rng.uniform(0.001, 0.1), 4), "spot-on", None, f"/lab/analysis/{name}",
+                )
+                yield "AnalysisResultExperiments", (result_id, exp_id)
+
+
+_INSERTS = {
+    "User": "INSERT INTO User (id, user_name, last_name, email) VALUES (?, ?, ?, ?)",
+    "Organism": "INSERT INTO Organism (id, organism_name) VALUES (?, ?)",
+    "Protein": "INSERT INTO Protein (id, protein_name) VALUES (?, ?)",
+    "StrainOrCellLine": "INSERT INTO StrainOrCellLine (id, strain_name) VALUES (?, ?)",
+    "Condition": "INSERT INTO Condition (id, condition_name, concentration_value, concentration_unit) VALUES (?, ?, ?, ?)",
+    "CaptureSetting": (
+        "INSERT INTO CaptureSetting (id, capture_type, exposure_time, time_interval, fluorescent_dye, "
+        "dye_concentration_value, dye_concentration_unit, laser_wavelength, laser_intensity, "
+        "camera_binning, objective_magnification, pixel_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "Experiment": (
+        "INSERT INTO Experiment (id, organism_id, protein_id, strain_id, condition_id, capture_setting_id, "
+        "user_id, date, replicate, is_valid, comment, experiment_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "RawFiles": "INSERT INTO RawFiles (experiment_id, file_name, field_of_view, file_type, file_path) VALUES (?, ?, ?, ?, ?)",
+    "TrackingFiles": (
+        "INSERT INTO TrackingFiles (experiment_id, file_name, field_of_view, file_type, file_path, threshold, "
+        "linking_distance, gap_closing_distance, max_frame_gap) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "Masks": (
+        "INSERT INTO Masks (experiment_id, mask_name, field_of_view, mask_type, file_type, mask_path, "
+        "segmentation_method, segmentation_parameters) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "AnalysisFiles": "INSERT INTO AnalysisFiles (id, file_name, file_path, file_type, field_of_view) VALUES (?, ?, ?, ?, ?)",
+    "AnalysisResults": (
+        "INSERT INTO AnalysisResults (id, result_type, result_path, result_value, sample_size, standard_error, "
+        "Analysis_method, analysis_parameters, Analysis_file_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "ExperimentAnalysisFiles": "INSERT INTO ExperimentAnalysisFiles (experiment_id, analysis_file_id) VALUES (?, ?)",
+    "AnalysisResultExperiments": "INSERT INTO AnalysisResultExperiments (analysis_result_id, experiment_id) VALUES (?, ?)",
+}
+
+
+def _insert_routed(conn: sqlite3.Connection, pairs: Iterable[tuple[str, Sequence]]) -> dict[str, int]:
+    """Insert (table, row) pairs, buffering each table into executemany batches."""
+    buffers: dict[str, list] = {}
+    counts: dict[str, int] = {}
+    for table, row in pairs:
+        buffer = buffers.setdefault(table, [])
+        buffer.append(row)
+        if len(buffer) >= BATCH_SIZE:
+            conn.executemany(_INSERTS[table], buffer)
+            counts[table] = counts.get(table, 0) + len(buffer)
+            buffer.clear()
+    for table, buffer in buffers.items():
+        if buffer:
+            conn.executemany(_INSERTS[table], buffer)
+            counts[table] = counts.get(table, 0) + len(buffer)
+    return counts
+
+
+def generate_database(output: str | Path, scale: float = 10, seed: int = 0, template: Path = SAMPLE_DB) -> dict[str, int]:
+    """Build a schema-identical synthetic lab database.
+
+    Args:
+        output:   Path of the database to create (must not exist).
+        scale:    Size relative to the sample database.
+        seed:     Random seed; the same (scale, seed) gives the same data.
+        template: Database whose schema is copied.
+
+    Returns:
+        Row counts per table.
+    """
+    output = Path(output)
+    if output.exists():
+        raise FileExistsError(f"Refusing to overwrite existing database: {output}")
+
+    started = time.perf_counter()
+    gen = LabDataGenerator(scale, seed)
+    conn = sqlite3.connect(output, isolation_level=None)
+    try:
+        # Bulk-load settings: no journal or fsync until the build completes.
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")
+        _copy_schema(conn, template)
+
+        counts: dict[str, int] = {}
+        conn.execute("BEGIN")
+        for table, rows in (
+            ("User", gen.users()),
+            ("Organism", gen.organisms()),
+            ("Protein", gen.proteins()),
+            ("StrainOrCellLine", gen.strains()),
+            ("Condition", gen.conditions()),
+            ("CaptureSetting", gen.capture_settings()),
+            ("Experiment", gen.experiments()),
+        ):
+            counts[table] = _bulk_insert(conn, _INSERTS[table], rows)
+        conn.execute("COMMIT")
+
+        for pairs in (gen.files(), gen.analysis()):
+            conn.execute("BEGIN")
+            counts.update(_insert_routed(conn, pairs))
+            conn.execute("COMMIT")
+
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    logger.info("Generated %s in %.1fs | %s", output, time.perf_counter() - started, counts)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic lab database for scale testing.")
+    parser.add_argument("output", help="Path of the database file to create.")
+    parser.add_argument("--scale", type=float, default=10, help="Size relative to data/sample_data.db (e.g. 10, 100, 1000).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate_database(args.output, args.scale, args.seed)
+    for table, count in counts.items():
+        print(f"{table:28} {count:>12,}")
+    print(f"Built {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
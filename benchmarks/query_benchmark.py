@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import gc
+import json
+import time
+import shutil
+import sqlite3
+import inspect
+import logging
+import argparse
+import resource
+import statistics
+import subprocess
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List
+
+from agent import query_agent, utils
+from agent.db_pool import close_all_pools
+from agent.lab_sql import PagedQuery, explain
+from agent.result_encoding import estimate_tokens
+
+from .generate_lab_db import generate_database
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY = Path(__file__).parent / "results" / "query_history.json"
+# sqlite3 progress handler granularity (VM instructions per callback).
+VM_STEP_GRANULARITY = 1000
+
+
+# ---------------------------------------------------------------------------
+# Benchmark cases
+# ---------------------------------------------------------------------------
+# Each case calls one query_agent tool (unwrapped, so the result cache and
+# worker pool are bypassed) with arguments valid for the sample data and for
+# generated databases.
+
+QUERY_CASES: List[tuple[str, str, Dict[str, Any]]] = [
+    ("search_all", "search_experiments", {"filters": {}, "limit": 50}),
+    ("search_yeast", "search_experiments", {"filters": {"organism": "yeast"}, "limit": 50}),
+    ("search_date_range", "search_experiments_by_date_range", {"start_date": "20230101", "end_date": "20231231", "filters": {}, "limit": 50}),
+    ("search_in_period", "search_experiments_in_period", {"filters": {}, "year": 2023, "limit": 50}),
+    ("search_month", "search_experiments_in_period", {"filters": {}, "month": 3, "limit": 50}),
+    ("search_recent", "search_recent_experiments", {"days": 365, "filters": {}, "limit": 50}),
+    ("most_recent", "get_most_recent_experiment", {"filters": {"organism": "yeast"}}),
+    ("earliest", "get_earliest_experiment", {"filters": {}}),
+    ("count_by_year", "count_experiments_by_time_period", {"period": "year", "filters": {}}),
+    ("count_by_protein", "count_experiments_by_group", {"group_by": ["protein"], "filters": {}}),
+    ("count_by_organism_month", "count_experiments_by_group", {"group_by": ["organism"], "filters": {}, "period": "month"}),
+    ("count_proteins_per_organism", "count_one_entity_by_another", {"entity": "protein", "by_entities": ["organism"], "filters": {}}),
+    ("missing_files", "find_experiments_with_missing_files", {"file_types": ["tracking", "mask"], "filters": {}, "limit": 50}),
+    ("duplicates", "find_duplicate_experiment_records", {"filters": {}}),
+    ("missing_values", "find_records_with_missing_values", {"requested_columns": ["*"], "missing_columns": ["comment"], "filters": {}, "limit": 50}),
+]
+
+DELETE_CASES: List[tuple[str, str, Dict[str, Any]]] = [
+    ("delete_invalid_experiments", "Experiment", {"is_valid": False}),
+    ("delete_yeast_masks", "Masks", {"organism": "yeast"}),
+]
+
+
+# ---------------------------------------------------------------------------
+# Instrumentation
+# ---------------------------------------------------------------------------
+
+class _Counters:
+    vm_steps = 0
+    format_s = 0.0
+    result_tokens = 0
+    # Listing queries issued during the current sample, for EXPLAIN afterwards.
+    queries: List[dict] = []
+
+
+@contextmanager
+def instrumented() -> Iterator[None]:
+    """Count SQLite VM steps on every new connection; time and size _render.
+
+    Listing queries passed to _cached_page are recorded so their plans can be
+    reported once the timed samples are done.
+
+    Python's sqlite3 does not expose sqlite3_stmt_status, so VM instructions
+    (via the progress handler) stand in for rows scanned. Pools are closed
+    first so every connection used during the run is instrumented.
+    """
+    original_connect = sqlite3.connect
+    original_format = query_agent._render
+    original_page = query_agent._cached_page
+
+    def counting_connect(*args, **kwargs):
+        conn = original_connect(*args, **kwargs)
+
+        def tick():
+            _Counters.vm_steps += VM_STEP_GRANULARITY
+            return 0
+
+        conn.set_progress_handler(tick, VM_STEP_GRANULARITY)
+        return conn
+
+    def timed_format(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = original_format(*args, **kwargs)
+        finally:
+            _Counters.format_s += time.perf_counter() - started
+        _Counters.result_tokens += estimate_tokens(result[0])
+        return result
+
+    uncached_page = inspect.unwrap(original_page)
+
+    def recording_page(db_path, query, *args, **kwargs):
+        _Counters.queries.append(query)
+        return uncached_page(db_path, query, *args, **kwargs)
+
+    close_all_pools()
+    sqlite3.connect = counting_connect
+    query_agent._render = timed_format
+    # Listing tools page through a cached helper; time the uncached query.
+    query_agent._cached_page = recording_page
+    try:
+        yield
+    finally:
+        sqlite3.connect = original_connect
+        query_agent._render = original_format
+        query_agent._cached_page = original_page
+        close_all_pools()
+
+
+def _run(call: Callable[[], Any], trace_allocations: bool) -> Dict[str, float]:
+    _Counters.vm_steps = 0
+    _Counters.format_s = 0.0
+    _Counters.result_tokens = 0
+    _Counters.queries = []
+    gc.collect()
+    if trace_allocations:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        call()
+    finally:
+        wall = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_allocations else 0
+        if trace_allocations:
+            tracemalloc.stop()
+    return {
+        "wall_ms": wall * 1000,
+        "format_ms": _Counters.format_s * 1000,
+        "vm_steps": _Counters.vm_steps,
+        "result_tokens": _Counters.result_tokens,
+        "peak_alloc_mb": peak / 1e6,
+    }
+
+
+def _measure(call: Callable[[], Any]) -> Dict[str, float]:
+    """Time one call untraced, then take its peak allocation from a second, traced call.
+
+    tracemalloc slows allocation-heavy code several times over, so timings
+    and allocations come from separate passes. Only for repeatable calls.
+    """
+    sample = _run(call, trace_allocations=False)
+    sample["peak_alloc_mb"] = _run(call, trace_allocations=True)["peak_alloc_mb"]
+    return sample
+
+
+def _summarise(samples: List[Dict[str, float]]) -> Dict[str, float]:
+    return {
+        "wall_ms": round(statistics.median(s["wall_ms"] for s in samples), 3),
+        "wall_ms_min": round(min(s["wall_ms"] for s in samples), 3),
+        "format_ms": round(statistics.median(s["format_ms"] for s in samples), 3),
+        "vm_steps": int(statistics.median(s["vm_steps"] for s in samples)),
+        "result_tokens": int(statistics.median(s["result_tokens"] for s in samples)),
+        "peak_alloc_mb": round(max(s["peak_alloc_mb"] for s in samples), 3),
+    }
+
+
+def _raw_db_size(db_path: Path) -> int:
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM RawFiles").fetchone()[0]
+
+
+def _tool_context() -> SimpleNamespace:
+    """Minimal stand-in for ADK's ToolContext with an approved confirmation."""
+    return SimpleNamespace(state={}, tool_confirmation=SimpleNamespace(confirmed=True))
+
+
+# ---------------------------------------------------------------------------
+# Runs
+# ---------------------------------------------------------------------------
+
+def benchmark_database(db_path: Path, repeat: int, workdir: Path) -> List[Dict[str, Any]]:
+    """Time every query, preview and deletion case against one database."""
+    results = []
+    raw_files = _raw_db_size(db_path)
+    with instrumented():
+        for name, tool_name, kwargs in QUERY_CASES:
+            tool = inspect.unwrap(getattr(query_agent, tool_name))
+            if "tool_context" in inspect.signature(tool).parameters:
+                kwargs = {**kwargs, "tool_context": _tool_context()}
+            samples = [_measure(lambda: tool(db_path=str(db_path), **kwargs)) for _ in range(repeat)]
+            plans = [explain(str(db_path), PagedQuery.from_dict(query)) for query in _Counters.queries]
+            results.append({"case": name, "kind": "query", **_summarise(samples), "plans": plans})
+
+        preview = inspect.unwrap(utils.preview_deletion)
+        execute = inspect.unwrap(utils.execute_deletion)
+        for name, table, filters in DELETE_CASES:
+            preview_samples, execute_samples = [], []
+            for iteration in range(repeat):
+                # A deletion runs once per copy: time it on one copy and
+                # trace its allocations on another.
+                passes = {}
+                for trace in (False, True):
+                    copy = workdir / f"delete_{iteration}.db"
+                    shutil.copy(db_path, copy)
+                    context = _tool_context()
+                    try:
+                        passes[trace] = (
+                            _run(lambda: preview(context, str(copy), table, filters, None), trace),
+                            _run(lambda: execute(context), trace),
+                        )
+                    finally:
+                        close_all_pools()
+                        copy.unlink()
+                for samples, timed, traced in zip((preview_samples, execute_samples), passes[False], passes[True]):
+                    samples.append({**timed, "peak_alloc_mb": traced["peak_alloc_mb"]})
+            results.append({"case": f"{name}:preview", "kind": "preview", **_summarise(preview_samples)})
+            results.append({"case": f"{name}:execute", "kind": "execute", **_summarise(execute_samples)})
+
+    for row in results:
+        row.update({"db": str(db_path), "raw_files": raw_files})
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_history(path: Path) -> Dict[str, Any]:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {"runs": []}
+
+
+def compare_runs(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Return cases whose median wall time grew by more than `threshold`.
+
+    Cases are matched on (case, raw_files) so runs against databases of
+    the same size are compared even if the files moved.
+    """
+    previous = {(r["case"], r["raw_files"]): r for r in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        before = previous.get((row["case"], row["raw_files"]))
+        if not before or before["wall_ms"] <= 0:
+            continue
+        ratio = row["wall_ms"] / before["wall_ms"]
+        if ratio > 1 + threshold:
+            regressions.append({
+                "case": row["case"],
+                "raw_files": row["raw_files"],
+                "before_ms": before["wall_ms"],
+                "after_ms": row["wall_ms"],
+                "ratio": round(ratio, 2),
+            })
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark query tools, previews and deletions.")
+    parser.add_argument("--db", nargs="*", type=Path, default=[], help="Existing databases to benchmark.")
+    parser.add_argument("--scales", nargs="*", type=float, default=[], help="Generate databases at these scale factors.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for generated databases.")
+    parser.add_argument("--workdir", type=Path, default=Path("/tmp/lab_bench"), help="Where generated databases are kept.")
+    parser.add_argument("--repeat", type=int, default=3, help="Iterations per case.")
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help="JSON history file to append to.")
+    parser.add_argument("--compare", action="store_true", help="Compare this run with the previous one in the history.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Relative slowdown flagged as a regression.")
+    parser.add_argument("--plans", action="store_true", help="Print the query plan of each listing case.")
+    args = parser.parse_args()
+
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    databases = list(args.db)
+    for scale in args.scales:
+        path = args.workdir / f"lab_scale{scale:g}_seed{args.seed}.db"
+        if not path.exists():
+            generate_database(path, scale, args.seed)
+        databases.append(path)
+    if not databases:
+        parser.error("Give at least one --db or --scales value.")
+
+    results = []
+    for db_path in databases:
+        rows = benchmark_database(db_path, args.repeat, args.workdir)
+        for row in rows:
+            print(f"{row['raw_files']:>10,} {row['case']:40} {row['wall_ms']:>10.2f} ms  fmt {row['format_ms']:>8.2f} ms  "
+                  f"vm {row['vm_steps']:>12,}  tok {row['result_tokens']:>6,}  peak {row['peak_alloc_mb']:>8.2f} MB")
+            if args.plans:
+                for plan in row.get("plans", []):
+                    for statement, details in plan.items():
+                        print(f"{'':>12}{statement:>6}: " + " | ".join(details))
+        results.extend(rows)
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        # High-water mark of the whole benchmark process across every
+        # database and case; per-case memory is peak_alloc_mb.
+        "process_max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "results": results,
+    }
+    print(f"Process peak RSS over all cases: {run['process_max_rss_mb']} MB")
+    history = load_history(args.history)
+    baseline = history["runs"][-1] if history["runs"] else None
+    history["runs"].append(run)
+    args.history.parent.mkdir(parents=True, exist_ok=True)
+    args.history.write_text(json.dumps(history, indent=2), encoding="utf-8")
+
+    if args.compare and baseline:
+        regressions = compare_runs(baseline, run, args.threshold)
+        for reg in regressions:
+            print(f"REGRESSION {reg['case']} @ {reg['raw_files']:,} raw files: "
+                  f"{reg['before_ms']} ms -> {reg['after_ms']} ms (x{reg['ratio']})")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {baseline['git_revision']}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import json
+import asyncio
+import logging
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from pydantic import ConfigDict
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from agent import config
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Scripted responses
+# ---------------------------------------------------------------------------
+# A script maps agent names to an ordered list of model turns. Each turn is
+# either {"text": "..."} or {"function_call": {"name": ..., "args": {...}}},
+# with an optional "latency_ms" to simulate model time. String values may use
+# "{db_path}" which is substituted when the script is loaded.
+
+def _substitute(value: Any, variables: Dict[str, str]) -> Any:
+    if isinstance(value, str):
+        for name, replacement in variables.items():
+            value = value.replace("{" + name + "}", replacement)
+        return value
+    if isinstance(value, dict):
+        return {k: _substitute(v, variables) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, variables) for v in value]
+    return value
+
+
+def turn_to_response(turn: Dict[str, Any]) -> LlmResponse:
+    """Build an LlmResponse from one scripted turn."""
+    if "function_call" in turn:
+        call = turn["function_call"]
+        part = types.Part(function_call=types.FunctionCall(name=call["name"], args=call.get("args", {})))
+    else:
+        part = types.Part(text=turn.get("text", ""))
+    return LlmResponse(content=types.Content(role="model", parts=[part]))
+
+
+def response_to_turn(response: LlmResponse) -> List[Dict[str, Any]]:
+    """Serialise the parts of a real model response into scripted turns."""
+    turns = []
+    if response.content is None:
+        return turns
+    for part in response.content.parts or []:
+        if part.function_call:
+            turns.append({"function_call": {"name": part.function_call.name, "args": dict(part.function_call.args or {})}})
+        elif part.text and not part.thought:
+            turns.append({"text": part.text})
+    return turns
+
+
+class ReplayScript:
+    """Per-agent queues of scripted turns shared by every ReplayLlm."""
+
+    def __init__(self):
+        self._turns: Dict[str, deque] = defaultdict(deque)
+
+    def load(self, responses: Dict[str, List[Dict[str, Any]]], variables: Optional[Dict[str, str]] = None) -> None:
+        self._turns.clear()
+        for agent_name, turns in responses.items():
+            self._turns[agent_name].extend(_substitute(turns, variables or {}))
+
+    def next_turn(self, agent_name: str) -> Dict[str, Any]:
+        queue = self._turns.get(agent_name)
+        if not queue:
+            logger.warning("Replay script exhausted for agent=%s; returning empty text", agent_name)
+            return {"text": ""}
+        return queue.popleft()
+
+    def remaining(self) -> Dict[str, int]:
+        return {name: len(queue) for name, queue in self._turns.items() if queue}
+
+
+# ---------------------------------------------------------------------------
+# Fake model backends
+# ---------------------------------------------------------------------------
+
+class ReplayLlm(BaseLlm):
+    """Model backend that answers from a ReplayScript instead of Gemini."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    agent_name: str
+    script: ReplayScript
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        turn = self.script.next_turn(self.agent_name)
+        if turn.get("latency_ms"):
+            await asyncio.sleep(turn["latency_ms"] / 1000)
+        yield turn_to_response(turn)
+
+
+class RecordingLlm(BaseLlm):
+    """Wraps a real model and records its turns per agent for later replay."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    agent_name: str
+    inner: BaseLlm
+    recording: Dict[str, List[Dict[str, Any]]]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        async for response in self.inner.generate_content_async(llm_request, stream=stream):
+            if not response.partial:
+                self.recording.setdefault(self.agent_name, []).extend(response_to_turn(response))
+            yield response
+
+
+def _llm_agents(agent: BaseAgent):
+    if isinstance(agent, LlmAgent):
+        yield agent
+    for sub_agent in agent.sub_agents:
+        yield from _llm_agents(sub_agent)
+
+
+def install_replay_models(root: BaseAgent, script: ReplayScript) -> None:
+    """Swap every LlmAgent's model in the tree for a ReplayLlm.
+
+    Replay models get an effectively unlimited quota so the shared rate
+    limiter does not distort the measurements.
+    """
+    for agent in _llm_agents(root):
+        model_name = f"replay/{agent.name}"
+        config.MODEL_QUOTAS[model_name] = (10**9, 10**12)
+        agent.model = ReplayLlm(model=model_name, agent_name=agent.name, script=script)
+
+
+def install_recording_models(root: BaseAgent) -> Dict[str, List[Dict[str, Any]]]:
+    """Wrap every LlmAgent's model so its turns are recorded.
+
+    Returns:
+        The shared recording dict, keyed by agent name.
+    """
+    recording: Dict[str, List[Dict[str, Any]]] = {}
+    for agent in _llm_agents(root):
+        agent.model = RecordingLlm(
+            model=agent.canonical_model.model,
+            agent_name=agent.name,
+            inner=agent.canonical_model,
+            recording=recording,
+        )
+    return recording
+
+
+def load_corpus(path: str | Path) -> List[Dict[str, Any]]:
+    """Read a corpus file: a list of {"prompt", "approve", "responses"} cases."""
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)["cases"]
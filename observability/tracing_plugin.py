@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import json
+import time
+import secrets
+import sqlite3
+import logging
+import threading
+import contextvars
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events.event import Event
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from agent.db_pool import add_connection_hook
+
+logger = logging.getLogger("db_management_agent.audit")
+
+DEFAULT_TRACE_DIR = Path("traces")
+# Finished invocations remembered so a resumed run joins the same trace.
+MAX_TRACKED_INVOCATIONS = 1000
+
+
+# ---------------------------------------------------------------------------
+# Spans
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    parent_id: Optional[str]
+    span_id: str = field(default_factory=lambda: secrets.token_hex(8))
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def end(self, **attributes: Any) -> None:
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+        self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON span representation (one per line in spans.jsonl)."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+# The tool span active in the current context. offload() copies the context
+# into worker threads, so SQL issued by a tool body is attributed correctly.
+_current_tool_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_tool_span", default=None)
+_sql_lock = threading.Lock()
+# Statements per open tool span. An entry exists only while its tool runs, so
+# SQL from a worker that outlives its tool is dropped instead of kept forever.
+_sql_statements: Dict[str, List[tuple[int, str]]] = {}
+
+
+def _record_sql(statement: str) -> None:
+    span = _current_tool_span.get()
+    if span is not None:
+        with _sql_lock:
+            statements = _sql_statements.get(span.span_id)
+            if statements is not None:
+                statements.append((time.time_ns(), statement))
+
+
+def _trace_connection(conn: sqlite3.Connection) -> None:
+    conn.set_trace_callback(_record_sql)
+
+
+def install_sqlite_tracing() -> None:
+    """Trace SQL on the agent's pooled connections (agent.db_pool) opened from now on.
+
+    sqlite3.connect itself is left alone, so connections opened elsewhere,
+    including inside lab_data_manager, are not traced. Statements are
+    attributed to the tool span that is active in the calling context.
+    """
+    add_connection_hook(_trace_connection)
+
+
+# ---------------------------------------------------------------------------
+# Plugin
+# ---------------------------------------------------------------------------
+
+class TracingPlugin(BasePlugin):
+    """Opens spans for invocations, agents, model calls, tools and SQL.
+
+    Finished traces are appended to `spans.jsonl` as OTLP/JSON spans and to
+    `flame.folded` as folded stacks (self time in microseconds), which
+    flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, name: str = "tracing_plugin", output_dir: Path | str = DEFAULT_TRACE_DIR, trace_sql: bool = True):
+        super().__init__(name=name)
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._trace_ids: Dict[str, str] = {}
+        self._last_run_end: Dict[str, int] = {}
+        self._runs: Dict[str, Span] = {}
+        self._agent_stacks: Dict[str, List[Span]] = defaultdict(list)
+        self._models: Dict[tuple[str, str], Span] = {}
+        self._tools: Dict[str, Span] = {}
+        self._finished: Dict[str, List[Span]] = defaultdict(list)
+        self._tool_tokens: Dict[str, contextvars.Token] = {}
+        if trace_sql:
+            install_sqlite_tracing()
+
+    # -- helpers ------------------------------------------------------------
+
+    def _start(self, invocation_id: str, name: str, parent: Optional[Span], **attributes: Any) -> Span:
+        span = Span(name=name, trace_id=self._trace_ids[invocation_id], parent_id=parent.span_id if parent else None)
+        span.attributes.update(attributes)
+        return span
+
+    def _finish(self, invocation_id: str, span: Span, **attributes: Any) -> None:
+        span.end(**attributes)
+        self._finished[invocation_id].append(span)
+
+    def _agent_span(self, invocation_id: str, agent_name: str) -> Optional[Span]:
+        for span in reversed(self._agent_stacks[invocation_id]):
+            if span.attributes.get("agent.name") == agent_name:
+                return span
+        return self._runs.get(invocation_id)
+
+    # -- invocation -----------------------------------------------------------
+
+    async def before_run_callback(self, *, invocation_context: InvocationContext) -> None:
+        invocation_id = invocation_context.invocation_id
+        resumed = invocation_id in self._trace_ids
+        self._trace_ids.setdefault(invocation_id, secrets.token_hex(16))
+        span = self._start(
+            invocation_id,
+            "invocation",
+            None,
+            **{
+                "session.id": invocation_context.session.id,
+                "user.id": invocation_context.user_id,
+                "invocation.id": invocation_id,
+                "invocation.resumed": resumed,
+            },
+        )
+        if resumed and invocation_id in self._last_run_end:
+            # Time spent paused between runs, e.g. waiting for confirmation.
+            span.attributes["invocation.pause_ms"] = round((span.start_ns - self._last_run_end[invocation_id]) / 1e6, 3)
+        self._runs[invocation_id] = span
+        return None
+
+    async def after_run_callback(self, *, invocation_context: InvocationContext) -> None:
+        invocation_id = invocation_context.invocation_id
+        span = self._runs.pop(invocation_id, None)
+        if span is None:
+            return None
+        self._finish(invocation_id, span)
+        self._last_run_end[invocation_id] = span.end_ns
+        self._export(invocation_id)
+        while len(self._trace_ids) > MAX_TRACKED_INVOCATIONS:
+            oldest = next(iter(self._trace_ids))
+            self._trace_ids.pop(oldest)
+            self._last_run_end.pop(oldest, None)
+        return None
+
+    # -- agents -------------------------------------------------------------
+
+    async def before_agent_callback(self, *, agent: BaseAgent, callback_context: CallbackContext) -> None:
+        invocation_id = callback_context.invocation_id
+        stack = self._agent_stacks[invocation_id]
+        parent = stack[-1] if stack else self._runs.get(invocation_id)
+        stack.append(self._start(invocation_id, f"agent:{agent.name}", parent, **{"agent.name": agent.name}))
+        return None
+
+    async def after_agent_callback(self, *, agent: BaseAgent, callback_context: CallbackContext) -> None:
+        invocation_id = callback_context.invocation_id
+        stack = self._agent_stacks[invocation_id]
+        self._end_skipped_model(invocation_id, agent.name)
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index].attributes.get("agent.name") == agent.name:
+                self._finish(invocation_id, stack.pop(index))
+                break
+        return None
+
+    # -- model calls ----------------------------------------------------------
+
+    def _end_skipped_model(self, invocation_id: str, agent_name: str) -> None:
+        # after_model_callback does not run when a before_model_callback (the
+        # fast-path router) answers instead of the model. The span is ended at
+        # the next callback for that agent so it covers only the skipped call.
+        span = self._models.pop((invocation_id, agent_name), None)
+        if span is not None:
+            self._finish(invocation_id, span, **{"llm.fast_path": True})
+
+    async def before_model_callback(self, *, callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        invocation_id = callback_context.invocation_id
+        parent = self._agent_span(invocation_id, callback_context.agent_name)
+        self._models[(invocation_id, callback_context.agent_name)] = self._start(
+            invocation_id, f"model:{llm_request.model}", parent, **{"llm.model": llm_request.model}
+        )
+        return None
+
+    async def after_model_callback(self, *, callback_context: CallbackContext, llm_response: LlmResponse) -> None:
+        invocation_id = callback_context.invocation_id
+        span = self._models.pop((invocation_id, callback_context.agent_name), None)
+        if span is None:
+            return None
+        usage = llm_response.usage_metadata
+        self._finish(
+            invocation_id,
+            span,
+            **{
+                "llm.prompt_tokens": getattr(usage, "prompt_token_count", None),
+                "llm.completion_tokens": getattr(usage, "candidates_token_count", None),
+                "llm.total_tokens": getattr(usage, "total_token_count", None),
+                # Set by the rate limiter's before_model_callback.
+                "llm.rate_limit_wait_s": callback_context.state.get("temp:rate_limit_wait_s"),
+            },
+        )
+        return None
+
+    async def on_event_callback(self, *, invocation_context: InvocationContext, event: Event) -> None:
+        # A real model call has already ended its span in after_model_callback
+        # before its event is emitted.
+        self._end_skipped_model(invocation_context.invocation_id, event.author)
+        return None
+
+    async def on_model_error_callback(self, *, callback_context: CallbackContext, llm_request: LlmRequest, error: Exception) -> None:
+        invocation_id = callback_context.invocation_id
+        span = self._models.pop((invocation_id, callback_context.agent_name), None)
+        if span is not None:
+            span.error = repr(error)
+            self._finish(invocation_id, span)
+        return None
+
+    # -- tools -------------------------------------------------------------
+
+    async def before_tool_callback(self, *, tool: BaseTool, tool_args: Dict[str, Any], tool_context: ToolContext) -> None:
+        invocation_id = tool_context.invocation_id
+        self._end_skipped_model(invocation_id, tool_context.agent_name)
+        parent = self._agent_span(invocation_id, tool_context.agent_name)
+        span = self._start(
+            invocation_id,
+            f"tool:{tool.name}",
+            parent,
+            **{"tool.name": tool.name, "tool.args": json.dumps(tool_args, default=str)[:500]},
+        )
+        self._tools[tool_context.function_call_id] = span
+        with _sql_lock:
+            _sql_statements[span.span_id] = []
+        self._tool_tokens[tool_context.function_call_id] = _current_tool_span.set(span)
+        return None
+
+    def _end_tool(self, tool_context: ToolContext, error: Optional[BaseException] = None) -> None:
+        invocation_id = tool_context.invocation_id
+        span = self._tools.pop(tool_context.function_call_id, None)
+        token = self._tool_tokens.pop(tool_context.function_call_id, None)
+        if token is not None:
+            try:
+                _current_tool_span.reset(token)
+            except ValueError:
+                _current_tool_span.set(None)
+        if span is None:
+            return
+        try:
+            if error is not None:
+                span.error = repr(error)
+            self._finish(invocation_id, span)
+        finally:
+            with _sql_lock:
+                statements = _sql_statements.pop(span.span_id, [])
+        self._add_sql_spans(invocation_id, span, statements)
+
+    def _add_sql_spans(self, invocation_id: str, tool_span: Span, statements: List[tuple[int, str]]) -> None:
+        # The trace callback only reports statement start times; each SQL
+        # span runs until the next statement starts or the tool finishes.
+        if not statements:
+            return
+        tool_span.attributes["sql.statements"] = len(statements)
+        for index, (start_ns, statement) in enumerate(statements):
+            end_ns = statements[index + 1][0] if index + 1 < len(statements) else tool_span.end_ns
+            verb = statement.strip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+            span = Span(name=f"sql:{verb}", trace_id=tool_span.trace_id, parent_id=tool_span.span_id, start_ns=start_ns, end_ns=end_ns)
+            span.attributes.update({"db.statement": statement[:1000], "sql.duration_estimated": True})
+            self._finished[invocation_id].append(span)
+
+    async def after_tool_callback(self, *, tool: BaseTool, tool_args: Dict[str, Any], tool_context: ToolContext, result: Dict) -> None:
+        self._end_tool(tool_context)
+        return None
+
+    async def on_tool_error_callback(self, *, tool: BaseTool, tool_args: Dict[str, Any], tool_context: ToolContext, error: Exception) -> None:
+        self._end_tool(tool_context, error)
+        return None
+
+    # -- export -------------------------------------------------------------
+
+    def _export(self, invocation_id: str) -> None:
+        # Tool spans never closed by an after/error callback end with the run.
+        trace_id = self._trace_ids.get(invocation_id)
+        for call_id, span in list(self._tools.items()):
+            if span.trace_id == trace_id:
+                self._tools.pop(call_id)
+                self._tool_tokens.pop(call_id, None)
+                span.error = span.error or "tool span not closed before the run ended"
+                self._finish(invocation_id, span)
+                with _sql_lock:
+                    _sql_statements.pop(span.span_id, None)
+        spans = self._finished.pop(invocation_id, [])
+        self._agent_stacks.pop(invocation_id, None)
+        if not spans:
+            return
+        with open(self.output_dir / "spans.jsonl", "a", encoding="utf-8") as fh:
+            for span in spans:
+                fh.write(json.dumps(span.to_otlp()) + "\n")
+        with open(self.output_dir / "flame.folded", "a", encoding="utf-8") as fh:
+            for stack, self_us in folded_stacks(spans).items():
+                fh.write(f"{stack} {self_us}\n")
+
+        summary = ", ".join(f"{s.name}={s.duration_ms:.1f}ms" for s in spans if s.parent_id is None or s.name.startswith(("tool:", "model:")))
+        logger.info("TRACE | invocation=%s | %s", invocation_id, summary)
+
+
+def folded_stacks(spans: List[Span]) -> Dict[str, int]:
+    """Collapse spans into 'root;child;leaf self_time_us' folded stacks."""
+    by_id = {span.span_id: span for span in spans}
+    child_time: Dict[str, int] = defaultdict(int)
+    for span in spans:
+        if span.parent_id in by_id and span.end_ns:
+            child_time[span.parent_id] += span.end_ns - span.start_ns
+
+    folded: Dict[str, int] = defaultdict(int)
+    for span in spans:
+        if not span.end_ns:
+            continue
+        path, node = [], span
+        while node is not None:
+            path.append(node.name)
+            node = by_id.get(node.parent_id) if node.parent_id else None
+        self_us = max(0, (span.end_ns - span.start_ns - child_time[span.span_id]) // 1000)
+        if self_us:
+            folded[";".join(reversed(path))] += self_us
+    return dict(folded)
@@ -1 +1,87 @@
 """Shared pytest fixtures for the database manager test suite."""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+SAMPLE_DB = Path(__file__).resolve().parents[1] / "data" / "sample_data.db"
+
+MARKERS = {
+    "unit": "Fast tests for isolated Python logic.",
+    "integration": "Tests covering multiple application components.",
+    "agent_eval": "Tests that call or evaluate LLM agents.",
+    "ui": "Tests for the user interface.",
+}
+
+
+def pytest_configure(config):
+    # pytest.ini is only read when it is the chosen config file; running from
+    # another directory or with -c would otherwise warn about every marker.
+    registered = {line.split(":", 1)[0].strip() for line in config.getini("markers")}
+    for name, description in MARKERS.items():
+        if name not in registered:
+            config.addinivalue_line("markers", f"{name}: {description}")
+
+
+def _sample_schema() -> list:
+    """CREATE statements of the sample database, read without modifying it."""
+    conn = sqlite3.connect(f"{SAMPLE_DB.as_uri()}?mode=ro", uri=True)
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type IN ('table', 'index') "
+            "AND sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY type DESC, rowid"
+        )]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def lab_db(tmp_path) -> str:
+    """A small lab database with the sample schema, in a temporary directory.
+
+    Experiments 1-3 are invalid ('N') yeast experiments, 4 is a valid yeast
+    experiment and 5-6 are valid E. coli experiments. Every experiment has
+    three raw files, two tracking files and one mask. Analysis file 1 is
+    linked to experiments 1 and 5, analysis result 1 to experiment 2.
+    """
+    path = tmp_path / "lab.db"
+    conn = sqlite3.connect(path)
+    try:
+        for statement in _sample_schema():
+            conn.execute(statement)
+        conn.executemany("INSERT INTO Organism (id, organism_name) VALUES (?, ?)", [(1, "yeast"), (2, "ecoli")])
+        conn.execute("INSERT INTO Protein (id, protein_name) VALUES (1, 'Rfa1')")
+        conn.execute("INSERT INTO User (id, user_name, last_name, email) VALUES (1, 'ada', 'lovelace', 'ada@lab.org')")
+        experiments = [
+            (1, 1, "20230801", "N"), (2, 1, "20230802", "N"), (3, 1, "20230803", "N"),
+            (4, 1, "20230804", "Y"), (5, 2, "20230805", "Y"), (6, 2, "20230806", "Y"),
+        ]
+        conn.executemany(
+            "INSERT INTO Experiment (id, organism_id, protein_id, user_id, date, replicate, is_valid) "
+            "VALUES (?, ?, 1, 1, ?, 1, ?)",
+            experiments,
+        )
+        for experiment_id, *_ in experiments:
+            conn.executemany(
+                "INSERT INTO RawFiles (experiment_id, file_name, file_type) VALUES (?, ?, 'tif')",
+                [(experiment_id, f"raw_{experiment_id}_{n}.tif") for n in range(3)],
+            )
+            conn.executemany(
+                "INSERT INTO TrackingFiles (experiment_id, file_name, file_type) VALUES (?, ?, 'csv')",
+                [(experiment_id, f"tracks_{experiment_id}_{n}.csv") for n in range(2)],
+            )
+            conn.execute(
+                "INSERT INTO Masks (experiment_id, mask_name, mask_type) VALUES (?, ?, 'cell')",
+                (experiment_id, f"mask_{experiment_id}.tif"),
+            )
+        conn.execute("INSERT INTO AnalysisFiles (id, file_name, file_type) VALUES (1, 'msd.csv', 'csv')")
+        conn.executemany(
+            "INSERT INTO ExperimentAnalysisFiles (experiment_id, analysis_file_id) VALUES (?, 1)", [(1,), (5,)]
+        )
+        conn.execute("INSERT INTO AnalysisResults (id, result_type, result_value) VALUES (1, 'diffusion', 0.5)")
+        conn.execute("INSERT INTO AnalysisResultExperiments (analysis_result_id, experiment_id) VALUES (1, 2)")
+        conn.commit()
+    finally:
+        conn.close()
+    return str(path)
@@ -0,0 +1,62 @@
+"""Integration tests for bulk CSV ingestion."""
+
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from agent.bulk_ingest import bulk_insert_csv
+
+pytestmark = pytest.mark.integration
+
+SCENARIOS = Path(__file__).resolve().parents[1] / "scenarios" / "insertion"
+SAMPLE_DB = Path(__file__).resolve().parents[2] / "data" / "sample_data.db"
+VALID_CSV = str(SCENARIOS / "valid.csv")
+# valid.csv has 91 file rows, 8 of them repeated masks, and 26 rows holding
+# only a segmentation_method.
+FILE_ROWS = 91
+DISTINCT_FILES = 83
+INVALID_ROWS = 26
+
+
+def _counts(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("Experiment", "RawFiles", "TrackingFiles", "Masks")}
+
+
+def test_second_ingest_of_the_same_csv_inserts_nothing(lab_db):
+    first = bulk_insert_csv(VALID_CSV, lab_db)
+    counts = _counts(lab_db)
+
+    second = bulk_insert_csv(VALID_CSV, lab_db)
+
+    assert first["rows_inserted"] == DISTINCT_FILES
+    assert first["duplicates"] == FILE_ROWS - DISTINCT_FILES
+    assert second["rows_inserted"] == 0
+    assert second["duplicates"] == FILE_ROWS
+    assert second["created"] == {}
+    assert _counts(lab_db) == counts
+
+
+def test_rows_already_in_the_sample_database_are_duplicates(tmp_path):
+    db_path = tmp_path / "sample.db"
+    shutil.copy(SAMPLE_DB, db_path)
+    before = _counts(db_path)
+
+    result = bulk_insert_csv(VALID_CSV, str(db_path))
+
+    # Stored rows hold '' in empty cells, e.g. Masks.segmentation_parameters.
+    assert result["rows_inserted"] == 0
+    assert result["duplicates"] == FILE_ROWS
+    assert _counts(db_path) == before
+
+
+def test_rows_without_a_file_category_are_reported_as_errors(lab_db):
+    result = bulk_insert_csv(VALID_CSV, lab_db)
+
+    assert result["rows_invalid"] == INVALID_ROWS
+    assert len(result["errors"]) == INVALID_ROWS
+    assert result["errors"][0]["line"] == 456
+    assert "file_category" in result["errors"][0]["error"]
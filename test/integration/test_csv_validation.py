@@ -0,0 +1,85 @@
+"""Integration tests for the chunked, parallel metadata CSV validator."""
+
+import csv
+from pathlib import Path
+
+import pytest
+
+from agent import csv_validation
+from agent.csv_validation import _byte_ranges, _read_header, _rows, validate_metadata
+
+pytestmark = pytest.mark.integration
+
+TEST_DIR = Path(__file__).resolve().parents[1]
+SCENARIO_CSVS = sorted((TEST_DIR / "scenarios" / "insertion").glob("*.csv")) + [
+    TEST_DIR / "metadata_complete_insert.csv",
+    TEST_DIR / "metadata_complete_search.csv",
+]
+
+
+def _ranges(path, parts):
+    header, body, size = _read_header(str(path))
+    return body, size, _byte_ranges(str(path), body, size, parts)
+
+
+def test_byte_ranges_cover_the_body_on_line_boundaries():
+    path = TEST_DIR / "scenarios" / "insertion" / "valid.csv"
+    body, size, ranges = _ranges(path, 7)
+    data = path.read_bytes()
+
+    assert len(ranges) == 7
+    assert ranges[0][0] == body and ranges[-1][1] == size
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert all(data[start - 1:start] == b"\n" for start, _ in ranges)
+
+
+def test_quoted_line_breaks_never_split_a_range(tmp_path):
+    path = tmp_path / "quoted.csv"
+    rows = [f'f{n}.tif,"line one\nline two",{n}\n' for n in range(40)]
+    path.write_text("file_name,comment,replicate\n" + "".join(rows), encoding="utf-8")
+
+    _, _, ranges = _ranges(path, 12)
+
+    data = path.read_bytes()
+    for start, end in ranges:
+        chunk = data[start:end].decode("utf-8")
+        assert len(list(csv.reader(chunk.splitlines(keepends=True)))) == chunk.count("\n") // 2
+
+
+def _row_local_validator(csv_path, output_path):
+    """Stands in for validate_csv: rows without a file_name are invalid."""
+    with open(csv_path, newline="", encoding="utf-8-sig") as handle:
+        reader = csv.DictReader(handle)
+        invalid = [row for row in reader if not row["file_name"]]
+    if invalid:
+        with open(output_path, "w", newline="", encoding="utf-8") as handle:
+            writer = csv.DictWriter(handle, fieldnames=reader.fieldnames)
+            writer.writeheader()
+            writer.writerows(invalid)
+    return invalid
+
+
+def test_chunk_reports_are_merged_in_file_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(csv_validation, "data_validation", type("Validation", (), {
+        "validate_csv": staticmethod(_row_local_validator),
+    }))
+    source = TEST_DIR / "scenarios" / "insertion" / "valid.csv"
+    serial = _row_local_validator(str(source), str(tmp_path / "serial.csv"))
+
+    result = validate_metadata(str(source), str(tmp_path / "chunked.csv"), workers=1, chunk_bytes=4096)
+
+    assert result["chunks"] > 5
+    assert result["invalid_count"] == len(serial)
+    assert result["invalid_rows"] == serial[:csv_validation.MAX_REPORTED_INVALID]
+    assert (tmp_path / "chunked.csv").read_bytes() == (tmp_path / "serial.csv").read_bytes()
+
+
+@pytest.mark.parametrize("source", SCENARIO_CSVS, ids=lambda path: path.name)
+def test_parallel_report_matches_the_serial_path(tmp_path, source):
+    data_validation = pytest.importorskip("lab_data_manager.data_validation")
+    serial = _rows(data_validation.validate_csv(str(source), str(tmp_path / "serial.csv")))
+
+    result = validate_metadata(str(source), str(tmp_path / "parallel.csv"), workers=2, chunk_bytes=4096)
+
+    assert result["invalid_count"] == len(serial)
+    assert result["invalid_rows"] == serial[:csv_validation.MAX_REPORTED_INVALID]
@@ -1 +1,130 @@
 """Integration tests for deletion preview and confirmation workflows."""
+
+import sqlite3
+
+import pytest
+
+from agent.delete_planner import (
+    STAGING_TABLE,
+    execute_delete,
+    plan_deletion,
+    stage_deletion,
+)
+
+pytestmark = pytest.mark.integration
+
+INVALID = {"is_valid": "N"}
+# Rows removed with experiments 1-3 (see the lab_db fixture).
+INVALID_COUNTS = {
+    "Experiment": 3,
+    "RawFiles": 9,
+    "TrackingFiles": 6,
+    "Masks": 3,
+    "ExperimentAnalysisFiles": 1,
+    "AnalysisResultExperiments": 1,
+}
+
+
+def _count(db_path, table, where="1", params=()):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM "{table}" WHERE {where}', params).fetchone()[0]
+
+
+def _execute(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_plan_counts_every_table_and_orders_children_first(lab_db):
+    plan = plan_deletion(lab_db, "Experiment", INVALID)
+
+    assert {name: n for name, n in plan.counts.items() if n} == INVALID_COUNTS
+    assert plan.target_count == 3
+    assert plan.order[-1] == "Experiment"
+    assert set(plan.order) == set(INVALID_COUNTS)
+    # A dry run writes nothing, not even the staging table.
+    assert _count(lab_db, "sqlite_master", "name = ?", (STAGING_TABLE,)) == 0
+
+
+def test_plan_rejects_empty_filters(lab_db):
+    with pytest.raises(ValueError):
+        plan_deletion(lab_db, "Experiment", {})
+
+
+def test_execute_deletes_staged_ids_in_batches(lab_db):
+    plan = stage_deletion(lab_db, "Experiment", INVALID)
+    progress = []
+
+    result = execute_delete(
+        lab_db, plan.token, plan.checksum, batch_rows=2,
+        progress=lambda table, done, total: progress.append((table, done, total)),
+    )
+
+    assert result.deleted == INVALID_COUNTS
+    # ceil(n / 2) batches per table: 2 + 5 + 3 + 2 + 1 + 1.
+    assert result.batches == 14
+    assert len(progress) == 14
+    assert progress[-1] == ("Experiment", 3, 3)
+    assert [table for table, _, _ in progress].index("Experiment") == 12
+    assert _count(lab_db, "Experiment", "is_valid = 'N'") == 0
+    assert _count(lab_db, "Experiment") == 3
+    assert _count(lab_db, "RawFiles") == 9
+    assert _count(lab_db, "AnalysisFiles") == 1
+    assert _count(lab_db, STAGING_TABLE) == 0
+
+
+def test_foreign_keys_are_intact_after_execution(lab_db):
+    plan = stage_deletion(lab_db, "Experiment", INVALID)
+    execute_delete(lab_db, plan.token, plan.checksum, batch_rows=1)
+
+    with sqlite3.connect(lab_db) as conn:
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+
+def test_execute_refuses_when_a_child_row_was_added_after_preview(lab_db):
+    plan = stage_deletion(lab_db, "Experiment", INVALID)
+    _execute(lab_db, "INSERT INTO RawFiles (experiment_id, file_name) VALUES (1, 'late.tif')")
+
+    with pytest.raises(ValueError, match="added since the preview"):
+        execute_delete(lab_db, plan.token, plan.checksum)
+
+    assert _count(lab_db, "Experiment", "is_valid = 'N'") == 3
+    assert _count(lab_db, "RawFiles", "experiment_id = 1") == 4
+    # The refused preview is spent; it cannot be retried.
+    with pytest.raises(ValueError, match="not found"):
+        execute_delete(lab_db, plan.token, plan.checksum)
+
+
+def test_execute_refuses_a_wrong_checksum(lab_db):
+    plan = stage_deletion(lab_db, "Experiment", INVALID)
+
+    with pytest.raises(ValueError, match="checksum"):
+        execute_delete(lab_db, plan.token, "0" * 64)
+
+    assert _count(lab_db, "Experiment", "is_valid = 'N'") == 3
+
+
+def test_row_matching_the_filters_after_preview_survives(lab_db):
+    plan = stage_deletion(lab_db, "Experiment", INVALID)
+    _execute(
+        lab_db,
+        "INSERT INTO Experiment (id, organism_id, protein_id, user_id, date, replicate, is_valid) "
+        "VALUES (7, 1, 1, 1, '20230807', 1, 'N')",
+    )
+
+    result = execute_delete(lab_db, plan.token, plan.checksum)
+
+    assert result.deleted["Experiment"] == 3
+    assert _count(lab_db, "Experiment", "id = 7") == 1
+
+
+def test_no_matches_stages_nothing(lab_db):
+    plan = stage_deletion(lab_db, "Experiment", {"organism": "mouse"})
+
+    assert plan.token is None
+    assert plan.target_count == 0
+    assert _count(lab_db, STAGING_TABLE) == 0
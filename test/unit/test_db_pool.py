@@ -0,0 +1,87 @@
+"""Unit tests for the pooled SQLite connections and schema migrations."""
+
+import sqlite3
+
+import pytest
+
+from agent.db_pool import SQLitePool
+from agent.migrations import Migration, applied_versions, apply_migrations
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = tmp_path / "pool.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE parent (id INTEGER PRIMARY KEY);
+        CREATE TABLE child (
+            id INTEGER PRIMARY KEY,
+            parent_id INTEGER REFERENCES parent (id) DEFERRABLE INITIALLY DEFERRED
+        );
+        INSERT INTO parent (id) VALUES (1);
+        """
+    )
+    conn.close()
+    pool = SQLitePool(str(path), max_readers=2)
+    yield pool
+    pool.close()
+
+
+def _children(pool):
+    with pool.read() as conn:
+        return conn.execute("SELECT COUNT(*) FROM child").fetchone()[0]
+
+
+def test_readers_are_read_only_and_reused(pool):
+    with pool.read() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO parent (id) VALUES (2)")
+    with pool.read() as again:
+        assert again is conn
+
+
+def test_write_commits_or_rolls_back(pool):
+    with pool.write() as conn:
+        conn.execute("INSERT INTO child (parent_id) VALUES (1)")
+    with pytest.raises(RuntimeError):
+        with pool.write() as conn:
+            conn.execute("INSERT INTO child (parent_id) VALUES (1)")
+            raise RuntimeError("abort")
+
+    assert _children(pool) == 1
+
+
+def test_failed_commit_leaves_no_open_transaction(pool):
+    # The deferred foreign key is only checked, and fails, at COMMIT.
+    with pytest.raises(sqlite3.IntegrityError):
+        with pool.write() as conn:
+            conn.execute("INSERT INTO child (parent_id) VALUES (99)")
+
+    with pool.write() as conn:
+        assert not conn.execute("SELECT COUNT(*) FROM child WHERE parent_id = 99").fetchone()[0]
+        conn.execute("INSERT INTO child (parent_id) VALUES (1)")
+    assert _children(pool) == 1
+
+
+def test_unhealthy_writer_is_replaced(pool):
+    with pool.write() as conn:
+        pass
+    conn.close()
+
+    with pool.write() as replacement:
+        replacement.execute("INSERT INTO child (parent_id) VALUES (1)")
+
+    assert replacement is not conn
+    assert _children(pool) == 1
+
+
+def test_migrations_apply_once(pool):
+    migration = Migration(1, "child_index", ("CREATE INDEX idx_child_parent ON child (parent_id)",))
+
+    assert applied_versions(pool.db_path) == set()
+    assert apply_migrations(pool.db_path, [migration]) == [1]
+    assert apply_migrations(pool.db_path, [migration]) == []
+    assert applied_versions(pool.db_path) == {1}
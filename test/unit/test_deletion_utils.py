@@ -1 +1,104 @@
 """Unit tests for deletion preview, execution, and state cleanup."""
+
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from agent.delete_planner import STAGING_TABLE
+from agent.delete_tools import execute_deletion, preview_deletion
+
+pytestmark = pytest.mark.unit
+
+
+def _context(confirmed=None):
+    confirmation = None if confirmed is None else SimpleNamespace(confirmed=confirmed)
+    return SimpleNamespace(state={}, tool_confirmation=confirmation)
+
+
+def _preview(context, db_path, table="Experiment", filters=None):
+    return asyncio.run(preview_deletion(context, db_path, table, {"is_valid": "N"} if filters is None else filters))
+
+
+def _staged(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {STAGING_TABLE}").fetchone()[0]
+
+
+def test_preview_stores_only_token_and_checksum(lab_db):
+    context = _context()
+
+    result = _preview(context, lab_db)
+
+    assert result["status"] == "preview"
+    assert result["preview_count"] == 3
+    assert result["cascade_counts"]["RawFiles"] == 9
+    pending = context.state["pending_deletion"]
+    assert set(pending) == {"db_path", "table", "token", "checksum", "preview_count"}
+    assert _staged(lab_db) == sum(result["cascade_counts"].values())
+
+
+@pytest.mark.parametrize("table, filters", [("Experiment", {}), ("sqlite_master", {"is_valid": "N"})])
+def test_preview_blocks_unsafe_requests(lab_db, table, filters):
+    context = _context()
+
+    result = _preview(context, lab_db, table, filters)
+
+    assert result["status"] == "blocked"
+    assert "pending_deletion" not in context.state
+
+
+def test_new_preview_discards_the_previous_one(lab_db):
+    context = _context()
+    _preview(context, lab_db)
+    first = context.state["pending_deletion"]["token"]
+
+    _preview(context, lab_db, filters={"organism": "ecoli"})
+
+    assert context.state["pending_deletion"]["token"] != first
+    with sqlite3.connect(lab_db) as conn:
+        assert conn.execute(f"SELECT COUNT(*) FROM {STAGING_TABLE} WHERE token = ?", (first,)).fetchone()[0] == 0
+
+
+def test_denied_deletion_clears_state_and_staging(lab_db):
+    context = _context()
+    _preview(context, lab_db)
+    context.tool_confirmation = SimpleNamespace(confirmed=False)
+
+    result = asyncio.run(execute_deletion(context))
+
+    assert result["status"] == "cancelled"
+    assert context.state["pending_deletion"] is None
+    assert _staged(lab_db) == 0
+
+
+def test_approved_deletion_removes_the_previewed_rows(lab_db):
+    context = _context()
+    _preview(context, lab_db)
+    context.tool_confirmation = SimpleNamespace(confirmed=True)
+
+    result = asyncio.run(execute_deletion(context))
+
+    assert result["status"] == "completed"
+    assert result["deleted_count"] == 3
+    assert result["deleted_by_table"]["RawFiles"] == 9
+    assert context.state["pending_deletion"] is None
+    # The pending deletion is spent.
+    assert asyncio.run(execute_deletion(context))["status"] == "error"
+
+
+def test_approved_deletion_is_refused_when_the_data_changed(lab_db):
+    context = _context()
+    _preview(context, lab_db)
+    with sqlite3.connect(lab_db) as conn:
+        conn.execute("INSERT INTO Masks (experiment_id, mask_name) VALUES (2, 'late.tif')")
+    context.tool_confirmation = SimpleNamespace(confirmed=True)
+
+    result = asyncio.run(execute_deletion(context))
+
+    assert result["status"] == "error"
+    assert "not executed" in result["message"]
+    assert context.state["pending_deletion"] is None
+    with sqlite3.connect(lab_db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM Experiment WHERE is_valid = 'N'").fetchone()[0] == 3
@@ -0,0 +1,66 @@
+"""Unit tests for the root agent's fast-path intent classifier."""
+
+import pytest
+
+from agent.intent_rules import (
+    DELETE_AGENT,
+    FAST_PATH_THRESHOLD,
+    INSERT_AGENT,
+    QUERY_AGENT,
+    classify_intent,
+)
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.mark.parametrize(
+    "text, agent_name",
+    [
+        ("Show all experiments from 2023", QUERY_AGENT),
+        ("How many raw files does experiment 4 have?", QUERY_AGENT),
+        ("Get all experiments with protein Rfa1", QUERY_AGENT),
+        ("next page", QUERY_AGENT),
+        ("load more rows", QUERY_AGENT),
+        ("Export the valid experiments to CSV", QUERY_AGENT),
+        ("Delete the invalid experiments", DELETE_AGENT),
+        ("Get rid of the invalid experiments", DELETE_AGENT),
+        ("Insert test/metadata_complete_insert.csv", INSERT_AGENT),
+        ("Load data/new_batch.csv into the database", INSERT_AGENT),
+    ],
+)
+def test_unambiguous_requests_take_the_fast_path(text, agent_name):
+    decision = classify_intent(text)
+
+    assert decision.agent_name == agent_name
+    assert decision.confidence >= FAST_PATH_THRESHOLD
+
+
+@pytest.mark.parametrize(
+    "text, wrong_agent",
+    [
+        ("Get rid of the invalid experiments", QUERY_AGENT),
+        ("load more rows", INSERT_AGENT),
+        ("add more", INSERT_AGENT),
+        ("validate data.csv without inserting", INSERT_AGENT),
+        ("Check data.csv but do not insert it", INSERT_AGENT),
+        ("Show me what would be deleted, don't delete anything", DELETE_AGENT),
+    ],
+)
+def test_ambiguous_requests_never_reach_the_wrong_agent(text, wrong_agent):
+    decision = classify_intent(text)
+
+    assert not (decision.agent_name == wrong_agent and decision.confidence >= FAST_PATH_THRESHOLD)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "add more",
+        "validate data.csv without inserting",
+        "show the invalid experiments and delete them",
+        "hello",
+        "",
+    ],
+)
+def test_ambiguous_requests_fall_back_to_the_llm(text):
+    assert classify_intent(text).confidence < FAST_PATH_THRESHOLD
@@ -0,0 +1,39 @@
+"""Unit tests for keyset pagination of listing queries."""
+
+import pytest
+
+from agent.lab_sql import experiment_query, fetch_page, file_listing_query
+
+pytestmark = pytest.mark.unit
+
+
+def _all_pages(db_path, query, page_size):
+    pages = [fetch_page(db_path, query, page_size)]
+    while pages[-1].keys and len(pages[-1].rows) == page_size:
+        pages.append(fetch_page(db_path, query, page_size, after=pages[-1].keys[-1]))
+    return pages
+
+
+def test_pages_cover_the_listing_once_in_order(lab_db):
+    query = file_listing_query("raw_files", {}, lab_db)
+
+    pages = _all_pages(lab_db, query, page_size=4)
+
+    assert pages[0].total == 18
+    assert all(page.total is None for page in pages[1:])
+    keys = [key for page in pages for key in page.keys]
+    assert keys == sorted(set(keys))
+    assert sum(len(page.rows) for page in pages) == 18
+
+
+def test_short_listing_is_counted_without_a_count_query(lab_db):
+    page = fetch_page(lab_db, experiment_query({"is_valid": "N"}, lab_db), page_size=10)
+
+    assert page.total == len(page.rows) == 3
+
+
+def test_long_listing_counts_every_match(lab_db):
+    page = fetch_page(lab_db, experiment_query({"is_valid": "Y"}, lab_db), page_size=2)
+
+    assert len(page.rows) == 2
+    assert page.total == 3
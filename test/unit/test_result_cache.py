@@ -0,0 +1,58 @@
+"""Unit tests for the query result cache."""
+
+import sqlite3
+
+import pytest
+
+from agent.result_cache import UncachedResult, cached_query, invalidate_db, query_cache
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def calls():
+    query_cache.invalidate()
+    return []
+
+
+def _make_tool(calls, result=lambda n: f"{n} rows"):
+    @cached_query
+    def count_rows(db_path: str, table: str, limit: int = 10):
+        calls.append(table)
+        return result(len(calls))
+
+    return count_rows
+
+
+def test_repeated_query_is_served_from_the_cache(lab_db, calls):
+    tool = _make_tool(calls)
+    before = query_cache.stats()
+
+    assert tool(lab_db, "Experiment") == tool(db_path=lab_db, table="Experiment", limit=10) == "1 rows"
+    assert calls == ["Experiment"]
+    after = query_cache.stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+
+
+def test_invalidate_db_only_drops_that_database(lab_db, tmp_path, calls):
+    other = tmp_path / "other.db"
+    sqlite3.connect(other).close()
+    tool = _make_tool(calls)
+    tool(lab_db, "Experiment")
+    tool(str(other), "Experiment")
+
+    invalidate_db(str(other))
+
+    tool(lab_db, "Experiment")
+    tool(str(other), "Experiment")
+    assert len(calls) == 3
+
+
+def test_uncached_results_are_never_stored(lab_db, calls):
+    tool = _make_tool(calls, result=lambda n: UncachedResult("Error: database is locked"))
+
+    tool(lab_db, "Experiment")
+    tool(lab_db, "Experiment")
+
+    assert len(calls) == 2
@@ -0,0 +1,89 @@
+"""Unit tests for the shared tool worker pool."""
+
+import asyncio
+import gc
+import threading
+
+import pytest
+
+from agent import tool_executor
+from agent.tool_executor import offload, tool_metrics
+
+pytestmark = pytest.mark.unit
+
+
+def test_offloaded_tool_runs_off_the_event_loop():
+    @offload()
+    def where():
+        return threading.current_thread().name
+
+    assert asyncio.run(where()).startswith("db-tool")
+    assert tool_metrics()["where"]["completed"] == 1
+
+
+def test_max_concurrency_caps_simultaneous_calls():
+    running = []
+    peak = []
+    lock = threading.Lock()
+    release = threading.Event()
+
+    @offload(max_concurrency=2)
+    def capped(n):
+        with lock:
+            running.append(n)
+            peak.append(len(running))
+        release.wait(5)
+        with lock:
+            running.remove(n)
+        return n
+
+    async def main():
+        calls = [asyncio.ensure_future(capped(n)) for n in range(5)]
+        await asyncio.sleep(0.1)
+        release.set()
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(main()) == list(range(5))
+    assert max(peak) == 2
+    metrics = tool_metrics()["capped"]
+    assert metrics["completed"] == 5
+    assert metrics["queued"] == metrics["running"] == 0
+
+
+def test_semaphores_are_dropped_with_their_event_loop():
+    @offload(max_concurrency=1)
+    def noop():
+        return None
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(noop())
+    assert noop.__name__ in tool_executor._semaphores[loop]
+
+    loop.close()
+    del loop
+    gc.collect()
+    assert len(tool_executor._semaphores) == 0
+
+
+def test_semaphores_of_closed_loops_are_pruned():
+    release = threading.Event()
+
+    @offload(max_concurrency=1)
+    def blocking():
+        release.wait(5)
+
+    async def contend():
+        calls = [asyncio.ensure_future(blocking()) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        release.set()
+        await asyncio.gather(*calls)
+
+    # A semaphore with waiters keeps a reference to its loop.
+    first = asyncio.new_event_loop()
+    first.run_until_complete(contend())
+    first.close()
+    assert first in tool_executor._semaphores
+
+    asyncio.run(blocking())
+
+    assert first not in tool_executor._semaphores
@@ -1,7 +1,7 @@
 #!/bin/python3
 
 import logging
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional
 
 from google.genai import types
 
@@ -24,6 +24,19 @@ def parse_confirmation(user_input: str) -> bool | None:
     return None
 
 
+def prompt_for_approval() -> bool:
+    """Ask on the terminal until the user explicitly approves or denies."""
+    while True:
+        user_input = input(
+            ">> Do you approve the operation? "
+            "Type APPROVE to proceed or DENY to cancel: "
+        )
+        is_approved = parse_confirmation(user_input)
+        if is_approved is not None:
+            return is_approved
+        print("Please enter APPROVE or DENY.")
+
+
 def check_for_approval(events):
     """Check if events contain an approval request.
 
@@ -74,9 +87,14 @@ async def run_db_workflow(
     user_request: str,
     session_id: str,
     user_id: str = "default_user",
+    confirm: Optional[Callable[[Dict[str, Any]], bool]] = None,
 ) -> Dict[str, Any]:
     """
     Orchestrates the database operation workflow.
+
+    Args:
+        confirm: Optional callback that receives the approval details and
+            returns the decision. Defaults to asking on the terminal.
     """
     logger.info(
         "WORKFLOW_START: User Request: %s | Session ID: %s | User ID: %s",
@@ -111,15 +129,10 @@ async def run_db_workflow(
         logger.warning(f"WAITING_FOR_APPROVAL | ID {approval_info['approval_id']} | Invocation: {approval_info['invocation_id']}")
         print(f"Pausing for approval...")
 
-        while True:
-            user_input = input(
-                ">> Do you approve the operation? "
-                "Type APPROVE to proceed or DENY to cancel: "
-            )
-            is_approved = parse_confirmation(user_input)
-            if is_approved is not None:
-                break
-            print("Please enter APPROVE or DENY.")
+        if confirm is not None:
+            is_approved = bool(confirm(approval_info))
+        else:
+            is_approved = prompt_for_approval()
 
         logger.info(
             "User confirmation interpreted as %s",